@@ -177,9 +177,104 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 WHATSAPP_GATEWAY_URL = "http://localhost:3000"
+WHATSAPP_GATEWAY_TIMEOUT_CONEXAO = 3.05  # Segundos para abrir a conexão com o gateway
+WHATSAPP_GATEWAY_TIMEOUT_LEITURA = 20  # Segundos esperando a resposta de um envio individual
+WHATSAPP_GATEWAY_TIMEOUT_LOTE = 120  # Segundos esperando a resposta de um /send-batch
+# Duração máxima de cada conexão SSE de status (o navegador reconecta sozinho)
+WHATSAPP_SSE_DURACAO_MAXIMA = 300
+
+# Pool de nós do gateway (core/gateway_pool.py). Com nós cadastrados
+# (`python manage.py rebalancear_gateways --adicionar URL`), cada academia é
+# atendida pelo seu nó; sem nenhum, tudo vai para WHATSAPP_GATEWAY_URL.
+WHATSAPP_GATEWAY_POOL = True
+WHATSAPP_GATEWAY_VNODES = 100  # Pontos de cada nó (por unidade de peso) no anel de hash
+WHATSAPP_GATEWAY_POOL_CACHE = 30  # Segundos que cada processo guarda a lista de nós
+
+# Circuit breaker (disjuntor) das chamadas ao gateway (core/disjuntor.py)
+WHATSAPP_DISJUNTOR_FALHAS = 5  # Falhas seguidas que abrem o disjuntor
+WHATSAPP_DISJUNTOR_P95_MS = 8000  # p95 de latência (ms por mensagem) que abre o disjuntor
+WHATSAPP_DISJUNTOR_AMOSTRAS = 50  # Latências guardadas para o p95 (mínimo de 20 para avaliar)
+WHATSAPP_DISJUNTOR_TEMPO_ABERTO = 30  # Segundos aberto antes de liberar uma chamada de teste
+WHATSAPP_DISJUNTOR_SINCRONIZAR = 1  # Segundos entre leituras do estado compartilhado
+
+# Fila de envio (outbox) das mensagens de WhatsApp
+WHATSAPP_OUTBOX_LOTE = int(os.getenv('WHATSAPP_OUTBOX_LOTE', '50'))  # Mensagens reivindicadas por lote
+WHATSAPP_OUTBOX_WORKERS = int(os.getenv('WHATSAPP_OUTBOX_WORKERS', '8'))  # Envios simultâneos por worker
+WHATSAPP_OUTBOX_MAX_TENTATIVAS = int(os.getenv('WHATSAPP_OUTBOX_MAX_TENTATIVAS', '5'))
+WHATSAPP_OUTBOX_BACKOFF_SEGUNDOS = 30  # Espera da 1ª retentativa (dobra a cada falha)
+WHATSAPP_OUTBOX_BACKOFF_MAXIMO = 3600
+WHATSAPP_OUTBOX_TIMEOUT_ENVIANDO = 600  # Após isso, mensagens presas em 'enviando' voltam para a fila
+
+# Confirmações de entrega enviadas pelo gateway (header X-Webhook-Token)
+WHATSAPP_WEBHOOK_TOKEN = os.getenv('WHATSAPP_WEBHOOK_TOKEN', '')
+WHATSAPP_RECIBOS_MAXIMO = 5000  # Confirmações aceitas por requisição
+WHATSAPP_RECIBOS_BLOCO = 500  # Ids por UPDATE ao aplicar as confirmações
+
+# Dias em que a mesma notificação não é repetida para o mesmo aluno (0 = sem limite)
+WHATSAPP_COOLDOWN_DIAS = {
+    'padrao': 1,
+    'inadimplencia': 3,
+    'baixa_frequencia': 7,
+    'boas_vindas': 3650,
+}
+
+# Arquivo compactado dos logs de mensagens antigos (fora do MEDIA_ROOT: não é público)
+ARQUIVO_MENSAGENS_DIR = os.getenv('ARQUIVO_MENSAGENS_DIR', os.path.join(BASE_DIR, 'arquivo_mensagens'))
+ARQUIVO_MENSAGENS_LOTE = 1000  # Mensagens movidas por lote
+ARQUIVO_MENSAGENS_NIVEL_ZSTD = 10
+
+BUSCA_MENSAGENS_LIMITE = 2000  # Resultados mais relevantes considerados na busca do log (SQLite/FTS5)
+PAGINACAO_LIMITE_CONTAGEM = 10000  # Acima disso as listas mostram um total aproximado (core/paginacao.py)
 
 # Configurações do Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+LLM_MODELO = os.getenv("LLM_MODELO", "gemini-1.5-flash")
+LLM_TIMEOUT = 60  # Segundos esperando o Gemini nas respostas do assistente (core/llm.py)
+# 'falso' troca o Gemini por um modelo local determinístico (testes e benchmark_agente)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_FALSO_LATENCIA_MS = 800  # Espera até o primeiro pedaço da resposta falsa
+LLM_FALSO_LATENCIA_TOKEN_MS = 20  # Espera por palavra da resposta falsa
+LLM_FALSO_RESPOSTAS = []  # Respostas prontas (vazio = texto padrão do LLMFalso)
+
+# Memória da conversa do assistente (core/memoria_chat.py)
+IA_MEMORIA_TURNOS = 6  # Últimas perguntas e respostas enviadas na íntegra ao modelo
+IA_MEMORIA_LOTE_RESUMO = 4  # Mensagens excedentes acumuladas antes de resumir (uma chamada ao LLM por lote)
+IA_MEMORIA_CARACTERES_TURNO = 1000  # Limite de cada pergunta/resposta guardada
+IA_MEMORIA_CARACTERES_RESUMO = 2000  # Limite do resumo das mensagens antigas
+
+# Boletim diário do assistente (core/boletim.py)
+# Faturamento e inadimplência entram na impressão digital em faixas desse valor:
+# variações menores não geram o boletim de novo
+IA_BOLETIM_TOLERANCIA_REAIS = 50
+IA_BOLETIM_ORCAMENTO_TOKENS = 600  # Tamanho máximo dos "Pontos de Atenção" do boletim
+IA_BOLETIM_TOP_N = 5  # Nomes listados por item no boletim compactado
+
+# Relatório do agente_ia (core/compactador.py): acima do orçamento, contagens + os casos mais graves
+IA_RELATORIO_ORCAMENTO_TOKENS = 1500
+IA_RELATORIO_TOP_N = 10
+
+# Caminho rápido do assistente (core/intencoes.py): perguntas sobre os dados respondidas sem o LLM
+IA_INTENCAO_ATIVA = True
+IA_INTENCAO_PONTUACAO_MINIMA = 1.0  # Pontuação mínima para a pergunta não ir para o LLM
+IA_INTENCAO_MAX_NOMES = 20  # Alunos/faturas listados na resposta; o resto vira "... e mais N"
+
+# Limites do assistente por academia (core/cotas_ia.py); os de cada plano ficam no PlanoSaaS
+IA_COTAS_ATIVAS = True
+IA_LIMITES_SEM_PLANO = {'requisicoes_por_minuto': 10, 'geracoes_simultaneas': 1, 'tokens_por_dia': 50000}
+IA_GERACAO_TEMPO_MAXIMO = 180  # Segundos até a vaga de uma geração que não terminou (processo morto) vencer
+
+# Rodada diária do agente de IA (core/execucao_agente.py)
+AGENTE_IA_WORKERS = int(os.getenv('AGENTE_IA_WORKERS', 8))  # Academias processadas ao mesmo tempo
+AGENTE_IA_TIMEOUT = 300  # Segundos que cada academia pode levar antes de a rodada seguir sem ela
+AGENTE_IA_TIMEOUT_LLM = 60  # Segundos esperando a resposta do Gemini em cada academia
+
+# Cache das respostas do LLM (core/cache_llm.py)
+LLM_CACHE_ATIVO = True
+LLM_CACHE_TTL = 6 * 3600  # Segundos que cada resposta pode ser reaproveitada
+LLM_CACHE_MAX_ENTRADAS = 2000  # Acima disso saem as respostas usadas há mais tempo
+# Com temperatura > 0 a resposta varia a cada chamada; ligue para reaproveitar
+# também o boletim e o relatório do agente (gerados com temperatura 0.7)
+LLM_CACHE_COM_TEMPERATURA = False
 
 # Configurações de Logging para Produção
 LOGGING = {
@@ -19,9 +19,9 @@ class AcademiaAdmin(admin.ModelAdmin):
 
 @admin.register(Aluno)
 class AlunoAdmin(admin.ModelAdmin):
-    list_display = ('nome_completo', 'academia', 'contato', 'ativo')
-    search_fields = ('nome_completo', 'cpf')
-    list_filter = ('academia', 'ativo')
+    list_display = ('nome_completo', 'academia', 'contato', 'whatsapp_valido', 'ativo')
+    search_fields = ('nome_completo', 'cpf', 'whatsapp_e164')
+    list_filter = ('academia', 'ativo', 'whatsapp_valido')
     list_per_page = 20
 
 @admin.register(Turma)
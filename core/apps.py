@@ -6,6 +6,10 @@ class CoreConfig(AppConfig):
     name = 'core'
 
     def ready(self):
+        from django.db.models.signals import post_migrate
+        from .busca_mensagens import garantir_indice_sqlite
+        post_migrate.connect(garantir_indice_sqlite, sender=self)
+
         # O Django define a variável de ambiente RUN_MAIN como 'true'
         # apenas no processo que roda a aplicação.
         if os.environ.get('RUN_MAIN'):
@@ -0,0 +1,358 @@
+# core/arquivamento.py
+
+"""
+Retenção e arquivamento do log de mensagens.
+
+Mensagens já resolvidas (enviadas, com falha ou agrupadas) mais antigas que a
+retenção da academia (`Academia.retencao_logs_meses`) saem da tabela
+LogMensagem em lotes e vão para arquivos mensais compactados:
+
+    ARQUIVO_MENSAGENS_DIR/<academia_id>/<AAAA-MM>.jsonl.zst
+
+Cada lote é gravado como um novo quadro (frame) zstandard anexado ao final do
+arquivo, então nunca é preciso descompactar e regravar o mês inteiro. O
+ArquivoLogMensagem de cada mês guarda os totais, e o relatório de mensagens
+só abre os arquivos quando a paginação ou o filtro realmente precisam deles.
+"""
+
+import io
+import json
+import os
+from datetime import datetime, time
+from pathlib import Path
+
+import zstandard
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Aluno, ArquivoLogMensagem, LogMensagem
+from .paginacao import PaginadorCursor
+
+STATUS_ARQUIVAVEIS = ['enviado', 'falhou', 'agrupado']
+
+CAMPOS = [
+    'id', 'aluno_id', 'tipo', 'mensagem', 'data_envio', 'sucesso', 'resposta_gateway', 'status',
+    'tentativas', 'data_processamento', 'data_referencia', 'agrupada_em_id',
+    'gateway_message_id', 'status_entrega', 'data_entrega', 'data_leitura', 'transmissao_id',
+]
+CAMPOS_DATA_HORA = ['data_envio', 'data_processamento', 'data_entrega', 'data_leitura']
+
+
+def _diretorio():
+    return Path(getattr(settings, 'ARQUIVO_MENSAGENS_DIR', Path(settings.BASE_DIR) / 'arquivo_mensagens'))
+
+
+def data_corte(academia, agora=None):
+    """ Início do período que continua na base principal, ou None se a academia não arquiva. """
+    if not academia.retencao_logs_meses:
+        return None
+    hoje = timezone.localtime(agora or timezone.now()).date()
+    return timezone.make_aware(datetime.combine(hoje - relativedelta(months=academia.retencao_logs_meses), time.min))
+
+
+def _serializar(valor):
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return valor
+
+
+def _anexar_quadro(caminho, registros):
+    """ Compacta os registros em um quadro zstd e o anexa ao arquivo (com fsync). """
+    dados = "".join(
+        json.dumps({k: _serializar(v) for k, v in registro.items()}, ensure_ascii=False) + "\n"
+        for registro in registros
+    ).encode('utf-8')
+    quadro = zstandard.ZstdCompressor(level=getattr(settings, 'ARQUIVO_MENSAGENS_NIVEL_ZSTD', 10)).compress(dados)
+
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'ab') as arquivo:
+        arquivo.write(quadro)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    return caminho.stat().st_size
+
+
+def _totais_entrega(registros):
+    enviados = [r for r in registros if r['status'] == 'enviado']
+    return {
+        'enviadas': len(enviados),
+        'entregues': sum(1 for r in enviados if r['status_entrega'] in ('entregue', 'lida')),
+        'lidas': sum(1 for r in enviados if r['status_entrega'] == 'lida'),
+        'falhas_entrega': sum(1 for r in enviados if r['status_entrega'] == 'falhou'),
+    }
+
+
+def arquivar_academia(academia, tamanho_lote=None, agora=None):
+    """
+    Move para os arquivos compactados as mensagens da academia anteriores ao
+    corte de retenção. Retorna {'arquivadas', 'meses'}.
+
+    O quadro é gravado (e sincronizado em disco) antes de apagar as linhas; se o
+    processo cair entre as duas etapas, o lote é arquivado de novo na próxima
+    execução e a leitura descarta os ids repetidos. Os totais do
+    ArquivoLogMensagem são somados na mesma transação que apaga as linhas e só
+    com as que ela apagou de fato, então um lote repetido (ou arquivado ao mesmo
+    tempo por outra execução) não é contado duas vezes.
+    """
+    corte = data_corte(academia, agora)
+    resumo = {'arquivadas': 0, 'meses': set()}
+    if corte is None:
+        return resumo
+
+    tamanho_lote = tamanho_lote or getattr(settings, 'ARQUIVO_MENSAGENS_LOTE', 1000)
+    pendentes = (
+        LogMensagem.all_objects
+        .filter(academia=academia, data_envio__lt=corte, status__in=STATUS_ARQUIVAVEIS)
+        .order_by('data_envio', 'id')
+    )
+
+    while True:
+        registros = list(pendentes.values(*CAMPOS, aluno_nome=F('aluno__nome_completo'))[:tamanho_lote])
+        if not registros:
+            break
+
+        por_mes = {}
+        for registro in registros:
+            mes = timezone.localtime(registro['data_envio']).date().replace(day=1)
+            por_mes.setdefault(mes, []).append(registro)
+
+        gravados = {}
+        for mes, do_mes in por_mes.items():
+            relativo = f"{academia.id}/{mes:%Y-%m}.jsonl.zst"
+            gravados[mes] = (relativo, _anexar_quadro(_diretorio() / relativo, do_mes))
+
+        with transaction.atomic():
+            apagados = set(
+                pendentes.select_for_update().filter(id__in=[r['id'] for r in registros])
+                .values_list('id', flat=True)
+            )
+            LogMensagem.all_objects.filter(id__in=apagados).delete()
+
+            for mes, do_mes in por_mes.items():
+                relativo, tamanho = gravados[mes]
+                do_mes = [r for r in do_mes if r['id'] in apagados]
+                if not do_mes:
+                    ArquivoLogMensagem.all_objects.filter(academia=academia, mes=mes).update(tamanho_bytes=tamanho)
+                    continue
+                arquivo, _ = ArquivoLogMensagem.all_objects.select_for_update().get_or_create(
+                    academia=academia, mes=mes, defaults={'caminho': relativo}
+                )
+                arquivo.quantidade += len(do_mes)
+                for campo, total in _totais_entrega(do_mes).items():
+                    setattr(arquivo, campo, getattr(arquivo, campo) + total)
+                arquivo.tamanho_bytes = tamanho
+                datas = [r['data_envio'] for r in do_mes]
+                arquivo.primeira_data = min([d for d in [arquivo.primeira_data, *datas] if d])
+                arquivo.ultima_data = max([d for d in [arquivo.ultima_data, *datas] if d])
+                arquivo.save()
+                resumo['meses'].add(mes)
+
+        resumo['arquivadas'] += len(apagados)
+
+    return resumo
+
+
+# -----------------------------------------------------------------------------
+# LEITURA DOS ARQUIVOS
+# -----------------------------------------------------------------------------
+
+def _ler_arquivo(arquivo):
+    caminho = _diretorio() / arquivo.caminho
+    if not caminho.exists():
+        return
+    with open(caminho, 'rb') as bruto:
+        leitor = zstandard.ZstdDecompressor().stream_reader(bruto, read_across_frames=True)
+        for linha in io.TextIOWrapper(leitor, encoding='utf-8'):
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def _arquivos_do_periodo(academia, data_inicio=None, data_fim=None):
+    arquivos = ArquivoLogMensagem.all_objects.filter(academia=academia)
+    if data_inicio:
+        arquivos = arquivos.filter(mes__gte=data_inicio.replace(day=1))
+    if data_fim:
+        arquivos = arquivos.filter(mes__lte=data_fim)
+    return arquivos.order_by('-mes')
+
+
+def _chave(registro):
+    return (registro['data_envio'], registro['id'])
+
+
+def _mes(momento):
+    return timezone.localtime(momento).date().replace(day=1)
+
+
+def _registros_do_mes(arquivo, data_inicio=None, data_fim=None, termo=''):
+    """ Registros de um arquivo mensal que atendem ao filtro, do mais recente para o mais antigo. """
+    termo = (termo or '').casefold()
+    vistos, resultados = set(), []
+    for registro in _ler_arquivo(arquivo):
+        if registro['id'] in vistos:
+            continue
+        vistos.add(registro['id'])
+        for campo in CAMPOS_DATA_HORA:
+            if registro.get(campo):
+                registro[campo] = parse_datetime(registro[campo])
+        dia = timezone.localtime(registro['data_envio']).date()
+        if (data_inicio and dia < data_inicio) or (data_fim and dia > data_fim):
+            continue
+        if termo and termo not in registro['mensagem'].casefold() \
+                and termo not in (registro.get('aluno_nome') or '').casefold():
+            continue
+        resultados.append(registro)
+
+    resultados.sort(key=_chave, reverse=True)
+    return resultados
+
+
+def buscar_arquivadas(academia, data_inicio=None, data_fim=None, termo=''):
+    """
+    Lê apenas os meses do período e devolve os registros que atendem ao filtro,
+    do mais recente para o mais antigo (cada arquivo guarda um mês de envio, então
+    basta juntar os meses em ordem).
+    """
+    return [
+        registro
+        for arquivo in _arquivos_do_periodo(academia, data_inicio, data_fim)
+        for registro in _registros_do_mes(arquivo, data_inicio, data_fim, termo)
+    ]
+
+
+def como_log(registro):
+    """ LogMensagem em memória (não salvo) para exibir um registro arquivado nos templates. """
+    dados = {campo: registro.get(campo) for campo in CAMPOS}
+    dados['data_referencia'] = parse_date(dados['data_referencia']) if dados['data_referencia'] else None
+    log = LogMensagem(**dados)
+    if registro.get('aluno_nome'):
+        log.aluno = Aluno(id=registro.get('aluno_id'), nome_completo=registro['aluno_nome'])
+    log.arquivada = True
+    return log
+
+
+class HistoricoMensagens:
+    """
+    Log de mensagens do relatório: primeiro as mensagens da base principal
+    (queryset) e, depois delas, as arquivadas do período. Os arquivos só são
+    abertos quando a paginação chega no fim da base principal, ou quando há
+    busca por texto/período parcial e o relatório precisa dos totais.
+    """
+
+    def __init__(self, queryset, academia, data_inicio=None, data_fim=None, termo=''):
+        self.queryset = queryset
+        self.academia = academia
+        self.filtro = {'data_inicio': data_inicio, 'data_fim': data_fim, 'termo': termo}
+        self.arquivos = list(_arquivos_do_periodo(academia, data_inicio, data_fim))
+        self._arquivadas = None
+        self._meses = {}
+
+    @property
+    def usa_arquivo(self):
+        return bool(self.arquivos)
+
+    @property
+    def _filtro_parcial(self):
+        return any(self.filtro.values())
+
+    def _do_mes(self, arquivo):
+        if arquivo.pk not in self._meses:
+            self._meses[arquivo.pk] = _registros_do_mes(arquivo, **self.filtro)
+        return self._meses[arquivo.pk]
+
+    def _carregar_arquivadas(self):
+        if self._arquivadas is None:
+            self._arquivadas = [registro for arquivo in self.arquivos for registro in self._do_mes(arquivo)]
+        return self._arquivadas
+
+    def arquivadas(self, depois=None, antes=None, quantidade=None):
+        """
+        Arquivadas do relatório, da mais recente para a mais antiga: as seguintes
+        à chave (data_envio, id) `depois`, as imediatamente anteriores à chave
+        `antes` ou as primeiras. Pula os meses que ficam do outro lado da chave e
+        para de abrir arquivos assim que junta `quantidade` registros.
+        """
+        if antes is not None:
+            # Do mês da chave para os mais recentes, das mais próximas para as mais distantes
+            proximas = []
+            for arquivo in reversed(self.arquivos):
+                if arquivo.mes < _mes(antes[0]):
+                    continue
+                proximas += [r for r in reversed(self._do_mes(arquivo)) if _chave(r) > antes]
+                if quantidade and len(proximas) >= quantidade:
+                    break
+            return list(reversed(proximas[:quantidade]))
+
+        itens = []
+        for arquivo in self.arquivos:
+            if depois is None:
+                itens += self._do_mes(arquivo)
+            elif arquivo.mes <= _mes(depois[0]):
+                itens += [r for r in self._do_mes(arquivo) if _chave(r) < depois]
+            if quantidade and len(itens) >= quantidade:
+                break
+        return itens[:quantidade]
+
+    def totais_entrega(self):
+        """ Totais de entrega das mensagens arquivadas que entram no relatório. """
+        if not self.arquivos:
+            return {'enviadas': 0, 'entregues': 0, 'lidas': 0, 'falhas_entrega': 0}
+        if self._filtro_parcial:
+            return _totais_entrega(self._carregar_arquivadas())
+        return {
+            campo: sum(getattr(a, campo) for a in self.arquivos)
+            for campo in ('enviadas', 'entregues', 'lidas', 'falhas_entrega')
+        }
+
+    def paginador(self, ordenacao=None, por_pagina=20):
+        return PaginadorHistorico(self, ordenacao, por_pagina)
+
+
+class PaginadorHistorico(PaginadorCursor):
+    """ Paginação por cursor do histórico: as arquivadas entram depois da última página da base. """
+
+    def __init__(self, historico, ordenacao=None, por_pagina=20):
+        super().__init__(historico.queryset, ordenacao, por_pagina)
+        self.historico = historico
+
+    def continuacao(self, depois=None, antes=None, quantidade=None):
+        return self.historico.arquivadas(
+            depois=self._ler_chave(depois), antes=self._ler_chave(antes), quantidade=quantidade,
+        )
+
+    def chave_continuacao(self, item):
+        return [item['data_envio'], item['id']]
+
+    def _ler_chave(self, chave):
+        if chave is None:
+            return None
+        try:
+            data_envio, id_ = chave
+            data_envio = parse_datetime(data_envio)
+            id_ = int(id_)
+        except (TypeError, ValueError):
+            data_envio = None
+        if data_envio is None or timezone.is_naive(data_envio):
+            # Cursor editado à mão ou de antes da paginação por chave: a página recomeça
+            raise ValidationError("Cursor inválido.")
+        return (data_envio, id_)
+
+    def preparar(self, item):
+        return como_log(item)
+
+    def estimar_total(self):
+        total, tipo = super().estimar_total()
+        historico = self.historico
+        if not historico.arquivos:
+            return total, tipo
+        if not historico._filtro_parcial:
+            return total + sum(a.quantidade for a in historico.arquivos), tipo
+        if historico._arquivadas is not None:
+            return total + len(historico._arquivadas), tipo
+        # Contar as arquivadas do filtro exigiria abrir os arquivos só para o total
+        return total, 'minimo'
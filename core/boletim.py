@@ -0,0 +1,160 @@
+# core/boletim.py
+
+"""
+Boletim diário do assistente (o resumo inicial do painel).
+
+Gerar o boletim é uma chamada ao Gemini de alguns segundos; por isso ele é
+gerado cedo (comando `gerar_boletins`, e de novo pelo `agente_ia` se os dados
+tiverem mudado) e guardado em BoletimDiario. Ao abrir o painel o boletim
+guardado é servido na hora, desde que a impressão digital dos KPIs ainda seja
+a mesma com que ele foi gerado. A impressão leva em conta:
+
+- a data (boletim de ontem nunca é servido hoje);
+- o quadro de alunos e as assinaturas novas;
+- quem está inadimplente e quem está ausente (os nomes aparecem no texto);
+- faturamento e inadimplência em faixas de IA_BOLETIM_TOLERANCIA_REAIS, para
+  que um pagamento pequeno não obrigue a gerar o boletim de novo.
+
+Qualquer diferença fora disso gera um boletim novo na próxima abertura.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .cache_llm import invocar_com_cache
+from .compactador import compactar, secao_ausentes, secao_inadimplentes
+from .models import BoletimDiario
+from .snapshot import DIAS_AUSENCIA
+
+logger = logging.getLogger(__name__)
+
+TEMPERATURA = 0.7
+
+
+def impressao(snapshot):
+    """ Impressão digital dos dados do boletim (muda quando os dados mudam de forma relevante). """
+    tolerancia = Decimal(str(getattr(settings, 'IA_BOLETIM_TOLERANCIA_REAIS', 50)))
+    faixa = lambda valor: str(valor // tolerancia if tolerancia > 0 else valor)
+    financeiro = snapshot.financeiro
+    dados = [
+        snapshot.data.isoformat(),
+        snapshot.alunos_ativos, snapshot.alunos_inativos, snapshot.sem_assinatura,
+        financeiro.novas_assinaturas,
+        faixa(financeiro.faturamento_mes_atual),
+        faixa(financeiro.faturamento_mes_passado),
+        faixa(financeiro.inadimplencia),
+        sorted(aluno.pk for aluno in snapshot.inadimplentes),
+        sorted(aluno.pk for aluno in snapshot.ausentes),
+    ]
+    return hashlib.sha256(json.dumps(dados).encode('utf-8')).hexdigest()
+
+
+def prompt_boletim(snapshot):
+    """ Prompt do boletim diário e o texto usado quando não há LLM. """
+    academia = snapshot.academia
+    financeiro = snapshot.financeiro
+    # Nomes dos mais graves primeiro, dentro do orçamento do boletim (core/compactador.py)
+    pontos_de_atencao = compactar(
+        [
+            secao_inadimplentes(snapshot, f"Inadimplentes ({len(snapshot.inadimplentes)}):"),
+            secao_ausentes(snapshot, f"Sem registrar presença há mais de {DIAS_AUSENCIA} dias ({len(snapshot.ausentes)}):"),
+        ],
+        orcamento_tokens=getattr(settings, 'IA_BOLETIM_ORCAMENTO_TOKENS', 600),
+        top_n=getattr(settings, 'IA_BOLETIM_TOP_N', 5),
+        rodape=f"{snapshot.sem_assinatura} aluno(s) ativos estão sem uma assinatura ativa.",
+    )
+    if pontos_de_atencao.compactado:
+        logger.info(
+            "Boletim de %s compactado: ~%s tokens (~%s economizados).",
+            academia.pk, pontos_de_atencao.tokens, pontos_de_atencao.tokens_economizados,
+        )
+
+    contexto_resumo = (
+        f"**Resumo Financeiro (Mês Passado):** Faturamento de R$ {financeiro.faturamento_mes_passado:.2f} e {financeiro.novas_assinaturas} nova(s) assinatura(s).\n"
+        f"**Situação Atual:** O faturamento este mês está em R$ {financeiro.faturamento_mes_atual:.2f} e a inadimplência total é de R$ {financeiro.inadimplencia:.2f}.\n"
+        f"**Quadro de Alunos:** {snapshot.alunos_ativos} alunos ativos e {snapshot.alunos_inativos} inativos.\n"
+        f"**Pontos de Atenção:**\n"
+        f"{pontos_de_atencao.texto}"
+    )
+    # O boletim é gerado antes de alguém abrir o painel: é endereçado ao dono da academia
+    data_hoje = snapshot.data.strftime('%d/%m/%Y')
+    nome_dono = academia.dono.get_full_name() or academia.dono.username
+    nome_assistente = "Assistente Virtual"
+    cargo_assistente = "IA de Gestão"
+    prompt = f"""
+**Boletim Diário - {data_hoje}**
+
+Olá {nome_dono}!
+
+Tudo em ordem por aqui! 😄
+
+{contexto_resumo}
+
+Acompanharemos de perto a situação da inadimplência e as ausências para mantermos nossa ótima taxa de alunos ativos.
+
+Qualquer dúvida, pode me chamar! 😊
+
+Atenciosamente,
+
+{nome_assistente} - {cargo_assistente}
+"""
+    # Resposta padrão quando a API Key não está configurada
+    sem_llm = prompt + """
+---
+*Nota: Esta é uma resposta padrão. Para respostas personalizadas com IA, configure a variável de ambiente GEMINI_API_KEY.*
+"""
+    return prompt, sem_llm
+
+
+def boletim_guardado(snapshot):
+    """ Texto do boletim do dia, se ainda corresponde aos dados do `snapshot`; senão None. """
+    return (
+        BoletimDiario.all_objects
+        .filter(academia=snapshot.academia, data=snapshot.data, impressao=impressao(snapshot))
+        .values_list('texto', flat=True).first()
+    )
+
+
+def guardar_boletim(snapshot, texto, origem, modelo='', duracao=None):
+    dados = {
+        'impressao': impressao(snapshot),
+        'texto': texto,
+        'origem': origem,
+        'modelo': modelo,
+        'duracao_segundos': duracao,
+        'gerado_em': timezone.now(),
+    }
+    # UPDATE e, se não havia, INSERT: sem ler antes de escrever, várias academias
+    # podem gravar ao mesmo tempo (gerar_boletins) sem travar o SQLite
+    boletins = BoletimDiario.all_objects.filter(academia=snapshot.academia, data=snapshot.data)
+    if not boletins.update(**dados):
+        try:
+            with transaction.atomic():
+                BoletimDiario.all_objects.create(academia=snapshot.academia, data=snapshot.data, **dados)
+        except IntegrityError:
+            boletins.update(**dados)
+
+
+def gerar_boletim(snapshot, llm, origem='agente'):
+    """
+    Gera e guarda o boletim do dia, a não ser que o guardado ainda valha.
+    Retorna True se chamou o modelo. Usado pelas rotinas em segundo plano, então
+    os tokens não gastam a cota diária da academia.
+    """
+    if boletim_guardado(snapshot) is not None:
+        return False
+    prompt, _ = prompt_boletim(snapshot)
+    inicio = time.monotonic()
+    texto = invocar_com_cache(llm, prompt, academia=snapshot.academia, rotina=True)
+    guardar_boletim(
+        snapshot, texto, origem,
+        modelo=str(getattr(llm, 'model', '') or ''), duracao=round(time.monotonic() - inicio, 2),
+    )
+    return True
@@ -0,0 +1,168 @@
+# core/busca_mensagens.py
+
+"""
+Busca textual no log de mensagens (texto da mensagem + nome do aluno).
+
+- SQLite (desenvolvimento): tabela virtual FTS5 `core_logmensagem_fts`, com o
+  tokenizador unicode61 sem acentos, mantida por triggers.
+- PostgreSQL (produção): coluna `busca` (tsvector) com índice GIN, mantida por
+  trigger com a configuração `pt_unaccent` (português + unaccent).
+
+As duas são criadas pela migração 0014. Em qualquer outro banco, ou se o índice
+não existir, a busca volta para o `icontains` de antes.
+
+Cada palavra digitada vira um prefixo ("joão silv" encontra "João Silva") e todas
+precisam aparecer. Os resultados vêm ordenados por relevância (bm25/ts_rank).
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, IntegerField, Q
+from django.db.models.expressions import RawSQL
+
+TABELA_FTS = 'core_logmensagem_fts'
+
+# Triggers do índice FTS5. O SQLite recria a tabela inteira em algumas migrações
+# (ex: ao adicionar uma FK) e, ao apagar a tabela antiga, leva os triggers junto;
+# o post_migrate recria o que faltar com estas mesmas definições. Recriar a
+# core_aluno falha com os triggers do log apontando para ela: essas migrações
+# rodam `remover_triggers_sqlite` antes (ver 0017).
+TRIGGERS_SQLITE = {
+    'core_logmensagem_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS core_logmensagem_fts_insert AFTER INSERT ON core_logmensagem BEGIN
+            INSERT INTO core_logmensagem_fts (rowid, academia_id, nome_aluno, mensagem)
+            VALUES (new.id, new.academia_id, (SELECT nome_completo FROM core_aluno WHERE id = new.aluno_id), new.mensagem);
+        END
+    """,
+    'core_logmensagem_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS core_logmensagem_fts_delete AFTER DELETE ON core_logmensagem BEGIN
+            DELETE FROM core_logmensagem_fts WHERE rowid = old.id;
+        END
+    """,
+    'core_logmensagem_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS core_logmensagem_fts_update AFTER UPDATE OF mensagem, aluno_id ON core_logmensagem BEGIN
+            DELETE FROM core_logmensagem_fts WHERE rowid = old.id;
+            INSERT INTO core_logmensagem_fts (rowid, academia_id, nome_aluno, mensagem)
+            VALUES (new.id, new.academia_id, (SELECT nome_completo FROM core_aluno WHERE id = new.aluno_id), new.mensagem);
+        END
+    """,
+    'core_aluno_fts_nome': """
+        CREATE TRIGGER IF NOT EXISTS core_aluno_fts_nome AFTER UPDATE OF nome_completo ON core_aluno BEGIN
+            UPDATE core_logmensagem_fts SET nome_aluno = new.nome_completo
+            WHERE rowid IN (SELECT id FROM core_logmensagem WHERE aluno_id = new.id);
+        END
+    """,
+}
+
+_disponivel = {}
+
+
+def _palavras(termo):
+    return re.findall(r'\w+', termo or '')[:10]
+
+
+def indice_disponivel(conexao=connection):
+    """ Se o índice de busca do banco atual existe (consultado uma vez por processo). """
+    if conexao.alias not in _disponivel:
+        if conexao.vendor == 'sqlite':
+            _disponivel[conexao.alias] = TABELA_FTS in conexao.introspection.table_names()
+        elif conexao.vendor == 'postgresql':
+            with conexao.cursor() as cursor:
+                colunas = conexao.introspection.get_table_description(cursor, 'core_logmensagem')
+            _disponivel[conexao.alias] = any(c.name == 'busca' for c in colunas)
+        else:
+            _disponivel[conexao.alias] = False
+    return _disponivel[conexao.alias]
+
+
+def _buscar_sqlite(queryset, palavras, academia):
+    # Cada palavra entre aspas (sem operadores do usuário) e como prefixo
+    consulta = " ".join(f'"{p}"*' for p in palavras)
+    limite = getattr(settings, 'BUSCA_MENSAGENS_LIMITE', 2000)
+    sql, parametros = f"SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s", [consulta]
+    if academia is not None:
+        sql += " AND academia_id = %s"
+        parametros.append(academia.id)
+    with connection.cursor() as cursor:
+        # O FTS5 só devolve os N mais relevantes; a paginação trabalha sobre eles
+        cursor.execute(sql + " ORDER BY rank LIMIT %s", parametros + [limite])
+        ids = [linha[0] for linha in cursor.fetchall()]
+    if not ids:
+        return queryset.none()
+    # CASE montado direto em SQL (os ids são inteiros vindos do próprio banco):
+    # com milhares de When() o Django gasta mais tempo compilando do que o SQLite executando
+    ordem = RawSQL(
+        "CASE core_logmensagem.id " + " ".join(f"WHEN {int(id_)} THEN {posicao}" for posicao, id_ in enumerate(ids)) + " END",
+        [], output_field=IntegerField(),
+    )
+    return queryset.filter(id__in=ids).annotate(relevancia=ordem).order_by('relevancia')
+
+
+def _buscar_postgres(queryset, palavras):
+    consulta = " & ".join(f"{p}:*" for p in palavras)
+    return (
+        queryset
+        .alias(encontrada=RawSQL(
+            "core_logmensagem.busca @@ to_tsquery('pt_unaccent', %s)", [consulta], output_field=BooleanField()
+        ))
+        .filter(encontrada=True)
+        .annotate(relevancia=RawSQL(
+            "ts_rank(core_logmensagem.busca, to_tsquery('pt_unaccent', %s))", [consulta], output_field=FloatField()
+        ))
+        .order_by('-relevancia', '-data_envio')
+    )
+
+
+def buscar_mensagens(queryset, termo, academia=None):
+    """
+    Filtra um queryset de LogMensagem pelo termo buscado, do mais relevante para
+    o menos relevante. Sem índice disponível, usa icontains (ordem original).
+    """
+    palavras = _palavras(termo)
+    if not palavras:
+        return queryset
+    if indice_disponivel():
+        if connection.vendor == 'sqlite':
+            return _buscar_sqlite(queryset, palavras, academia)
+        if connection.vendor == 'postgresql':
+            return _buscar_postgres(queryset, palavras)
+    return queryset.filter(Q(aluno__nome_completo__icontains=termo) | Q(mensagem__icontains=termo))
+
+
+def garantir_indice_sqlite(sender=None, using='default', **kwargs):
+    """
+    (post_migrate) Recria os triggers do FTS5 que tenham sumido em uma recriação
+    de tabela do SQLite e, nesse caso, reconstrói o índice.
+    """
+    conexao = connections[using]
+    if conexao.vendor != 'sqlite' or TABELA_FTS not in conexao.introspection.table_names():
+        return
+    with conexao.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existentes = {linha[0] for linha in cursor.fetchall()}
+        faltando = [nome for nome in TRIGGERS_SQLITE if nome not in existentes]
+        if not faltando:
+            return
+        for nome in faltando:
+            cursor.execute(TRIGGERS_SQLITE[nome])
+        cursor.execute(f"DELETE FROM {TABELA_FTS}")
+        cursor.execute(f"""
+            INSERT INTO {TABELA_FTS} (rowid, academia_id, nome_aluno, mensagem)
+            SELECT l.id, l.academia_id, a.nome_completo, l.mensagem
+            FROM core_logmensagem l LEFT JOIN core_aluno a ON a.id = l.aluno_id
+        """)
+
+
+def remover_triggers_sqlite(apps, schema_editor):
+    """ (RunPython) Apaga os triggers do FTS5 antes de uma recriação de tabela. """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for nome in TRIGGERS_SQLITE:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {nome}")
+
+
+def recriar_triggers_sqlite(apps, schema_editor):
+    """ (RunPython) Par do `remover_triggers_sqlite`, no fim da migração. """
+    garantir_indice_sqlite(using=schema_editor.connection.alias)
@@ -0,0 +1,199 @@
+# core/cache_llm.py
+
+"""
+Cache das respostas do LLM (Gemini).
+
+O relatório do `agente_ia` e o resumo inicial do assistente costumam ser
+idênticos de uma chamada para a outra (o dono recarrega o dashboard e o
+boletim é gerado de novo com os mesmos números). A resposta fica guardada em
+RespostaLLM, com a chave:
+
+    sha256(modelo | temperatura | prompt normalizado)
+
+A normalização junta espaços e quebras de linha repetidos, então diferenças
+só de indentação do template não geram outra chave. Datas fazem parte do
+prompt de propósito: uma resposta em cache nunca mostra o boletim de ontem.
+
+- Cada resposta vale LLM_CACHE_TTL segundos.
+- O cache guarda no máximo LLM_CACHE_MAX_ENTRADAS respostas; acima disso saem
+  as usadas há mais tempo.
+- Com temperatura maior que zero a resposta não é determinística e, por
+  padrão, não entra no cache (LLM_CACHE_COM_TEMPERATURA liga).
+- Acertos e falhas ficam em MetricaCacheLLM, por dia e modelo.
+- Com `academia`, os tokens das chamadas ao modelo (não as do cache) entram
+  no uso de IA da academia (core/cotas_ia.py); com `rotina`, à parte da cota
+  diária.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from langchain_core.messages import HumanMessage
+
+from .cotas_ia import contabilizar
+from .models import MetricaCacheLLM, RespostaLLM
+
+logger = logging.getLogger(__name__)
+
+_ESPACOS = re.compile(r'[ \t\r\f\v]+')
+_LINHAS_VAZIAS = re.compile(r'\n\s*\n+')
+
+
+def normalizar_prompt(texto):
+    texto = unicodedata.normalize('NFC', texto)
+    linhas = (_ESPACOS.sub(' ', linha).strip() for linha in texto.split('\n'))
+    return _LINHAS_VAZIAS.sub('\n\n', '\n'.join(linhas)).strip()
+
+
+def chave_cache(modelo, temperatura, prompt):
+    dados = json.dumps([modelo, round(float(temperatura or 0), 2), normalizar_prompt(prompt)], ensure_ascii=False)
+    return hashlib.sha256(dados.encode('utf-8')).hexdigest()
+
+
+def cacheavel(temperatura):
+    if not getattr(settings, 'LLM_CACHE_ATIVO', True):
+        return False
+    return not temperatura or getattr(settings, 'LLM_CACHE_COM_TEMPERATURA', False)
+
+
+def _registrar(modelo, acerto):
+    campo = 'acertos' if acerto else 'falhas'
+    hoje = datetime.date.today()
+    if not MetricaCacheLLM.objects.filter(data=hoje, modelo=modelo).update(**{campo: F(campo) + 1}):
+        metrica, criada = MetricaCacheLLM.objects.get_or_create(data=hoje, modelo=modelo, defaults={campo: 1})
+        if not criada:
+            MetricaCacheLLM.objects.filter(pk=metrica.pk).update(**{campo: F(campo) + 1})
+
+
+def obter(modelo, temperatura, prompt):
+    """ Resposta guardada (ou None), registrando o acerto/falha. """
+    agora = timezone.now()
+    chave = chave_cache(modelo, temperatura, prompt)
+    resposta = (
+        RespostaLLM.objects.filter(chave=chave, expira_em__gt=agora)
+        .values_list('resposta', flat=True).first()
+    )
+    if resposta is not None:
+        RespostaLLM.objects.filter(chave=chave).update(ultimo_acesso=agora, acertos=F('acertos') + 1)
+    _registrar(modelo, resposta is not None)
+    return resposta
+
+
+def guardar(modelo, temperatura, prompt, resposta, ttl=None):
+    agora = timezone.now()
+    ttl = ttl or getattr(settings, 'LLM_CACHE_TTL', 6 * 3600)
+    RespostaLLM.objects.update_or_create(
+        chave=chave_cache(modelo, temperatura, prompt),
+        defaults={
+            'modelo': modelo,
+            'temperatura': float(temperatura or 0),
+            'resposta': resposta,
+            'expira_em': agora + datetime.timedelta(seconds=ttl),
+            'ultimo_acesso': agora,
+        },
+    )
+    _despejar(agora)
+
+
+def _despejar(agora):
+    """ Apaga as vencidas e, acima do limite, as usadas há mais tempo. """
+    RespostaLLM.objects.filter(expira_em__lte=agora).delete()
+    limite = getattr(settings, 'LLM_CACHE_MAX_ENTRADAS', 2000)
+    excedentes = RespostaLLM.objects.count() - limite
+    if excedentes > 0:
+        antigas = list(RespostaLLM.objects.order_by('ultimo_acesso', 'id').values_list('id', flat=True)[:excedentes])
+        RespostaLLM.objects.filter(id__in=antigas).delete()
+
+
+def _descrever(llm):
+    return str(getattr(llm, 'model', None) or type(llm).__name__), getattr(llm, 'temperature', 0) or 0
+
+
+def invocar_com_cache(llm, prompt, ttl=None, academia=None, rotina=False):
+    """
+    Texto da resposta do `llm` para o `prompt`, reaproveitando a resposta
+    guardada quando houver. Falhas do cache nunca impedem a chamada ao modelo.
+    """
+    modelo, temperatura = _descrever(llm)
+    usar_cache = cacheavel(temperatura)
+    if usar_cache:
+        try:
+            resposta = obter(modelo, temperatura, prompt)
+            if resposta is not None:
+                return resposta
+        except Exception as e:
+            logger.warning("Cache do LLM indisponível: %s", e)
+            usar_cache = False
+
+    mensagem = llm.invoke([HumanMessage(content=prompt)])
+    resposta = mensagem.content
+    if academia is not None:
+        contabilizar(academia, mensagem, prompt, resposta, rotina=rotina)
+    if usar_cache and resposta:
+        try:
+            guardar(modelo, temperatura, prompt, resposta, ttl=ttl)
+        except Exception as e:
+            logger.warning("Não foi possível guardar a resposta do LLM no cache: %s", e)
+    return resposta
+
+
+async def transmitir_com_cache(llm, prompt, ttl=None, academia=None):
+    """
+    Versão assíncrona e em pedaços de `invocar_com_cache`: gera o texto
+    conforme o modelo responde (astream). Uma resposta em cache sai inteira,
+    de uma vez; a resposta nova é guardada quando o stream termina.
+    """
+    modelo, temperatura = _descrever(llm)
+    usar_cache = cacheavel(temperatura)
+    if usar_cache:
+        try:
+            resposta = await sync_to_async(obter)(modelo, temperatura, prompt)
+            if resposta is not None:
+                yield resposta
+                return
+        except Exception as e:
+            logger.warning("Cache do LLM indisponível: %s", e)
+            usar_cache = False
+
+    pedacos = []
+    mensagem = None  # Soma dos pedaços: junta também o usage_metadata que a API manda
+    async for pedaco in llm.astream([HumanMessage(content=prompt)]):
+        mensagem = pedaco if mensagem is None else mensagem + pedaco
+        if pedaco.content:
+            pedacos.append(pedaco.content)
+            yield pedaco.content
+
+    resposta = ''.join(pedacos)
+    if academia is not None:
+        await sync_to_async(contabilizar)(academia, mensagem, prompt, resposta)
+    if usar_cache and resposta:
+        try:
+            await sync_to_async(guardar)(modelo, temperatura, prompt, resposta, ttl=ttl)
+        except Exception as e:
+            logger.warning("Não foi possível guardar a resposta do LLM no cache: %s", e)
+
+
+def resumo_metricas(dias=30):
+    """ Acertos, falhas e taxa de acerto dos últimos `dias` (para monitoramento). """
+    desde = datetime.date.today() - datetime.timedelta(days=dias - 1)
+    metricas = list(MetricaCacheLLM.objects.filter(data__gte=desde).order_by('data', 'modelo'))
+    acertos = sum(m.acertos for m in metricas)
+    falhas = sum(m.falhas for m in metricas)
+    return {
+        'entradas': RespostaLLM.objects.count(),
+        'acertos': acertos,
+        'falhas': falhas,
+        'taxa_acerto': round(100 * acertos / (acertos + falhas), 1) if acertos + falhas else 0,
+        'por_dia': [
+            {'data': m.data.isoformat(), 'modelo': m.modelo, 'acertos': m.acertos, 'falhas': m.falhas}
+            for m in metricas
+        ],
+    }
@@ -0,0 +1,208 @@
+# core/compactador.py
+
+"""
+Compactação dos relatórios enviados ao LLM, dentro de um orçamento de tokens.
+
+Listar todos os inadimplentes, faltosos, ausentes e novos alunos pelo nome
+faz o prompt de uma academia grande passar de milhares de linhas (mais
+demora, mais custo e risco de o modelo cortar o texto). O relatório é
+montado em seções; se o texto completo passa do orçamento, cada seção vira:
+
+- uma linha de resumo com a contagem e a distribuição (faixas de atraso,
+  de dias sem vir, de presenças);
+- os alunos mais graves primeiro, distribuídos entre as seções (o 1º de cada
+  seção, depois o 2º de cada uma...) até o orçamento acabar ou cada seção
+  chegar a IA_RELATORIO_TOP_N nomes;
+- uma linha "... e mais N aluno(s)" com o que ficou de fora.
+
+A ordem de gravidade tem o nome como desempate, então os mesmos dados dão
+sempre o mesmo texto (o que também ajuda o cache de respostas do LLM).
+
+Os tokens são estimados (~4 caracteres por token, o suficiente para o
+orçamento) para não depender de uma chamada ao modelo só para contar.
+"""
+
+import datetime
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+
+CARACTERES_POR_TOKEN = 4
+
+
+def estimar_tokens(texto):
+    return (len(texto) + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+
+@dataclass
+class Secao:
+    titulo: str
+    itens: list  # Linhas dos alunos, da mais grave para a menos grave
+    resumo: str = ''  # Contagem e distribuição (só aparece no relatório compactado)
+    vazio: str = 'Nenhum aluno.'
+
+
+@dataclass
+class RelatorioCompacto:
+    texto: str
+    tokens: int
+    tokens_completo: int
+    omitidos: dict = field(default_factory=dict)  # título da seção -> alunos que ficaram de fora
+
+    @property
+    def tokens_economizados(self):
+        return self.tokens_completo - self.tokens
+
+    @property
+    def compactado(self):
+        return self.tokens < self.tokens_completo
+
+
+def _montar(secoes, mostrados, compacto, rodape):
+    partes = []
+    for secao, quantidade in zip(secoes, mostrados):
+        linhas = [secao.titulo]
+        if not secao.itens:
+            linhas.append(secao.vazio)
+        else:
+            if compacto and secao.resumo:
+                linhas.append(secao.resumo)
+            linhas.extend(f"- {item}" for item in secao.itens[:quantidade])
+            if quantidade < len(secao.itens):
+                linhas.append(f"- ... e mais {len(secao.itens) - quantidade} aluno(s)")
+        partes.append("\n".join(linhas))
+    if rodape:
+        partes.append(rodape)
+    return "\n\n".join(partes) + "\n"
+
+
+def compactar(secoes, orcamento_tokens=None, rodape='', top_n=None):
+    """
+    Texto das `secoes` (+ `rodape`, sempre inteiro) em até `orcamento_tokens`
+    tokens, quando possível. Devolve um RelatorioCompacto.
+    """
+    orcamento = orcamento_tokens or getattr(settings, 'IA_RELATORIO_ORCAMENTO_TOKENS', 1500)
+    top_n = top_n or getattr(settings, 'IA_RELATORIO_TOP_N', 10)
+
+    completo = _montar(secoes, [len(s.itens) for s in secoes], False, rodape)
+    tokens_completo = estimar_tokens(completo)
+    if tokens_completo <= orcamento:
+        return RelatorioCompacto(completo, tokens_completo, tokens_completo)
+
+    # Começa só com os resumos e vai incluindo um aluno de cada seção por vez
+    mostrados = [0] * len(secoes)
+    texto = _montar(secoes, mostrados, True, rodape)
+    posicao = 0
+    while posicao < top_n:
+        incluiu = False
+        for i, secao in enumerate(secoes):
+            if posicao >= len(secao.itens):
+                continue
+            tentativa = mostrados[:i] + [posicao + 1] + mostrados[i + 1:]
+            candidato = _montar(secoes, tentativa, True, rodape)
+            if estimar_tokens(candidato) > orcamento:
+                continue
+            mostrados, texto, incluiu = tentativa, candidato, True
+        if not incluiu:
+            break
+        posicao += 1
+
+    return RelatorioCompacto(
+        texto, estimar_tokens(texto), tokens_completo,
+        omitidos={s.titulo: len(s.itens) - n for s, n in zip(secoes, mostrados) if n < len(s.itens)},
+    )
+
+
+# -----------------------------------------------------------------------------
+# SEÇÕES A PARTIR DO RETRATO DO DIA (core/snapshot.py)
+# -----------------------------------------------------------------------------
+
+def _distribuicao(rotulos, valores):
+    contagem = {rotulo: 0 for rotulo in rotulos}
+    for valor in valores:
+        contagem[valor] += 1
+    return ", ".join(f"{rotulo}: {total}" for rotulo, total in contagem.items() if total)
+
+
+def _faixa_atraso(dias):
+    if dias <= 30:
+        return 'até 30 dias'
+    return '31 a 60 dias' if dias <= 60 else 'mais de 60 dias'
+
+
+def _faixa_ausencia(dias):
+    if dias is None:
+        return 'nunca vieram'
+    if dias <= 7:
+        return 'até 7 dias'
+    return '8 a 30 dias' if dias <= 30 else 'mais de 30 dias'
+
+
+def secao_inadimplentes(snapshot, titulo):
+    hoje = snapshot.data
+    alunos = sorted(
+        snapshot.inadimplentes,
+        key=lambda a: (-(a.valor_vencido or 0), a.vencida_desde or hoje, a.nome_completo),
+    )
+    total = sum((a.valor_vencido or Decimal('0') for a in alunos), Decimal('0'))
+    atrasos = [(hoje - (a.vencida_desde or hoje)).days for a in alunos]
+    return Secao(
+        titulo=titulo,
+        itens=[
+            f"{a.nome_completo} (R$ {a.valor_vencido or 0:.2f} vencidos desde {a.vencida_desde:%d/%m/%Y})"
+            if a.vencida_desde else a.nome_completo
+            for a in alunos
+        ],
+        resumo=(
+            f"{len(alunos)} aluno(s), R$ {total:.2f} vencidos. Atraso: "
+            f"{_distribuicao(['até 30 dias', '31 a 60 dias', 'mais de 60 dias'], map(_faixa_atraso, atrasos))}."
+        ),
+        vazio="Nenhum aluno inadimplente.",
+    )
+
+
+def secao_faltosos(snapshot, titulo):
+    # O retrato já traz os faltosos do que menos veio para o que mais veio
+    alunos = sorted(snapshot.faltosos, key=lambda a: (a.num_presencas, a.nome_completo))
+    return Secao(
+        titulo=titulo,
+        itens=[f"{a.nome_completo} ({a.num_presencas} presença(s) em 30 dias)" for a in alunos],
+        resumo=(
+            f"{len(alunos)} aluno(s). Presenças em 30 dias: "
+            f"{_distribuicao(sorted({a.num_presencas for a in alunos}), (a.num_presencas for a in alunos))}."
+        ),
+        vazio="Nenhum aluno com baixa frequência.",
+    )
+
+
+def secao_ausentes(snapshot, titulo):
+    hoje = snapshot.data
+    dias = {a.pk: (hoje - a.ultima_presenca).days if a.ultima_presenca else None for a in snapshot.ausentes}
+    # Quem nunca veio primeiro, depois quem está há mais tempo sem vir
+    alunos = sorted(snapshot.ausentes, key=lambda a: (dias[a.pk] is not None, -(dias[a.pk] or 0), a.nome_completo))
+    return Secao(
+        titulo=titulo,
+        itens=[
+            f"{a.nome_completo} ({'nunca registrou presença' if dias[a.pk] is None else f'{dias[a.pk]} dias sem vir'})"
+            for a in alunos
+        ],
+        resumo=(
+            f"{len(alunos)} aluno(s). Sem vir há: "
+            f"{_distribuicao(['nunca vieram', 'até 7 dias', '8 a 30 dias', 'mais de 30 dias'], (_faixa_ausencia(dias[a.pk]) for a in alunos))}."
+        ),
+        vazio="Nenhum aluno ausente.",
+    )
+
+
+def secao_novos_alunos(snapshot, titulo):
+    alunos = sorted(
+        snapshot.novos_alunos,
+        key=lambda a: (-(a.data_matricula or datetime.date.min).toordinal(), a.nome_completo),
+    )
+    return Secao(
+        titulo=titulo,
+        itens=[f"{a.nome_completo} (matriculado em {a.data_matricula:%d/%m/%Y})" for a in alunos],
+        resumo=f"{len(alunos)} aluno(s) matriculado(s) na última semana.",
+        vazio="Nenhum novo aluno nos últimos 7 dias.",
+    )
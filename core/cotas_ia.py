@@ -0,0 +1,273 @@
+# core/cotas_ia.py
+
+"""
+Limites de uso do assistente de IA por academia, conforme o PlanoSaaS.
+
+Sem limite, um dono recarregando o painel sem parar ocupa os workers e a cota
+da API do Gemini de todo mundo. Cada academia tem:
+
+- um balde de fichas (token bucket) para as perguntas: cabem
+  `ia_requisicoes_por_minuto` fichas, cada pergunta gasta uma e elas voltam
+  aos poucos (a mesma quantidade por minuto). Balde vazio: 429, com
+  Retry-After;
+- no máximo `ia_geracoes_simultaneas` respostas do LLM em andamento. Cada
+  geração ocupa uma vaga (uma linha de GeracaoIA, única por academia e vaga);
+  se o processo morrer no meio, a vaga vence em IA_GERACAO_TEMPO_MAXIMO;
+- uma cota diária de tokens do LLM, `ia_tokens_por_dia`. Só as chamadas ao
+  modelo feitas pelo painel gastam a cota: respostas do caminho rápido
+  (core/intencoes.py), do cache e o boletim já guardado não contam, e as das
+  rotinas em segundo plano (agente_ia, gerar_boletins) ficam somadas à parte.
+
+O estado fica no banco, como o do disjuntor (core/disjuntor.py): os processos
+web todos veem o mesmo balde e as mesmas vagas. As escritas não leem antes de
+escrever (UPDATE condicional e INSERT com a chave única) para não travar o
+SQLite. Academias sem assinatura SaaS em teste ou ativa usam
+IA_LIMITES_SEM_PLANO; zero em qualquer limite quer dizer sem limite.
+
+Os tokens de cada chamada ao modelo (os que a API informa ou, sem essa
+informação, a estimativa de core/compactador.py) ficam somados em UsoIA, por
+academia e dia, junto com as perguntas aceitas e recusadas.
+"""
+
+import datetime
+import logging
+import math
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .compactador import estimar_tokens
+from .models import BaldeIA, GeracaoIA, PlanoSaaS, UsoIA
+
+logger = logging.getLogger(__name__)
+
+TENTATIVAS_BALDE = 5
+CACHE_LIMITES_SEGUNDOS = 60
+
+# Só a assinatura nesses estados dá os limites do plano; nos demais valem os de quem não tem plano
+ASSINATURAS_COM_PLANO = ['trial', 'ativa']
+
+
+class LimiteIA(Exception):
+    """ Pergunta recusada por um limite do plano; `tentar_em` é o Retry-After, em segundos. """
+
+    def __init__(self, mensagem, tentar_em=None):
+        super().__init__(mensagem)
+        self.tentar_em = tentar_em
+
+
+def _ativas():
+    return getattr(settings, 'IA_COTAS_ATIVAS', True)
+
+
+def limites(academia):
+    """ Limites de IA do plano da academia (guardados por um minuto no cache do processo). """
+    chave = f"limites_ia:{academia.pk}"
+    valores = cache.get(chave)
+    if valores is None:
+        plano = (
+            PlanoSaaS.objects.filter(assinaturas__academia=academia, assinaturas__status__in=ASSINATURAS_COM_PLANO)
+            .values('ia_requisicoes_por_minuto', 'ia_geracoes_simultaneas', 'ia_tokens_por_dia').first()
+        )
+        if plano:
+            valores = {
+                'requisicoes_por_minuto': plano['ia_requisicoes_por_minuto'],
+                'geracoes_simultaneas': plano['ia_geracoes_simultaneas'],
+                'tokens_por_dia': plano['ia_tokens_por_dia'],
+            }
+        else:
+            valores = dict(getattr(settings, 'IA_LIMITES_SEM_PLANO', {
+                'requisicoes_por_minuto': 10, 'geracoes_simultaneas': 1, 'tokens_por_dia': 50000,
+            }))
+        cache.set(chave, valores, CACHE_LIMITES_SEGUNDOS)
+    return valores
+
+
+def _contar(academia, **campos):
+    """ Soma `campos` no uso do dia da academia (UPDATE e, se não havia, INSERT). """
+    hoje = datetime.date.today()
+    uso = UsoIA.all_objects.filter(academia=academia, data=hoje)
+    if not uso.update(**{campo: F(campo) + valor for campo, valor in campos.items()}):
+        try:
+            with transaction.atomic():
+                UsoIA.all_objects.create(academia=academia, data=hoje, **campos)
+        except IntegrityError:
+            uso.update(**{campo: F(campo) + valor for campo, valor in campos.items()})
+
+
+# -----------------------------------------------------------------------------
+# BALDE DE PERGUNTAS
+# -----------------------------------------------------------------------------
+
+def consumir_requisicao(academia):
+    """ Gasta uma ficha do balde da academia; sem fichas, levanta LimiteIA. """
+    taxa = limites(academia)['requisicoes_por_minuto'] if _ativas() else 0
+    if not taxa:
+        _contar(academia, requisicoes=1)
+        return
+
+    for _ in range(TENTATIVAS_BALDE):
+        agora = timezone.now()
+        balde = BaldeIA.all_objects.filter(academia=academia).values_list('fichas', 'atualizado_em').first()
+        if balde is None:
+            try:
+                with transaction.atomic():
+                    BaldeIA.all_objects.create(academia=academia, fichas=taxa - 1, atualizado_em=agora)
+                break
+            except IntegrityError:
+                continue
+
+        fichas, atualizado_em = balde
+        fichas = min(float(taxa), fichas + max((agora - atualizado_em).total_seconds(), 0) * taxa / 60)
+        if fichas < 1:
+            _contar(academia, recusadas=1)
+            raise LimiteIA(
+                "Muitas perguntas ao assistente em pouco tempo. Aguarde alguns segundos e tente de novo.",
+                tentar_em=math.ceil((1 - fichas) * 60 / taxa),
+            )
+        # Só grava se ninguém mexeu no balde desde a leitura; senão lê de novo
+        if BaldeIA.all_objects.filter(academia=academia, atualizado_em=atualizado_em).update(
+            fichas=fichas - 1, atualizado_em=agora,
+        ):
+            break
+    else:
+        _contar(academia, recusadas=1)
+        raise LimiteIA("O assistente está ocupado com outras perguntas desta academia. Tente de novo.", tentar_em=1)
+
+    _contar(academia, requisicoes=1)
+
+
+# -----------------------------------------------------------------------------
+# GERAÇÕES EM ANDAMENTO E COTA DIÁRIA DE TOKENS
+# -----------------------------------------------------------------------------
+
+def tokens_usados_hoje(academia):
+    total = UsoIA.all_objects.filter(academia=academia, data=datetime.date.today()).aggregate(
+        total=Sum(F('tokens_prompt') + F('tokens_resposta')),
+    )['total']
+    return total or 0
+
+
+def iniciar_geracao(academia):
+    """
+    Confere a cota de tokens do dia e ocupa uma vaga de geração. Retorna a
+    GeracaoIA (None sem limite de vagas) ou levanta LimiteIA.
+    """
+    if not _ativas():
+        return None
+    valores = limites(academia)
+
+    if valores['tokens_por_dia'] and tokens_usados_hoje(academia) >= valores['tokens_por_dia']:
+        _contar(academia, recusadas=1)
+        amanha = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+        raise LimiteIA(
+            "O limite diário de uso da IA do seu plano foi atingido. As perguntas sobre os dados da academia "
+            "continuam respondidas normalmente; as demais voltam amanhã.",
+            tentar_em=math.ceil((amanha - timezone.localtime()).total_seconds()),
+        )
+
+    maximo = valores['geracoes_simultaneas']
+    if not maximo:
+        return None
+    agora = timezone.now()
+    vencidas = agora - datetime.timedelta(seconds=getattr(settings, 'IA_GERACAO_TEMPO_MAXIMO', 180))
+    GeracaoIA.all_objects.filter(academia=academia, iniciada_em__lt=vencidas).delete()
+    for vaga in range(maximo):
+        try:
+            with transaction.atomic():
+                return GeracaoIA.all_objects.create(academia=academia, vaga=vaga, iniciada_em=agora)
+        except IntegrityError:
+            continue
+
+    _contar(academia, recusadas=1)
+    raise LimiteIA(
+        f"Já há {maximo} resposta(s) do assistente sendo gerada(s) para esta academia. Aguarde e tente de novo.",
+        tentar_em=5,
+    )
+
+
+def encerrar_geracao(geracao):
+    if geracao is not None:
+        # Pela pk: se a vaga venceu e foi ocupada por outra geração, a outra continua lá
+        GeracaoIA.all_objects.filter(pk=geracao.pk).delete()
+
+
+@contextmanager
+def geracao_ia(academia):
+    """ Ocupa uma vaga de geração dentro do bloco (LimiteIA se não houver). """
+    geracao = iniciar_geracao(academia)
+    try:
+        yield
+    finally:
+        encerrar_geracao(geracao)
+
+
+# -----------------------------------------------------------------------------
+# TOKENS
+# -----------------------------------------------------------------------------
+
+def contabilizar(academia, mensagem, prompt, resposta, rotina=False):
+    """
+    Soma os tokens de uma chamada ao modelo no uso do dia. Usa o
+    usage_metadata da resposta quando a API informa; senão, estima.
+    Com `rotina` (agente_ia, gerar_boletins) os tokens ficam nos campos
+    das rotinas e não gastam a cota diária. Falhas aqui nunca derrubam a resposta.
+    """
+    uso = getattr(mensagem, 'usage_metadata', None) or {}
+    tokens_prompt = uso.get('input_tokens') or estimar_tokens(prompt)
+    tokens_resposta = uso.get('output_tokens') or estimar_tokens(resposta or '')
+    if rotina:
+        campos = {'chamadas_rotina': 1, 'tokens_rotina_prompt': tokens_prompt, 'tokens_rotina_resposta': tokens_resposta}
+    else:
+        campos = {'chamadas_llm': 1, 'tokens_prompt': tokens_prompt, 'tokens_resposta': tokens_resposta}
+    try:
+        _contar(academia, **campos)
+    except Exception as e:
+        logger.warning("Não foi possível registrar o uso da IA da academia %s: %s", getattr(academia, 'pk', academia), e)
+
+
+def resumo_uso(dias=30):
+    """
+    Uso da IA por academia nos últimos `dias`, de quem mais gastou tokens para
+    quem menos (monitoramento). `tokens` é o que conta para a cota; `tokens_rotina`,
+    o das rotinas em segundo plano.
+    """
+    desde = datetime.date.today() - datetime.timedelta(days=dias - 1)
+    linhas = (
+        UsoIA.all_objects.filter(data__gte=desde)
+        .values('academia_id', 'academia__nome_fantasia')
+        .annotate(
+            requisicoes=Sum('requisicoes'), recusadas=Sum('recusadas'), chamadas_llm=Sum('chamadas_llm'),
+            tokens_prompt=Sum('tokens_prompt'), tokens_resposta=Sum('tokens_resposta'),
+            chamadas_rotina=Sum('chamadas_rotina'),
+            tokens_rotina=Sum(F('tokens_rotina_prompt') + F('tokens_rotina_resposta')),
+        )
+        .order_by()
+    )
+    academias = [
+        {
+            'academia_id': linha['academia_id'],
+            'academia': linha['academia__nome_fantasia'],
+            'requisicoes': linha['requisicoes'],
+            'recusadas': linha['recusadas'],
+            'chamadas_llm': linha['chamadas_llm'],
+            'tokens_prompt': linha['tokens_prompt'],
+            'tokens_resposta': linha['tokens_resposta'],
+            'tokens': linha['tokens_prompt'] + linha['tokens_resposta'],
+            'chamadas_rotina': linha['chamadas_rotina'],
+            'tokens_rotina': linha['tokens_rotina'],
+        }
+        for linha in linhas
+    ]
+    academias.sort(key=lambda a: (-(a['tokens'] + a['tokens_rotina']), a['academia_id']))
+    return {
+        'dias': dias,
+        'tokens': sum(a['tokens'] for a in academias),
+        'tokens_rotina': sum(a['tokens_rotina'] for a in academias),
+        'recusadas': sum(a['recusadas'] for a in academias),
+        'academias': academias,
+    }
@@ -0,0 +1,248 @@
+# core/disjuntor.py
+
+"""
+Circuit breaker (disjuntor) das chamadas ao gateway do WhatsApp.
+
+Quando o gateway Node.js trava, cada chamada fica presa até o timeout de
+leitura. O disjuntor acompanha o resultado e a latência das chamadas e "abre"
+depois de WHATSAPP_DISJUNTOR_FALHAS falhas seguidas ou quando o p95 da latência
+passa de WHATSAPP_DISJUNTOR_P95_MS. Aberto, as chamadas são recusadas na hora
+(CircuitoAberto). Passado WHATSAPP_DISJUNTOR_TEMPO_ABERTO, UMA chamada de teste
+é liberada (meio aberto): se der certo o disjuntor fecha, senão abre de novo.
+
+O estado fica no banco (DisjuntorGateway), então web, agendador e workers de
+vários processos veem o mesmo disjuntor. Para não ir ao banco a cada mensagem,
+cada processo guarda uma cópia do estado e os resultados ainda não gravados:
+
+- `bloqueado()` e `anotar()` só usam a cópia local (podem ser chamados das
+  threads de envio, que não acessam o banco). Falhas seguidas abrem a cópia
+  local na hora, e o resto do lote em andamento já não espera o timeout.
+- `permitir()` e `sincronizar()` leem/gravam o banco e são chamados por quem
+  tem conexão: o worker da fila entre um lote e outro e as views.
+"""
+
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DisjuntorGateway
+
+logger = logging.getLogger(__name__)
+
+# Latências mínimas na janela antes de avaliar o p95
+AMOSTRAS_MINIMAS = 20
+
+
+class CircuitoAberto(requests.exceptions.ConnectionError):
+    """ Chamada recusada sem tocar no gateway, porque o disjuntor está aberto. """
+
+
+def _config(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def percentil_95(latencias):
+    if not latencias:
+        return None
+    ordenadas = sorted(latencias)
+    return ordenadas[max(math.ceil(len(ordenadas) * 0.95) - 1, 0)]
+
+
+def _obter_registro(nome):
+    try:
+        return DisjuntorGateway.objects.select_for_update().get(nome=nome)
+    except DisjuntorGateway.DoesNotExist:
+        try:
+            with transaction.atomic():
+                return DisjuntorGateway.objects.create(nome=nome)
+        except IntegrityError:
+            # Outro processo criou o registro ao mesmo tempo
+            return DisjuntorGateway.objects.select_for_update().get(nome=nome)
+
+
+def _abrir(registro, agora, motivo):
+    registro.estado = 'aberto'
+    registro.aberto_em = agora
+    registro.proxima_tentativa = agora + timedelta(seconds=_config('WHATSAPP_DISJUNTOR_TEMPO_ABERTO', 30))
+    registro.sonda_ate = None
+    registro.motivo = motivo[:255]
+    registro.aberturas += 1
+    # A janela de latências recomeça: as amostras antigas não valem depois do teste
+    registro.latencias_ms = []
+    logger.warning("Disjuntor do gateway %s ABERTO: %s", registro.nome, motivo)
+
+
+def _fechar(registro):
+    registro.estado = 'fechado'
+    registro.falhas_consecutivas = 0
+    registro.latencias_ms = []
+    registro.proxima_tentativa = None
+    registro.sonda_ate = None
+    logger.info("Disjuntor do gateway %s fechado: chamada de teste bem-sucedida.", registro.nome)
+
+
+class Disjuntor:
+
+    def __init__(self, nome):
+        self.nome = nome[:200]
+        self._lock = threading.Lock()
+        self._pendentes = []  # (sucesso, latencia_ms) ainda não gravados no banco
+        self._rejeitadas = 0
+        self._falhas_locais = 0
+        self._sondando = False  # Este processo está com a chamada de teste
+        self._lido_em = None
+        self._estado = 'fechado'
+        self._proxima_tentativa = None
+        self._sonda_ate = None
+
+    @property
+    def sondando(self):
+        return self._sondando
+
+    # -- Cópia local (sem banco) ---------------------------------------------------
+
+    def bloqueado(self):
+        """ Se a chamada deve ser recusada agora, pela cópia local do estado. """
+        with self._lock:
+            if self._estado == 'fechado' or self._sondando:
+                return False
+            self._rejeitadas += 1
+            return True
+
+    def anotar(self, sucesso, latencia_ms=None):
+        """ Guarda o resultado de uma chamada (gravado no próximo `sincronizar`). """
+        with self._lock:
+            self._pendentes.append((sucesso, latencia_ms))
+            if sucesso:
+                self._falhas_locais = 0
+                return
+            self._falhas_locais += 1
+            if self._estado == 'fechado' and self._falhas_locais >= _config('WHATSAPP_DISJUNTOR_FALHAS', 5):
+                self._estado = 'aberto'
+                self._proxima_tentativa = timezone.now() + timedelta(seconds=_config('WHATSAPP_DISJUNTOR_TEMPO_ABERTO', 30))
+
+    # -- Estado compartilhado (banco) -----------------------------------------------
+
+    def permitir(self):
+        """
+        Se uma chamada pode ser feita agora. Com o disjuntor aberto e o tempo
+        de espera vencido, reivindica a chamada de teste (só um processo
+        consegue) e retorna True para ela.
+        """
+        self.sincronizar()
+        agora = timezone.now()
+        with self._lock:
+            if self._estado == 'fechado' or self._sondando:
+                return True
+            pode_testar = (
+                (self._estado == 'aberto' and self._proxima_tentativa and agora >= self._proxima_tentativa)
+                or (self._estado == 'meio_aberto' and self._sonda_ate and agora >= self._sonda_ate)
+            )
+        if pode_testar and self._reivindicar_teste(agora):
+            return True
+        with self._lock:
+            self._rejeitadas += 1
+        return False
+
+    def _reivindicar_teste(self, agora):
+        prazo = agora + timedelta(seconds=_config('WHATSAPP_GATEWAY_TIMEOUT_LOTE', 120))
+        reivindicado = DisjuntorGateway.objects.filter(nome=self.nome).filter(
+            Q(estado='aberto', proxima_tentativa__lte=agora) | Q(estado='meio_aberto', sonda_ate__lte=agora)
+        ).update(estado='meio_aberto', sonda_ate=prazo)
+        if not reivindicado:
+            return False
+        with self._lock:
+            self._estado, self._sonda_ate, self._sondando = 'meio_aberto', prazo, True
+            self._falhas_locais = 0
+        logger.info("Disjuntor do gateway %s meio aberto: liberando uma chamada de teste.", self.nome)
+        return True
+
+    def sincronizar(self, forcar=False):
+        """
+        Grava os resultados anotados e atualiza a cópia local com o estado do
+        banco. Sem `forcar`, só lê o banco a cada WHATSAPP_DISJUNTOR_SINCRONIZAR segundos.
+        """
+        with self._lock:
+            recente = self._lido_em is not None and \
+                time.monotonic() - self._lido_em < _config('WHATSAPP_DISJUNTOR_SINCRONIZAR', 1)
+            if recente and not forcar and not self._pendentes:
+                return
+            pendentes, self._pendentes = self._pendentes, []
+            rejeitadas, self._rejeitadas = self._rejeitadas, 0
+            sondando = self._sondando
+
+        if pendentes or rejeitadas:
+            registro = self._gravar(pendentes, rejeitadas, sondando)
+        else:
+            registro = DisjuntorGateway.objects.filter(nome=self.nome).first()
+
+        with self._lock:
+            self._lido_em = time.monotonic()
+            if registro is None:
+                self._estado, self._proxima_tentativa, self._sonda_ate = 'fechado', None, None
+            else:
+                self._estado = registro.estado
+                self._proxima_tentativa = registro.proxima_tentativa
+                self._sonda_ate = registro.sonda_ate
+            if self._estado != 'meio_aberto' or (self._sonda_ate and timezone.now() >= self._sonda_ate):
+                self._sondando = False
+            if pendentes and registro is not None and self._estado == 'fechado':
+                # Falhas seguidas somando todos os processos
+                self._falhas_locais = registro.falhas_consecutivas
+
+    def _gravar(self, pendentes, rejeitadas, sondando):
+        agora = timezone.now()
+        amostras = _config('WHATSAPP_DISJUNTOR_AMOSTRAS', 50)
+        with transaction.atomic():
+            registro = _obter_registro(self.nome)
+            registro.chamadas += len(pendentes)
+            registro.falhas += sum(1 for sucesso, _ in pendentes if not sucesso)
+            registro.rejeitadas += rejeitadas
+
+            for sucesso, latencia in pendentes:
+                registro.falhas_consecutivas = 0 if sucesso else registro.falhas_consecutivas + 1
+                if latencia is not None:
+                    registro.latencias_ms.append(round(latencia))
+            registro.latencias_ms = registro.latencias_ms[-amostras:]
+
+            if registro.estado == 'meio_aberto' and sondando and pendentes:
+                if pendentes[-1][0]:
+                    _fechar(registro)
+                else:
+                    _abrir(registro, agora, "Falha na chamada de teste.")
+            elif registro.estado == 'fechado':
+                limite_falhas = _config('WHATSAPP_DISJUNTOR_FALHAS', 5)
+                limite_p95 = _config('WHATSAPP_DISJUNTOR_P95_MS', 8000)
+                p95 = percentil_95(registro.latencias_ms) if len(registro.latencias_ms) >= AMOSTRAS_MINIMAS else None
+                if registro.falhas_consecutivas >= limite_falhas:
+                    _abrir(registro, agora, f"{registro.falhas_consecutivas} falhas seguidas.")
+                elif p95 is not None and p95 > limite_p95:
+                    _abrir(registro, agora, f"Latência p95 de {p95} ms (limite {limite_p95} ms).")
+            registro.save()
+        return registro
+
+
+def resumo_disjuntor(registro):
+    return {
+        'nome': registro.nome,
+        'estado': registro.estado,
+        'falhas_consecutivas': registro.falhas_consecutivas,
+        'latencia_p95_ms': percentil_95(registro.latencias_ms),
+        'amostras_latencia': len(registro.latencias_ms),
+        'aberto_em': registro.aberto_em.isoformat() if registro.aberto_em else None,
+        'proxima_tentativa': registro.proxima_tentativa.isoformat() if registro.proxima_tentativa else None,
+        'motivo': registro.motivo,
+        'chamadas': registro.chamadas,
+        'falhas': registro.falhas,
+        'rejeitadas': registro.rejeitadas,
+        'aberturas': registro.aberturas,
+        'atualizado_em': registro.atualizado_em.isoformat(),
+    }
@@ -0,0 +1,127 @@
+# core/execucao_agente.py
+
+"""
+Rodada diária do agente de IA em todas as academias ativas.
+
+Cada academia roda o comando `agente_ia` em uma thread de um pool limitado
+(AGENTE_IA_WORKERS): o trabalho é quase todo espera de rede (banco e Gemini),
+então threads bastam. Uma academia que demora mais que AGENTE_IA_TIMEOUT
+segundos é dada como "tempo esgotado" e a rodada segue sem ela; um erro em
+uma academia não derruba as outras. O resumo (duração e resultado de cada
+academia) fica em ExecucaoAgente.
+
+O `agente_ia` levanta CommandError quando não há API Key ou o Gemini falha,
+então essas academias entram no resumo como 'erro', não como 'sucesso'.
+
+Uma thread não pode ser interrompida de fora: a academia com tempo esgotado
+continua ocupando a sua thread até a chamada travada voltar (a chamada ao
+Gemini tem o seu próprio timeout, AGENTE_IA_TIMEOUT_LLM). A rodada é fechada
+e o resumo gravado sem esperar por ela, mas o processo não: as threads do
+pool não são daemon e o Python as espera antes de sair. O comando
+`executar_agente_ia` só termina depois que a última chamada travada voltar
+(no máximo por volta de AGENTE_IA_TIMEOUT_LLM depois do tempo esgotado).
+"""
+
+import io
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.utils import timezone
+
+from .models import Academia, ExecucaoAgente
+
+logger = logging.getLogger(__name__)
+
+# Academias com a assinatura SaaS nesses estados não rodam o agente
+ASSINATURAS_INATIVAS = ['suspensa', 'cancelada', 'expirada']
+
+
+def academias_ativas():
+    return (
+        Academia.objects.filter(ativa=True)
+        .exclude(assinatura_saas__status__in=ASSINATURAS_INATIVAS)
+        .only('id', 'nome_fantasia')
+        .order_by('id')
+    )
+
+
+def _executar_academia(academia_id, iniciadas):
+    """ Roda o agente de uma academia (em uma thread do pool). """
+    iniciadas[academia_id] = time.monotonic()
+    saida = io.StringIO()
+    try:
+        call_command('agente_ia', academia_id, stdout=saida, stderr=saida)
+        return {'status': 'sucesso'}
+    except Exception as e:
+        logger.exception("Erro no agente de IA da academia %s.", academia_id)
+        return {'status': 'erro', 'erro': str(e)[:500]}
+    finally:
+        logger.debug("Saída do agente de IA da academia %s:\n%s", academia_id, saida.getvalue())
+        # Conexões com o banco são por thread: fecha as desta antes de devolvê-la ao pool
+        connections.close_all()
+
+
+def executar_agente(academias=None, workers=None, timeout=None, ao_terminar=None):
+    """
+    Roda o agente em paralelo nas academias (padrão: todas as ativas) e
+    devolve a ExecucaoAgente com o resumo. `ao_terminar(resultado)` é chamado
+    a cada academia concluída, para quem quiser acompanhar o andamento.
+    """
+    workers = max(workers or getattr(settings, 'AGENTE_IA_WORKERS', 8), 1)
+    timeout = timeout or getattr(settings, 'AGENTE_IA_TIMEOUT', 300)
+    academias = list(academias if academias is not None else academias_ativas())
+
+    execucao = ExecucaoAgente.objects.create(
+        workers=workers, timeout_segundos=timeout, total_academias=len(academias),
+    )
+    inicio = time.monotonic()
+    contagem = {'sucesso': 0, 'erro': 0, 'tempo_esgotado': 0}
+
+    def registrar(academia, resultado, duracao):
+        resultado = {
+            'academia_id': academia.id,
+            'academia': academia.nome_fantasia,
+            'duracao_segundos': round(duracao, 2),
+            **resultado,
+        }
+        contagem[resultado['status']] += 1
+        execucao.resultados.append(resultado)
+        if ao_terminar:
+            ao_terminar(resultado)
+
+    iniciadas = {}
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='agente-ia')
+    try:
+        futuros = {executor.submit(_executar_academia, academia.id, iniciadas): academia for academia in academias}
+        pendentes = set(futuros)
+        while pendentes:
+            prontos, pendentes = wait(pendentes, timeout=1, return_when=FIRST_COMPLETED)
+            agora = time.monotonic()
+            for futuro in prontos:
+                academia = futuros[futuro]
+                registrar(academia, futuro.result(), agora - iniciadas.get(academia.id, agora))
+
+            # O prazo de cada academia conta a partir do momento em que ela começou a rodar
+            for futuro in [f for f in pendentes if f.running()]:
+                academia = futuros[futuro]
+                comecou = iniciadas.get(academia.id)
+                if comecou is not None and agora - comecou > timeout:
+                    pendentes.discard(futuro)
+                    logger.warning("Agente de IA da academia %s passou de %ss; seguindo sem ela.", academia.id, timeout)
+                    registrar(academia, {'status': 'tempo_esgotado', 'erro': f"Passou de {timeout}s."}, agora - comecou)
+    finally:
+        # A rodada não espera as threads com tempo esgotado (o processo, sim, antes de sair)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    execucao.sucessos = contagem['sucesso']
+    execucao.erros = contagem['erro']
+    execucao.tempo_esgotado = contagem['tempo_esgotado']
+    execucao.duracao_segundos = round(time.monotonic() - inicio, 2)
+    execucao.status = 'concluida'
+    execucao.concluida_em = timezone.now()
+    execucao.save()
+    return execucao
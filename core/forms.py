@@ -8,6 +8,7 @@ from .models import (
     Academia, Aluno, Turma, Horario, Modalidade, Professor,
     Plano, Assinatura, Fatura, DiaNaoLetivo, Graduacao, ExameGraduacao, HistoricoGraduacao, InscricaoExame
 )
+from .segmentos import FINANCEIRO, SITUACOES, rotulo_turma, turmas_da_academia
 
 # -----------------------------------------------------------------------------
 # FORMULÁRIOS DE CADASTRO INICIAL
@@ -271,8 +272,16 @@ class ConfiguracaoWhatsAppForm(forms.ModelForm):
             'notificar_inadimplencia',
             'notificar_boas_vindas',
             'notificar_faltas',
-            'notificar_graduacao'
+            'notificar_graduacao',
+            'whatsapp_mensagens_por_minuto',
+            'whatsapp_rajada',
+            'whatsapp_horario_inicio',
+            'whatsapp_horario_fim',
         ]
+        widgets = {
+            'whatsapp_horario_inicio': forms.TimeInput(attrs={'type': 'time'}),
+            'whatsapp_horario_fim': forms.TimeInput(attrs={'type': 'time'}),
+        }
 
 # Criamos um widget customizado para renderizar a imagem no radio button
 class ImageRadioSelect(forms.RadioSelect):
@@ -372,6 +381,56 @@ class ReprovacaoForm(forms.ModelForm):
         }
 
 
+# -----------------------------------------------------------------------------
+# FORMULÁRIO DE TRANSMISSÃO (MENSAGEM PARA UM SEGMENTO DE ALUNOS)
+# -----------------------------------------------------------------------------
+
+class TurmaSegmentoField(forms.ModelMultipleChoiceField):
+    def label_from_instance(self, obj):
+        return rotulo_turma(obj)
+
+class TransmissaoForm(forms.Form):
+    titulo = forms.CharField(max_length=100, label="Título", help_text="Só para identificar a transmissão no histórico.")
+    mensagem = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 5}),
+        help_text="Use {primeiro_nome}, {nome} e {academia} para personalizar a mensagem de cada aluno."
+    )
+    turmas = TurmaSegmentoField(
+        queryset=Turma.objects.none(), required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'select2-widget', 'style': 'width: 100%'}),
+        help_text="Deixe em branco para não filtrar por turma."
+    )
+    modalidades = forms.ModelMultipleChoiceField(
+        queryset=Modalidade.objects.none(), required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'select2-widget', 'style': 'width: 100%'}),
+    )
+    graduacoes = forms.ModelMultipleChoiceField(
+        queryset=Graduacao.objects.none(), required=False, label="Graduação atual",
+        widget=forms.SelectMultiple(attrs={'class': 'select2-widget', 'style': 'width: 100%'}),
+    )
+    situacao = forms.ChoiceField(choices=SITUACOES, initial='ativos', label="Matrícula")
+    financeiro = forms.ChoiceField(choices=FINANCEIRO, initial='todos', label="Situação financeira")
+
+    def __init__(self, *args, **kwargs):
+        academia = kwargs.pop('academia', None)
+        super().__init__(*args, **kwargs)
+        if academia:
+            self.fields['turmas'].queryset = turmas_da_academia(academia)
+            self.fields['modalidades'].queryset = Modalidade.objects.filter(academia=academia)
+            self.fields['graduacoes'].queryset = Graduacao.objects.filter(academia=academia).select_related('modalidade')
+
+    def filtros(self):
+        """ Filtros do segmento no formato de core/segmentos.py. """
+        dados = self.cleaned_data
+        return {
+            'turmas': [t.id for t in dados['turmas']],
+            'modalidades': [m.id for m in dados['modalidades']],
+            'graduacoes': [g.id for g in dados['graduacoes']],
+            'situacao': dados['situacao'],
+            'financeiro': dados['financeiro'],
+        }
+
+
 # -----------------------------------------------------------------------------
 # FORMULÁRIOS SAAS
 # -----------------------------------------------------------------------------
@@ -0,0 +1,184 @@
+# core/gateway_pool.py
+
+"""
+Pool de nós do gateway do WhatsApp.
+
+Cada sessão do WhatsApp é um navegador headless dentro do gateway Node.js, e a
+memória limita quantas academias cabem em um nó. Com vários nós cadastrados
+(NoGateway), cada academia é atribuída a um deles por hash consistente:
+
+- o anel tem WHATSAPP_GATEWAY_VNODES pontos por nó (vezes o peso), e a academia
+  fica com o primeiro ponto depois do hash do seu id;
+- a atribuição é gravada em Academia.gateway_no na primeira vez que a academia
+  precisa do gateway, e daí em diante todas as chamadas (envios, status,
+  initialize) vão para aquele nó, mesmo que o anel mude;
+- ao adicionar um nó, só as academias cujo ponto no anel passa para ele mudam
+  de lugar (~1/N delas); ao drenar um nó, as academias dele se espalham pelos
+  demais. Quem move as academias é o `rebalancear_gateways`, que desconecta a
+  sessão no nó antigo e a inicia no novo.
+
+Nós 'drenando' continuam atendendo as academias que já têm, mas não entram no
+anel; nós 'inativos' não atendem ninguém (as academias deles são reatribuídas
+na próxima chamada). Sem nenhum nó cadastrado, tudo vai para WHATSAPP_GATEWAY_URL.
+"""
+
+import bisect
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .gateway_whatsapp import get_gateway
+from .models import Academia, NoGateway
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(texto):
+    return int.from_bytes(hashlib.md5(texto.encode('utf-8')).digest()[:8], 'big')
+
+
+class AnelConsistente:
+    """ Anel de hash consistente com nós virtuais. """
+
+    def __init__(self, nos, vnodes=None):
+        vnodes = vnodes or getattr(settings, 'WHATSAPP_GATEWAY_VNODES', 100)
+        pontos = sorted(
+            (_hash(f"{no.nome}#{i}"), no.nome, no)
+            for no in nos for i in range(vnodes * max(no.peso, 1))
+        )
+        self._chaves = [ponto for ponto, _, _ in pontos]
+        self._nos = [no for _, _, no in pontos]
+
+    def __bool__(self):
+        return bool(self._chaves)
+
+    def no_para(self, chave):
+        if not self._chaves:
+            return None
+        posicao = bisect.bisect(self._chaves, _hash(str(chave))) % len(self._chaves)
+        return self._nos[posicao]
+
+
+_cache = {'lido_em': None, 'nos': {}, 'anel': AnelConsistente([])}
+_cache_lock = threading.Lock()
+
+
+def invalidar_cache():
+    with _cache_lock:
+        _cache['lido_em'] = None
+
+
+def _carregar():
+    """ Nós que atendem academias (ativos e drenando) e o anel dos ativos, com cache. """
+    with _cache_lock:
+        lido_em = _cache['lido_em']
+        if lido_em is not None and time.monotonic() - lido_em < getattr(settings, 'WHATSAPP_GATEWAY_POOL_CACHE', 30):
+            return _cache['nos'], _cache['anel']
+    nos = {no.id: no for no in NoGateway.objects.exclude(estado='inativo')}
+    anel = AnelConsistente([no for no in nos.values() if no.estado == 'ativo'])
+    with _cache_lock:
+        _cache.update(lido_em=time.monotonic(), nos=nos, anel=anel)
+    return nos, anel
+
+
+def pool_ativo():
+    return getattr(settings, 'WHATSAPP_GATEWAY_POOL', True) and bool(_carregar()[0])
+
+
+def no_da_academia(academia):
+    """
+    Nó que atende a academia, atribuindo um pelo anel (e gravando) se ela
+    ainda não tem ou se o nó dela foi desativado. None se não há nós.
+    """
+    nos, anel = _carregar()
+    no = nos.get(academia.gateway_no_id)
+    if no is not None:
+        return no
+    alvo = anel.no_para(academia.id)
+    if alvo is None:
+        if nos:
+            logger.warning("Nenhum nó ativo no pool do gateway para a academia %s.", academia.id)
+        return None
+
+    # Condicional: se outro processo atribuiu antes, vale a atribuição dele
+    atualizadas = Academia.objects.filter(pk=academia.pk, gateway_no_id=academia.gateway_no_id).update(
+        gateway_no=alvo, gateway_atribuido_em=timezone.now(),
+    )
+    if not atualizadas:
+        academia.gateway_no_id = Academia.objects.filter(pk=academia.pk).values_list('gateway_no_id', flat=True).first()
+        return nos.get(academia.gateway_no_id, alvo)
+    academia.gateway_no_id = alvo.id
+    logger.info("Academia %s atribuída ao nó %s do gateway.", academia.id, alvo.nome)
+    return alvo
+
+
+def gateway_da_academia(academia):
+    """ Cliente do gateway que hospeda a sessão da academia (ou o gateway único). """
+    if getattr(settings, 'WHATSAPP_GATEWAY_POOL', True):
+        no = no_da_academia(academia)
+        if no is not None:
+            return get_gateway(no.url)
+    return get_gateway()
+
+
+def gateways_em_uso():
+    """ Clientes de todos os nós que atendem academias (para o worker da fila). """
+    if pool_ativo():
+        return [get_gateway(no.url) for no in _carregar()[0].values()]
+    gateway = get_gateway()
+    return [gateway] if gateway is not None else []
+
+
+# -----------------------------------------------------------------------------
+# REBALANCEAMENTO
+# -----------------------------------------------------------------------------
+
+def planejar_rebalanceamento():
+    """
+    Lista de (academia, no_atual, no_destino) das academias que estão fora do
+    nó que o anel indica hoje: as de nós drenando/inativos, as que caem em um
+    nó novo e as que ainda não têm nó.
+    """
+    invalidar_cache()
+    nos_por_id = {no.id: no for no in NoGateway.objects.all()}
+    anel = AnelConsistente([no for no in nos_por_id.values() if no.estado == 'ativo'])
+    if not anel:
+        return []
+    movimentos = []
+    for academia in Academia.objects.only('id', 'nome_fantasia', 'gateway_no').order_by('id').iterator():
+        destino = anel.no_para(academia.id)
+        if academia.gateway_no_id != destino.id:
+            movimentos.append((academia, nos_por_id.get(academia.gateway_no_id), destino))
+    return movimentos
+
+
+def mover_academia(academia, origem, destino, reconectar=True):
+    """
+    Passa a academia para o nó `destino`. Com `reconectar`, a sessão conectada
+    no nó antigo é encerrada e iniciada no novo (o navegador do novo nó restaura
+    a sessão se o armazenamento for compartilhado; senão a academia lê o QR Code
+    de novo). Retorna True se a sessão foi iniciada no novo nó.
+    """
+    conectada = False
+    if reconectar and origem is not None and origem.estado != 'inativo':
+        antigo = get_gateway(origem.url)
+        try:
+            conectada = antigo.status(academia.id).get('status') == 'ready'
+            antigo.disconnect(academia.id)
+        except Exception as e:
+            logger.warning("Não foi possível encerrar a sessão da academia %s no nó %s: %s", academia.id, origem.nome, e)
+
+    Academia.objects.filter(pk=academia.pk).update(gateway_no=destino, gateway_atribuido_em=timezone.now())
+    academia.gateway_no_id = destino.id
+
+    if conectada:
+        try:
+            get_gateway(destino.url).initialize(academia.id)
+            return True
+        except Exception as e:
+            logger.warning("Não foi possível iniciar a sessão da academia %s no nó %s: %s", academia.id, destino.nome, e)
+    return False
@@ -0,0 +1,205 @@
+# core/gateway_simulado.py
+
+"""
+Gateway do WhatsApp simulado, em Python puro, para desenvolvimento e benchmark.
+
+Implementa os mesmos endpoints do gateway Node.js (`/send-message`,
+`/send-batch`, `/status/<id>`, `/initialize` e `/disconnect/<id>`) sem precisar
+de um celular conectado. A latência por mensagem, a taxa de erros e o limite de
+mensagens por minuto de cada academia são configuráveis, e o gerador de números
+aleatórios aceita uma semente para que as execuções sejam repetíveis.
+
+Usado pelo comando `gateway_simulado` (servidor avulso) e pelo
+`benchmark_notificacoes` (servidor em uma thread do próprio processo).
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Imagem 1x1 usada no lugar do QR Code real
+QR_FALSO = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+
+class EstadoSimulado:
+    """ Sessões, limites e contadores compartilhados entre as threads do servidor. """
+
+    def __init__(self, latencia_ms=50, variacao_ms=0, taxa_erro=0.0, limite_por_minuto=0,
+                 suporta_lote=True, exigir_qr=False, tempo_qr=2.0, semente=None):
+        self.latencia = latencia_ms / 1000
+        self.variacao = variacao_ms / 1000
+        self.taxa_erro = taxa_erro
+        self.limite_por_minuto = limite_por_minuto
+        self.suporta_lote = suporta_lote
+        self.exigir_qr = exigir_qr
+        self.tempo_qr = tempo_qr
+
+        self.lock = threading.Lock()
+        self.random = random.Random(semente)
+        self.sessoes = {}
+        self.baldes = {}
+        self.contadores = {'recebidas': 0, 'enviadas': 0, 'erros': 0, 'limitadas': 0, 'requisicoes': 0}
+
+    def _contar(self, chave, quantidade=1):
+        with self.lock:
+            self.contadores[chave] += quantidade
+
+    def status_sessao(self, academia_id):
+        with self.lock:
+            sessao = self.sessoes.get(academia_id)
+            if sessao is None:
+                if self.exigir_qr:
+                    return {'status': 'disconnected'}
+                sessao = self.sessoes[academia_id] = {'status': 'ready', 'qrCode': None, 'pronto_em': 0}
+            if sessao['status'] == 'qr_ready' and time.monotonic() >= sessao['pronto_em']:
+                sessao['status'], sessao['qrCode'] = 'ready', None
+            return {'status': sessao['status'], 'qrCode': sessao['qrCode']}
+
+    def inicializar(self, academia_id):
+        with self.lock:
+            self.sessoes[academia_id] = {
+                'status': 'qr_ready',
+                'qrCode': QR_FALSO,
+                'pronto_em': time.monotonic() + self.tempo_qr,
+            }
+
+    def desconectar(self, academia_id):
+        with self.lock:
+            return self.sessoes.pop(academia_id, None) is not None
+
+    def _liberar_envio(self, academia_id):
+        """ Token bucket por academia, com capacidade igual ao limite por minuto. """
+        if not self.limite_por_minuto:
+            return True
+        agora = time.monotonic()
+        with self.lock:
+            tokens, ultimo = self.baldes.get(academia_id, (self.limite_por_minuto, agora))
+            tokens = min(self.limite_por_minuto, tokens + (agora - ultimo) * self.limite_por_minuto / 60)
+            liberado = tokens >= 1
+            self.baldes[academia_id] = (tokens - 1 if liberado else tokens, agora)
+            return liberado
+
+    def enviar(self, academia_id):
+        """
+        Simula o envio de uma mensagem. Retorna (status_http, resposta).
+        """
+        self._contar('recebidas')
+        if self.status_sessao(academia_id)['status'] != 'ready':
+            self._contar('erros')
+            return 400, {'success': False, 'error': 'Cliente WhatsApp não está pronto ou conectado.'}
+        if not self._liberar_envio(academia_id):
+            self._contar('limitadas')
+            return 429, {'success': False, 'error': 'Limite de mensagens por minuto excedido.'}
+
+        with self.lock:
+            espera = self.latencia + self.random.uniform(0, self.variacao)
+            falhou = self.random.random() < self.taxa_erro
+        time.sleep(espera)
+
+        if falhou:
+            self._contar('erros')
+            return 500, {'success': False, 'error': 'Falha simulada ao enviar a mensagem.'}
+        with self.lock:
+            self.contadores['enviadas'] += 1
+            id_mensagem = f"simulado_{academia_id}_{self.contadores['enviadas']}"
+        return 200, {'success': True, 'message': 'Mensagem enviada.', 'id': id_mensagem}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    estado = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        # Silencioso: em benchmark o log por requisição distorce as medições
+        pass
+
+    def _responder(self, status, dados):
+        corpo = json.dumps(dados).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _ler_json(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if not tamanho:
+            return {}
+        try:
+            return json.loads(self.rfile.read(tamanho))
+        except ValueError:
+            return {}
+
+    def do_GET(self):
+        self.estado._contar('requisicoes')
+        achado = re.fullmatch(r'/status/([^/]+)/?', self.path)
+        if achado:
+            return self._responder(200, self.estado.status_sessao(achado.group(1)))
+        if self.path.rstrip('/') == '/metricas':
+            with self.estado.lock:
+                return self._responder(200, dict(self.estado.contadores))
+        self._responder(404, {'error': 'Endpoint não encontrado.'})
+
+    def do_POST(self):
+        self.estado._contar('requisicoes')
+        dados = self._ler_json()
+        caminho = self.path.rstrip('/')
+
+        if caminho == '/initialize':
+            if not dados.get('academiaId'):
+                return self._responder(400, {'error': 'academiaId é obrigatório.'})
+            self.estado.inicializar(str(dados['academiaId']))
+            return self._responder(200, {'message': 'Processo de inicialização iniciado.'})
+
+        if caminho == '/send-message':
+            status, resposta = self.estado.enviar(str(dados.get('academiaId')))
+            return self._responder(status, resposta)
+
+        if caminho == '/send-batch' and self.estado.suporta_lote:
+            mensagens = dados.get('messages')
+            if not isinstance(mensagens, list):
+                return self._responder(400, {'success': False, 'error': 'messages deve ser uma lista.'})
+            resultados = []
+            # Em sequência, como o gateway Node.js faz com a mesma sessão
+            for item in mensagens:
+                _, resposta = self.estado.enviar(str(dados.get('academiaId')))
+                resultados.append({
+                    'id': item.get('id'),
+                    'success': resposta['success'],
+                    **({'messageId': resposta['id']} if resposta['success'] else {'error': resposta['error']}),
+                })
+            return self._responder(200, {'success': all(r['success'] for r in resultados), 'results': resultados})
+
+        achado = re.fullmatch(r'/disconnect/([^/]+)', caminho)
+        if achado:
+            if self.estado.desconectar(achado.group(1)):
+                return self._responder(200, {'message': 'Sessão desconectada com sucesso.'})
+            return self._responder(404, {'error': 'Sessão não encontrada.'})
+
+        self._responder(404, {'error': 'Endpoint não encontrado.'})
+
+
+def criar_servidor(host='127.0.0.1', porta=3000, **opcoes):
+    """
+    Cria o servidor HTTP do gateway simulado (sem iniciá-lo).
+    `porta=0` escolhe uma porta livre; o estado fica em `servidor.estado`.
+    """
+    estado = EstadoSimulado(**opcoes)
+    handler = type('HandlerGatewaySimulado', (_Handler,), {'estado': estado})
+    servidor = ThreadingHTTPServer((host, porta), handler)
+    servidor.daemon_threads = True
+    servidor.estado = estado
+    return servidor
+
+
+def iniciar_em_thread(**opcoes):
+    """ Sobe o gateway simulado em uma thread daemon e retorna (servidor, url). """
+    servidor = criar_servidor(**opcoes)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    host, porta = servidor.server_address[:2]
+    return servidor, f"http://{host}:{porta}"
@@ -0,0 +1,174 @@
+# core/gateway_whatsapp.py
+
+"""
+Cliente HTTP do gateway Node.js do WhatsApp.
+
+Mantém uma `requests.Session` compartilhada por processo (keep-alive e pool de
+conexões dimensionado para o número de workers da fila), com timeouts separados
+de conexão e leitura. O `send_batch` envia várias mensagens de uma academia em
+uma única chamada ao endpoint `/send-batch`; gateways antigos, que não possuem
+esse endpoint, são detectados e atendidos com envios individuais.
+
+Todas as chamadas passam pelo disjuntor do gateway (core/disjuntor.py): com o
+gateway travado ou lento demais, elas falham na hora em vez de esperar o timeout.
+"""
+
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .disjuntor import CircuitoAberto, Disjuntor
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayWhatsApp:
+    """ Cliente de um nó do gateway do WhatsApp. """
+
+    def __init__(self, base_url, pool_size=None, timeout_conexao=None, timeout_leitura=None, timeout_lote=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (
+            timeout_conexao or getattr(settings, 'WHATSAPP_GATEWAY_TIMEOUT_CONEXAO', 3.05),
+            timeout_leitura or getattr(settings, 'WHATSAPP_GATEWAY_TIMEOUT_LEITURA', 20),
+        )
+        self.timeout_lote = (
+            self.timeout[0],
+            timeout_lote or getattr(settings, 'WHATSAPP_GATEWAY_TIMEOUT_LOTE', 120),
+        )
+        # None = ainda não sabemos se o gateway tem o endpoint /send-batch
+        self.suporta_lote = None
+
+        pool_size = pool_size or getattr(settings, 'WHATSAPP_OUTBOX_WORKERS', 8)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+        self.disjuntor = Disjuntor(self.base_url)
+
+    def _circuito_aberto(self):
+        return CircuitoAberto(f"Gateway {self.base_url} indisponível no momento (disjuntor aberto).")
+
+    def _medir(self, metodo, caminho, mensagens=1, **kwargs):
+        """
+        Faz a requisição anotando no disjuntor o resultado e a latência por
+        mensagem. Erros 4xx contam como gateway respondendo (ex: sessão não
+        conectada); erros de rede, timeouts e 5xx contam como falha.
+        """
+        inicio = time.monotonic()
+        try:
+            response = self.session.request(metodo, f"{self.base_url}{caminho}", **kwargs)
+        except requests.exceptions.RequestException:
+            self.disjuntor.anotar(False, (time.monotonic() - inicio) * 1000 / max(mensagens, 1))
+            raise
+        self.disjuntor.anotar(response.status_code < 500, (time.monotonic() - inicio) * 1000 / max(mensagens, 1))
+        return response
+
+    def _post(self, caminho, payload, timeout=None):
+        if self.disjuntor.bloqueado():
+            raise self._circuito_aberto()
+        response = self._medir('POST', caminho, json=payload, timeout=timeout or self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _chamada_avulsa(self, metodo, caminho, payload=None):
+        """
+        Chamadas feitas direto pelas views (status, initialize, disconnect):
+        consultam o estado compartilhado antes e gravam o resultado logo depois.
+        """
+        if not self.disjuntor.permitir():
+            raise self._circuito_aberto()
+        try:
+            response = self._medir(metodo, caminho, json=payload, timeout=self.timeout)
+        finally:
+            self.disjuntor.sincronizar(forcar=True)
+        response.raise_for_status()
+        return response.json()
+
+    def send_message(self, academia_id, number, message):
+        """
+        Envia uma única mensagem. Retorna o JSON do gateway ou
+        {"success": False, "error": ...} em caso de falha de rede/HTTP.
+        """
+        payload = {"academiaId": str(academia_id), "number": number, "message": message}
+        try:
+            return self._post('/send-message', payload)
+        except CircuitoAberto as e:
+            return {"success": False, "error": str(e), "circuitoAberto": True}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return {"success": False, "error": str(e)}
+
+    def send_batch(self, academia_id, mensagens):
+        """
+        Envia várias mensagens da mesma academia em uma única chamada HTTP.
+
+        `mensagens` é uma lista de dicts {"id", "number", "message"}. Retorna uma
+        lista de resultados {"id", "success", "error"} na mesma ordem.
+        """
+        if not mensagens:
+            return []
+        if self.suporta_lote is False:
+            return self._send_individual(academia_id, mensagens)
+        if self.disjuntor.bloqueado():
+            erro = str(self._circuito_aberto())
+            return [{"id": m["id"], "success": False, "error": erro, "circuitoAberto": True} for m in mensagens]
+
+        payload = {"academiaId": str(academia_id), "messages": mensagens}
+        try:
+            response = self._medir('POST', '/send-batch', mensagens=len(mensagens), json=payload, timeout=self.timeout_lote)
+            if response.status_code in (404, 405):
+                logger.info("Gateway %s não possui /send-batch; usando envios individuais.", self.base_url)
+                self.suporta_lote = False
+                return self._send_individual(academia_id, mensagens)
+            self.suporta_lote = True
+            dados = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return [{"id": m["id"], "success": False, "error": str(e)} for m in mensagens]
+
+        resultados = {str(r.get("id")): r for r in dados.get("results", [])}
+        erro_geral = dados.get("error", "Resposta sem resultado para esta mensagem.")
+        return [
+            resultados.get(str(m["id"]), {"id": m["id"], "success": False, "error": erro_geral})
+            for m in mensagens
+        ]
+
+    def _send_individual(self, academia_id, mensagens):
+        resultados = []
+        for m in mensagens:
+            resposta = dict(self.send_message(academia_id, m["number"], m["message"]))
+            # No /send-message o "id" é o da mensagem no WhatsApp; no lote ele vira "messageId"
+            resposta["messageId"] = resposta.pop("id", None)
+            resultados.append({"id": m["id"], **resposta})
+        return resultados
+
+    def status(self, academia_id):
+        return self._chamada_avulsa('GET', f"/status/{academia_id}")
+
+    def initialize(self, academia_id):
+        return self._chamada_avulsa('POST', '/initialize', {"academiaId": str(academia_id)})
+
+    def disconnect(self, academia_id):
+        return self._chamada_avulsa('POST', f'/disconnect/{academia_id}', {})
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def get_gateway(base_url=None):
+    """
+    Retorna o cliente compartilhado (um por URL de gateway neste processo).
+    Retorna None se nenhuma URL estiver configurada.
+    """
+    base_url = base_url or settings.WHATSAPP_GATEWAY_URL
+    if not base_url:
+        return None
+    with _clientes_lock:
+        cliente = _clientes.get(base_url)
+        if cliente is None:
+            cliente = _clientes[base_url] = GatewayWhatsApp(base_url)
+        return cliente
@@ -0,0 +1,321 @@
+# core/intencoes.py
+
+"""
+Caminho rápido do assistente: perguntas sobre os dados da academia são
+respondidas aqui, direto do banco, sem chamar o Gemini.
+
+Cada intenção conhecida tem uma lista de sinais (expressões regulares já
+compiladas, com um peso). A pergunta é normalizada (minúsculas, sem acentos)
+e cada intenção soma os pesos dos sinais que aparecem nela; sinais de peso
+negativo afastam intenções parecidas ("quanto" puxa para o valor da
+inadimplência e para longe da lista de inadimplentes). Pedidos abertos
+("como reduzir...", "dicas", "crie", "escreva", "qual o melhor...") tiram
+pontos de todas as intenções: a resposta é um texto do LLM, não uma lista de
+dados, mesmo que a pergunta fale de inadimplência ou de planos. Ganha a maior
+pontuação, desde que chegue a IA_INTENCAO_PONTUACAO_MINIMA; empate fica com a
+que vem primeiro em INTENCOES. Sem intenção, a pergunta vai para o LLM.
+
+As intenções sobre um aluno tiram o nome da pergunta ("... do aluno Maria
+Santos", "... da Maria") e ganham um bônus quando acham um nome.
+
+As respostas usam as mesmas consultas do dashboard (core/snapshot.py) e das
+ferramentas do agente (core/analysis.py). Quantas perguntas cada intenção
+respondeu, e quantas foram para o LLM, fica em MetricaIntencao, por dia.
+"""
+
+import datetime
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable
+
+from django.conf import settings
+from django.db.models import F, Sum
+
+from .analysis import contexto_da_requisicao
+from .compactador import secao_ausentes, secao_inadimplentes
+from .models import MetricaIntencao
+from .snapshot import DIAS_AUSENCIA, snapshot_da_requisicao
+
+logger = logging.getLogger(__name__)
+
+SEM_INTENCAO = 'llm'  # Nome usado nas métricas para as perguntas que foram para o LLM
+BONUS_ALUNO = 0.5
+
+# Nome do aluno na pergunta original (com acentos e maiúsculas):
+# "... do aluno Maria Santos" ou, sem a palavra aluno, "... da Maria" (nome com inicial maiúscula)
+_NOME_DEPOIS_DE_ALUNO = re.compile(r"\balun[oa]\s+(?:d[oa]\s+)?(?P<nome>[^?!.,;:]+)", re.IGNORECASE)
+_NOME_DEPOIS_DE_PREPOSICAO = re.compile(r"\b(?:d[oa]|de)\s+(?P<nome>[A-ZÀ-Ý][\wÀ-ÿ']*(?:\s+(?:d[aeo]s?\s+)?[A-ZÀ-Ý][\wÀ-ÿ']*)*)")
+_FIM_DO_NOME = re.compile(r"\s+(?:por favor|pfv|pf|hoje|agora)\s*$", re.IGNORECASE)
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).split())
+
+
+def extrair_nome_aluno(pergunta):
+    for padrao in (_NOME_DEPOIS_DE_ALUNO, _NOME_DEPOIS_DE_PREPOSICAO):
+        encontrado = padrao.search(pergunta)
+        if encontrado:
+            nome = _FIM_DO_NOME.sub('', encontrado.group('nome').strip())
+            if len(nome) >= 2:
+                return nome
+    return None
+
+
+# Pedido aberto ou imperativo: vai para o LLM ("como está ..." ainda é pergunta sobre os dados)
+_PEDIDO_ABERTO = (
+    r"\bcomo\b(?! (esta|estao|anda|andam|ficou|ficaram)\b)|\bdicas?\b|\bsugest\w*|\bideias?\b|\bestrategi\w*"
+    r"|\bcri(e|ar|a)\b|\bescrev\w*|\bredij\w*|\belabor\w*|\bmelhor\w*|\bpor ?que\b|\bo que (fazer|faco|devo)\b",
+    -2.0,
+)
+
+
+def _sinais(*pares):
+    """ Sinais compilados da intenção, sempre com o do pedido aberto. """
+    return tuple((re.compile(padrao), peso) for padrao, peso in pares + (_PEDIDO_ABERTO,))
+
+
+@dataclass(frozen=True)
+class Intencao:
+    nome: str
+    sinais: tuple
+    responder: Callable  # responder(request, nome_aluno) -> texto da resposta
+    precisa_aluno: bool = False
+
+    def pontuar(self, texto, nome_aluno=None):
+        pontos = sum(peso for padrao, peso in self.sinais if padrao.search(texto))
+        if self.precisa_aluno and nome_aluno:
+            pontos += BONUS_ALUNO
+        return pontos
+
+
+# -----------------------------------------------------------------------------
+# RESPOSTAS
+# -----------------------------------------------------------------------------
+
+def _limite_nomes():
+    return getattr(settings, 'IA_INTENCAO_MAX_NOMES', 20)
+
+
+def _lista(cabecalho, secao):
+    """ Cabeçalho, resumo e os alunos mais graves da seção (os demais viram "... e mais N"). """
+    limite = _limite_nomes()
+    linhas = [cabecalho, secao.resumo, ''] + [f"• {item}" for item in secao.itens[:limite]]
+    if len(secao.itens) > limite:
+        linhas.append(f"• ... e mais {len(secao.itens) - limite} aluno(s)")
+    return "\n".join(linhas)
+
+
+def _responder_contagem(request, nome_aluno=None):
+    snapshot = snapshot_da_requisicao(request)
+    ativos, inativos = snapshot.alunos_ativos, snapshot.alunos_inativos
+    return (
+        f"Na {request.academia.nome_fantasia} você tem:\n• {ativos} alunos ativos\n"
+        f"• {inativos} alunos inativos\n• Total: {ativos + inativos} alunos"
+    )
+
+
+def _responder_inadimplentes(request, nome_aluno=None):
+    # Mesma lista do resumo e do dashboard, do maior valor vencido para o menor
+    snapshot = snapshot_da_requisicao(request)
+    if not snapshot.inadimplentes:
+        return f"Ótima notícia! Não há alunos inadimplentes na {request.academia.nome_fantasia}."
+    return _lista(f"Alunos inadimplentes na {request.academia.nome_fantasia}:", secao_inadimplentes(snapshot, ''))
+
+
+def _responder_nivel_inadimplencia(request, nome_aluno=None):
+    snapshot = snapshot_da_requisicao(request)
+    return (
+        f"O valor total de faturas vencidas e não pagas na {request.academia.nome_fantasia} é de "
+        f"R$ {snapshot.financeiro.inadimplencia:.2f}. Alunos ativos inadimplentes: {len(snapshot.inadimplentes)}."
+    )
+
+
+def _responder_planos(request, nome_aluno=None):
+    planos = contexto_da_requisicao(request).planos()
+    if not planos:
+        return "Nenhum plano cadastrado ainda."
+    return f"Planos disponíveis na {request.academia.nome_fantasia}:\n\n" + "\n".join(
+        f"• {nome}: R$ {valor}" for nome, valor in planos
+    )
+
+
+def _responder_faltoso(request, nome_aluno=None):
+    # Mesma consulta da ferramenta get_aluno_mais_faltoso (core/analysis.py)
+    frequencia = contexto_da_requisicao(request).frequencia_ativos()
+    if not frequencia:
+        return "Não há alunos ativos cadastrados."
+    nome, presencas = frequencia[0]
+    return f"O aluno com menos presenças nos últimos 30 dias é {nome}, com {presencas} presenças."
+
+
+def _responder_ausentes(request, nome_aluno=None):
+    snapshot = snapshot_da_requisicao(request)
+    if not snapshot.ausentes:
+        return f"Nenhum aluno ativo está há mais de {DIAS_AUSENCIA} dias sem registrar presença."
+    return _lista(
+        f"Alunos sem registrar presença há mais de {DIAS_AUSENCIA} dias na {request.academia.nome_fantasia}:",
+        secao_ausentes(snapshot, ''),
+    )
+
+
+def _buscar_aluno(request, nome_aluno, assunto):
+    """ Dict do aluno, ou o texto a responder quando não dá para saber de quem se fala. """
+    if not nome_aluno:
+        return f"Para ver {assunto}, me diga o nome do aluno (por exemplo: \"{assunto} do aluno João Silva\")."
+    aluno = contexto_da_requisicao(request).aluno(nome_aluno)
+    if aluno is None:
+        return f"Não encontrei nenhum aluno com o nome \"{nome_aluno}\"."
+    if aluno == 'varios':
+        return f"Encontrei mais de um aluno com \"{nome_aluno}\" no nome. Pode ser mais específico?"
+    return aluno
+
+
+def _responder_historico(request, nome_aluno=None):
+    aluno = _buscar_aluno(request, nome_aluno, "o histórico de pagamentos")
+    if isinstance(aluno, str):
+        return aluno
+    if not aluno['faturas']:
+        return f"Nenhum histórico de faturas encontrado para {aluno['nome']}."
+    limite = _limite_nomes()
+    vencido = sum((f.valor for f in aluno['faturas'] if f.status == 'Vencida'), Decimal('0'))
+    linhas = [f"Histórico de pagamentos de {aluno['nome']} ({len(aluno['faturas'])} fatura(s)):", '']
+    linhas += [
+        f"• R$ {fatura.valor}, venc. {fatura.data_vencimento:%d/%m/%Y}: {fatura.status}"
+        + (f" em {fatura.data_pagamento:%d/%m/%Y}" if fatura.data_pagamento else '')
+        for fatura in aluno['faturas'][:limite]
+    ]
+    if len(aluno['faturas']) > limite:
+        linhas.append(f"• ... e mais {len(aluno['faturas']) - limite} fatura(s) mais antiga(s)")
+    if vencido:
+        linhas += ['', f"Total vencido: R$ {vencido:.2f}"]
+    return "\n".join(linhas)
+
+
+def _responder_detalhes(request, nome_aluno=None):
+    aluno = _buscar_aluno(request, nome_aluno, "os detalhes")
+    if isinstance(aluno, str):
+        return aluno
+    return (
+        f"{aluno['nome']}:\n"
+        f"• Status: {'Ativo' if aluno['ativo'] else 'Inativo'}\n"
+        f"• Contato: {aluno['contato'] or 'não informado'}\n"
+        f"• Plano ativo: {aluno['plano_ativo'] or 'Nenhum'}\n"
+        f"• Dia de vencimento: {aluno['dia_vencimento'] or 'não definido'}"
+    )
+
+
+# -----------------------------------------------------------------------------
+# INTENÇÕES (pesos sobre o texto sem acentos)
+# -----------------------------------------------------------------------------
+
+_DEVEDORES = r"\binadimplentes?\b|\bdevend\w*|\bem atraso\b|\batrasad[oa]s\b|\bnao pag\w*"
+_VALOR = r"\b(nivel|valor|total|quanto|montante|soma)\b"
+
+INTENCOES = (
+    Intencao('contagem_alunos', _sinais(
+        (r"\bquant[oa]s\b.*\balun", 1.5),
+        (r"\b(total|numero|quantidade) de alunos\b", 1.5),
+        (r"\binadimpl|\bdevend|\batrasad|\bfaltos|\bausent|\bsumid", -1.0),
+    ), _responder_contagem),
+    Intencao('nivel_inadimplencia', _sinais(
+        (r"\binadimpl\w*|\bvencid[oa]s?\b|\bem atraso\b|\bdevend\w*", 0.8),
+        (_VALOR, 0.8),
+        (r"\binadimplencia\b", 0.4),
+    ), _responder_nivel_inadimplencia),
+    Intencao('inadimplentes', _sinais(
+        (_DEVEDORES, 1.0),
+        (r"\binadimplencia\b", 0.6),
+        (r"\bquem\b|\bquais\b|\blist\w*|\bnomes?\b", 0.5),
+        (_VALOR, -0.8),
+    ), _responder_inadimplentes),
+    Intencao('ausentes', _sinais(
+        (r"\bausent\w*|\bsumid[oa]s?\b|\bnao (vem|veio|vieram|aparec\w*|treina\w*)\b|\bsem (vir|aparecer|treinar)\b", 1.5),
+        (r"\bsem (registrar )?presenca", 1.5),
+    ), _responder_ausentes),
+    Intencao('aluno_mais_faltoso', _sinais(
+        (r"\bfaltos[oa]s?\b|\bmais falt\w*|\bmenos (presenc|frequen|check)\w*", 1.5),
+        (r"\bfrequencia\b|\bpresencas?\b", 1.0),
+    ), _responder_faltoso),
+    Intencao('historico_pagamentos', _sinais(
+        (r"\bhistorico\b|\bextrato\b", 0.8),
+        (r"\bpagamentos?\b|\bfaturas?\b|\bmensalidades?\b|\bpagou\b|\bcobrancas?\b", 0.8),
+    ), _responder_historico, precisa_aluno=True),
+    Intencao('detalhes_aluno', _sinais(
+        (r"\bdetalhes?\b|\bdados\b|\binformac\w*|\bcontato\b|\btelefone\b|\bwhatsapp\b|\bficha\b", 0.8),
+        (r"\bplano d[oa]\b|\bvencimento d[oa]\b", 0.6),
+    ), _responder_detalhes, precisa_aluno=True),
+    Intencao('planos', _sinais(
+        # A palavra sozinha não basta ("plano de marketing"): precisa de um pedido de listagem
+        (r"\bplanos?\b", 0.6),
+        (r"\blist\w*|\bquais\b|\bvalores\b|\bprecos?\b|\bmeus\b|\btodos\b|\btenho\b|\bmostr\w*|\bver\b|\bcadastrad\w*|\bdisponive\w*", 0.6),
+        (r"\bplanos? d[oa]\b", -1.0),
+    ), _responder_planos),
+)
+
+
+def classificar(pergunta):
+    """ (intenção, nome do aluno) com a maior pontuação, ou (None, None) se nenhuma chega ao mínimo. """
+    texto = normalizar(pergunta)
+    nome_aluno = extrair_nome_aluno(pergunta)
+    minimo = getattr(settings, 'IA_INTENCAO_PONTUACAO_MINIMA', 1.0)
+    melhor, melhor_pontos = None, minimo
+    for intencao in INTENCOES:
+        pontos = intencao.pontuar(texto, nome_aluno)
+        if pontos > melhor_pontos or (melhor is None and pontos >= minimo):
+            melhor, melhor_pontos = intencao, pontos
+    if melhor is None:
+        return None, None
+    return melhor, nome_aluno if melhor.precisa_aluno else None
+
+
+def responder_localmente(request, pergunta):
+    """
+    Resposta da pergunta a partir dos dados da academia, ou None quando ela
+    precisa do LLM. Registra a métrica nos dois casos.
+    """
+    if not getattr(settings, 'IA_INTENCAO_ATIVA', True):
+        return None
+    intencao, nome_aluno = classificar(pergunta)
+    resposta = intencao.responder(request, nome_aluno) if intencao else None
+    registrar(intencao.nome if intencao else SEM_INTENCAO)
+    return resposta
+
+
+# -----------------------------------------------------------------------------
+# MÉTRICAS
+# -----------------------------------------------------------------------------
+
+def registrar(intencao):
+    try:
+        hoje = datetime.date.today()
+        if not MetricaIntencao.objects.filter(data=hoje, intencao=intencao).update(total=F('total') + 1):
+            metrica, criada = MetricaIntencao.objects.get_or_create(data=hoje, intencao=intencao, defaults={'total': 1})
+            if not criada:
+                MetricaIntencao.objects.filter(pk=metrica.pk).update(total=F('total') + 1)
+    except Exception as e:
+        logger.warning("Não foi possível registrar a métrica da intenção %s: %s", intencao, e)
+
+
+def resumo_metricas(dias=30):
+    """ Perguntas respondidas no caminho rápido e a taxa de acerto dos últimos `dias`. """
+    desde = datetime.date.today() - datetime.timedelta(days=dias - 1)
+    metricas = MetricaIntencao.objects.filter(data__gte=desde)
+    por_intencao = dict(metricas.values_list('intencao').annotate(soma=Sum('total')).order_by('intencao'))
+    perguntas = sum(por_intencao.values())
+    locais = perguntas - por_intencao.get(SEM_INTENCAO, 0)
+    return {
+        'perguntas': perguntas,
+        'caminho_rapido': locais,
+        'llm': por_intencao.get(SEM_INTENCAO, 0),
+        'taxa_caminho_rapido': round(100 * locais / perguntas, 1) if perguntas else 0,
+        'por_intencao': por_intencao,
+        'por_dia': [
+            {'data': m.data.isoformat(), 'intencao': m.intencao, 'total': m.total}
+            for m in metricas.order_by('data', 'intencao')
+        ],
+    }
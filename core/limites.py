@@ -0,0 +1,52 @@
+# core/limites.py
+
+"""
+Token bucket (balde de fichas) por academia, com o estado guardado no banco.
+
+O saldo é lido e gravado dentro de uma transação com SELECT ... FOR UPDATE,
+então vários processos (web, agendador, workers da fila) respeitam o mesmo
+limite. A reposição é calculada pelo tempo decorrido desde a última leitura,
+sem nenhuma tarefa periódica.
+"""
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import BaldeTokens
+
+
+def _obter_balde(academia, recurso, capacidade, agora):
+    try:
+        return BaldeTokens.objects.select_for_update().get(academia=academia, recurso=recurso)
+    except BaldeTokens.DoesNotExist:
+        try:
+            with transaction.atomic():
+                return BaldeTokens.objects.create(
+                    academia=academia, recurso=recurso, tokens=capacidade, atualizado_em=agora
+                )
+        except IntegrityError:
+            # Outro processo criou o balde ao mesmo tempo
+            return BaldeTokens.objects.select_for_update().get(academia=academia, recurso=recurso)
+
+
+def consumir_tokens(academia, recurso, quantidade, taxa_por_segundo, capacidade):
+    """
+    Tenta consumir até `quantidade` fichas do balde da academia.
+    Retorna uma tupla (concedidas, segundos_para_proxima_ficha).
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        balde = _obter_balde(academia, recurso, capacidade, agora)
+        decorrido = max((agora - balde.atualizado_em).total_seconds(), 0)
+        disponiveis = min(capacidade, balde.tokens + decorrido * taxa_por_segundo)
+
+        concedidas = min(quantidade, int(disponiveis))
+        balde.tokens = disponiveis - concedidas
+        balde.atualizado_em = agora
+        balde.save(update_fields=['tokens', 'atualizado_em'])
+
+    if taxa_por_segundo <= 0:
+        espera = None
+    else:
+        espera = max(1 - balde.tokens, 0) / taxa_por_segundo
+    return concedidas, espera
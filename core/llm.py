@@ -0,0 +1,151 @@
+# core/llm.py
+
+"""
+Cliente do LLM (Gemini via LangChain) compartilhado pelo processo.
+
+Criar um ChatGoogleGenerativeAI a cada requisição refaz a validação e a
+conexão com a API; aqui os clientes são criados na primeira vez e reusados,
+um por configuração (modelo, temperatura, timeout). O cliente assíncrono do
+Gemini fica preso ao event loop em que foi criado, então no código assíncrono
+há um cliente por loop (o servidor ASGI usa um só), como os hubs de status do
+WhatsApp (core/whatsapp_status.py).
+
+Com LLM_PROVIDER = 'falso' o agente e o assistente usam o LLMFalso, um modelo
+local determinístico (a mesma pergunta tem sempre a mesma resposta) com
+latência configurável: serve para medir e testar o caminho do agente sem
+chamar o Gemini (veja o comando `benchmark_agente`).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List
+
+from django.conf import settings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def _chave_api():
+    chave = os.getenv("GEMINI_API_KEY") or getattr(settings, 'GEMINI_API_KEY', '')
+    if not chave or chave == "YOUR_GEMINI_API_KEY":
+        return None
+    return chave
+
+
+def _loop_atual():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+RESPOSTA_FALSA = (
+    "**Resumo executivo:** a academia segue estável; acompanhe a inadimplência e as ausências.\n"
+    "**Recomendações:** entre em contato com os alunos em atraso e com quem não aparece há alguns dias.\n"
+    "**Alertas:** nenhum ponto crítico além dos listados no relatório.\n"
+    "**Retenção:** reforce as boas-vindas dos novos alunos na primeira semana."
+)
+
+
+class LLMFalso(BaseChatModel):
+    """
+    Modelo local para testes e benchmarks. A resposta é escolhida pelo hash
+    do prompt entre `respostas` (ou é a RESPOSTA_FALSA), então é sempre a
+    mesma para o mesmo prompt. Demora `latencia` segundos até o primeiro
+    pedaço e `latencia_token` por palavra.
+    """
+    model: str = 'falso'
+    temperature: float = 0
+    respostas: List[str] = []
+    latencia: float = 0.8
+    latencia_token: float = 0.02
+
+    @property
+    def _llm_type(self):
+        return 'falso'
+
+    def _resposta(self, messages):
+        prompt = '\n'.join(str(m.content) for m in messages)
+        if not self.respostas:
+            return RESPOSTA_FALSA
+        indice = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16) % len(self.respostas)
+        return self.respostas[indice]
+
+    def _pedacos(self, texto):
+        palavras = texto.split(' ')
+        return [palavra + (' ' if i < len(palavras) - 1 else '') for i, palavra in enumerate(palavras)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        resposta = self._resposta(messages)
+        time.sleep(self.latencia + self.latencia_token * len(self._pedacos(resposta)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=resposta))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latencia)
+        for pedaco in self._pedacos(self._resposta(messages)):
+            time.sleep(self.latencia_token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=pedaco))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        resposta = self._resposta(messages)
+        await asyncio.sleep(self.latencia + self.latencia_token * len(self._pedacos(resposta)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=resposta))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latencia)
+        for pedaco in self._pedacos(self._resposta(messages)):
+            await asyncio.sleep(self.latencia_token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=pedaco))
+
+
+def _llm_falso(temperatura):
+    return LLMFalso(
+        temperature=temperatura,
+        respostas=list(getattr(settings, 'LLM_FALSO_RESPOSTAS', [])),
+        latencia=getattr(settings, 'LLM_FALSO_LATENCIA_MS', 800) / 1000,
+        latencia_token=getattr(settings, 'LLM_FALSO_LATENCIA_TOKEN_MS', 20) / 1000,
+    )
+
+
+def get_llm(temperatura=0, modelo=None, timeout=None):
+    """
+    Cliente compartilhado para a configuração pedida, ou None se a
+    GEMINI_API_KEY não estiver configurada. Com LLM_PROVIDER = 'falso'
+    devolve um LLMFalso (não precisa de chave).
+    """
+    if getattr(settings, 'LLM_PROVIDER', 'gemini') == 'falso':
+        return _llm_falso(temperatura)
+
+    chave_api = _chave_api()
+    if chave_api is None:
+        return None
+    modelo = modelo or getattr(settings, 'LLM_MODELO', 'gemini-1.5-flash')
+    timeout = timeout or getattr(settings, 'LLM_TIMEOUT', 60)
+    loop = _loop_atual()
+    chave = (modelo, float(temperatura), timeout, chave_api, loop)
+
+    with _clientes_lock:
+        cliente = _clientes.get(chave)
+        if cliente is None:
+            for antiga in [c for c in _clientes if c[-1] is not None and c[-1].is_closed()]:
+                del _clientes[antiga]
+            cliente = _clientes[chave] = ChatGoogleGenerativeAI(
+                model=modelo,
+                google_api_key=chave_api,
+                temperature=temperatura,
+                timeout=timeout,
+            )
+        return cliente
+
+
+def formatar_evento_sse(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
@@ -1,19 +1,27 @@
 # core/management/commands/agente_ia.py
 
-import datetime
-import os
-from django.core.management.base import BaseCommand
-from django.db.models import Q
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
 # Importações do LangChain
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage
 
 # Importações dos nossos módulos e modelos
-from core import analysis
-from core.analysis import enviar_mensagem_whatsapp
-from core.models import Academia, Aluno, Fatura, Assinatura
+from core.boletim import TEMPERATURA as BOLETIM_TEMPERATURA, gerar_boletim
+from core.cache_llm import invocar_com_cache
+from core.compactador import compactar, secao_faltosos, secao_inadimplentes, secao_novos_alunos
+from core.llm import get_llm
+from core.notificacoes import ColetorNotificacoes
+from core.snapshot import construir_snapshot
+from core.models import Academia
+
+
+def _notificavel(aluno):
+    # Só entram nas notificações os alunos que aceitam mensagens e têm um WhatsApp válido
+    return aluno.receber_notificacoes and aluno.whatsapp_valido
 
 
 class Command(BaseCommand):
@@ -30,110 +38,101 @@ class Command(BaseCommand):
         try:
             academia = Academia.objects.get(pk=academia_id)
         except Academia.DoesNotExist:
-            self.stdout.write(self.style.ERROR(f"Academia com ID {academia_id} não encontrada."))
-            return
+            raise CommandError(f"Academia com ID {academia_id} não encontrada.")
 
         self.stdout.write(f"Analisando dados para a academia: {academia.nome_fantasia}")
+        # Tempo de cada fase, em segundos (lido pelo benchmark_agente)
+        self.tempos = {}
+        self._marco = time.perf_counter()
 
         # --- FASE 1: COLETA DE DADOS ---
-        # Chamada correta para a ferramenta LangChain
-        inadimplentes_nomes = analysis.get_alunos_inadimplentes.invoke({"academia_id": academia.id})
-        alunos_faltosos = analysis.analisar_frequencia(academia)
-        
-        data_limite_novos = datetime.date.today() - datetime.timedelta(days=7)
-        novos_alunos = Aluno.objects.filter(academia=academia, data_matricula__gte=data_limite_novos)
+        # Um retrato só, com os mesmos números do dashboard e do assistente (core/snapshot.py)
+        snapshot = construir_snapshot(academia)
+        alunos_inadimplentes = snapshot.inadimplentes
+        alunos_faltosos = snapshot.faltosos
+        novos_alunos = snapshot.novos_alunos
+        self._marcar('dados')
 
         # --- FASE 2: EXECUÇÃO DE NOTIFICAÇÕES (LÓGICA COMPLETA) ---
         
         self.stdout.write(self.style.WARNING("\nIniciando ciclo de notificações..."))
+        # As notificações são coletadas e enfileiradas juntas no fim do ciclo:
+        # repetições recentes são descartadas e cada aluno recebe uma única mensagem.
+        coletor = ColetorNotificacoes(academia)
         
         # 2.1 Notificação de Inadimplência
-        if academia.notificar_inadimplencia and inadimplentes_nomes:
+        if academia.notificar_inadimplencia and alunos_inadimplentes:
             self.stdout.write("-> Verificando inadimplentes...")
-            # Otimização: Busca todos os alunos inadimplentes de uma só vez para evitar múltiplas queries.
-            alunos_inadimplentes = Aluno.objects.filter(
-                academia=academia,
-                nome_completo__in=inadimplentes_nomes
-            )
-            for aluno in alunos_inadimplentes:
-                # VERIFICAÇÃO DE PERMISSÃO
-                if aluno.contato and aluno.receber_notificacoes:
-                    mensagem = f"Olá {aluno.nome_completo.split()[0]}! Passando para lembrar que sua mensalidade na {academia.nome_fantasia} está em aberto. Se precisar de ajuda, é só chamar! 😊"
-                    enviar_mensagem_whatsapp(academia, aluno, mensagem, tipo='inadimplencia')
-                    self.stdout.write(self.style.SUCCESS(f"   - Ordem de envio de cobrança para {aluno.nome_completo}"))
-                elif not aluno.receber_notificacoes:
-                    self.stdout.write(f"   - Aluno {aluno.nome_completo} optou por não receber notificações. Pulando.")
+            notificaveis = [a for a in alunos_inadimplentes if _notificavel(a)]
+            for aluno in notificaveis:
+                mensagem = f"Olá {aluno.nome_completo.split()[0]}! Passando para lembrar que sua mensalidade na {academia.nome_fantasia} está em aberto. Se precisar de ajuda, é só chamar! 😊"
+                coletor.adicionar(aluno, 'inadimplencia', mensagem)
+                self.stdout.write(self.style.SUCCESS(f"   - Ordem de envio de cobrança para {aluno.nome_completo}"))
+            self._relatar_pulados(len(alunos_inadimplentes) - len(notificaveis))
 
         # 2.2 Notificação de Faltas
         if academia.notificar_faltas and alunos_faltosos:
             self.stdout.write("-> Verificando alunos com baixa frequência...")
-            for aluno in alunos_faltosos:
-                # VERIFICAÇÃO DE PERMISSÃO
-                if aluno.contato and aluno.receber_notificacoes:
-                    mensagem = f"Olá {aluno.nome_completo.split()[0]}, tudo bem? Sentimos sua falta nos treinos da {academia.nome_fantasia}! 💪 Esperamos te ver em breve!"
-                    enviar_mensagem_whatsapp(academia, aluno, mensagem, tipo='baixa_frequencia')
-                    self.stdout.write(self.style.SUCCESS(f"   - Ordem de envio de ausência para {aluno.nome_completo}"))
-                elif not aluno.receber_notificacoes:
-                    self.stdout.write(f"   - Aluno {aluno.nome_completo} optou por não receber notificações. Pulando.")
+            notificaveis = [a for a in alunos_faltosos if _notificavel(a)]
+            for aluno in notificaveis:
+                mensagem = f"Olá {aluno.nome_completo.split()[0]}, tudo bem? Sentimos sua falta nos treinos da {academia.nome_fantasia}! 💪 Esperamos te ver em breve!"
+                coletor.adicionar(aluno, 'baixa_frequencia', mensagem)
+                self.stdout.write(self.style.SUCCESS(f"   - Ordem de envio de ausência para {aluno.nome_completo}"))
+            self._relatar_pulados(len(alunos_faltosos) - len(notificaveis))
 
         # 2.3 Notificação de Boas-Vindas
-        if academia.notificar_boas_vindas and novos_alunos.exists():
+        if academia.notificar_boas_vindas and novos_alunos:
             self.stdout.write("-> Verificando novos alunos...")
-            for aluno in novos_alunos:
-                # VERIFICAÇÃO DE PERMISSÃO
-                if aluno.contato and aluno.receber_notificacoes:
-                    mensagem = f"Seja muito bem-vindo(a) à {academia.nome_fantasia}, {aluno.nome_completo.split()[0]}! 🎉 Estamos muito felizes em ter você no nosso time. Bons treinos!"
-                    enviar_mensagem_whatsapp(academia, aluno, mensagem, tipo='boas_vindas')
-                    self.stdout.write(self.style.SUCCESS(f"   - Ordem de envio de boas-vindas para {aluno.nome_completo}"))
-                elif not aluno.receber_notificacoes:
-                    self.stdout.write(f"   - Aluno {aluno.nome_completo} optou por não receber notificações. Pulando.")
+            notificaveis = [a for a in novos_alunos if _notificavel(a)]
+            for aluno in notificaveis:
+                mensagem = f"Seja muito bem-vindo(a) à {academia.nome_fantasia}, {aluno.nome_completo.split()[0]}! 🎉 Estamos muito felizes em ter você no nosso time. Bons treinos!"
+                coletor.adicionar(aluno, 'boas_vindas', mensagem)
+                self.stdout.write(self.style.SUCCESS(f"   - Ordem de envio de boas-vindas para {aluno.nome_completo}"))
+            self._relatar_pulados(len(novos_alunos) - len(notificaveis))
 
+        resumo_envio = coletor.despachar()
+        self.stdout.write(
+            f"-> {resumo_envio['mensagens']} mensagem(ns) enfileirada(s), "
+            f"{resumo_envio['agrupadas']} notificação(ões) agrupada(s) no resumo do aluno e "
+            f"{resumo_envio['repetidas']} repetição(ões) evitada(s)."
+        )
         self.stdout.write("\n--- Fim do ciclo de notificações ---")
+        self._marcar('notificacoes')
         
         # --- FASE 3: MONTAGEM E ENVIO PARA IA ---
         self.stdout.write("\nPreparando resumo para o assistente Gemini...")
         
-        # Montagem do relatório bruto para a IA
-        relatorio_bruto = "## Relatório de Status e Ações Sugeridas\n\n"
-        relatorio_bruto += "### 1. Inadimplência\n"
-        if inadimplentes_nomes:
-            for nome in inadimplentes_nomes: 
-                relatorio_bruto += f"- {nome}\n"
-        else:
-            relatorio_bruto += "Nenhum aluno inadimplente.\n"
-        
-        relatorio_bruto += "\n### 2. Alunos com Baixa Frequência\n"
-        if alunos_faltosos:
-            for aluno in alunos_faltosos:
-                relatorio_bruto += f"- {aluno.nome_completo}\n"
-        else:
-            relatorio_bruto += "Nenhum aluno com baixa frequência.\n"
-        
-        relatorio_bruto += "\n### 3. Novos Alunos (últimos 7 dias)\n"
-        if novos_alunos.exists():
-            for aluno in novos_alunos:
-                relatorio_bruto += f"- {aluno.nome_completo} (matriculado em {aluno.data_matricula.strftime('%d/%m/%Y')})\n"
-        else:
-            relatorio_bruto += "Nenhum novo aluno nos últimos 7 dias.\n"
-        
-        # Adiciona informações gerais da academia
-        relatorio_bruto += f"\n### 4. Informações Gerais\n"
-        relatorio_bruto += f"- Academia: {academia.nome_fantasia}\n"
-        relatorio_bruto += f"- Data da análise: {datetime.date.today().strftime('%d/%m/%Y')}\n"
+        # Montagem do relatório para a IA: nomes por gravidade, dentro do orçamento de tokens (core/compactador.py)
+        informacoes_gerais = (
+            f"### 4. Informações Gerais\n"
+            f"- Academia: {academia.nome_fantasia}\n"
+            f"- Data da análise: {snapshot.data.strftime('%d/%m/%Y')}\n"
+            f"- Alunos: {snapshot.alunos_ativos} ativos, {snapshot.alunos_inativos} inativos, {snapshot.sem_assinatura} ativo(s) sem assinatura ativa\n"
+            f"- Faturamento do mês: R$ {snapshot.financeiro.faturamento_mes_atual:.2f} (mês passado: R$ {snapshot.financeiro.faturamento_mes_passado:.2f})\n"
+            f"- Inadimplência total: R$ {snapshot.financeiro.inadimplencia:.2f}"
+        )
+        compacto = compactar(
+            [
+                secao_inadimplentes(snapshot, "### 1. Inadimplência"),
+                secao_faltosos(snapshot, "### 2. Alunos com Baixa Frequência"),
+                secao_novos_alunos(snapshot, "### 3. Novos Alunos (últimos 7 dias)"),
+            ],
+            rodape=informacoes_gerais,
+        )
+        relatorio_bruto = "## Relatório de Status e Ações Sugeridas\n\n" + compacto.texto
+        if compacto.compactado:
+            self.stdout.write(
+                f"-> Relatório compactado: ~{compacto.tokens} tokens (~{compacto.tokens_economizados} economizados; "
+                f"{sum(compacto.omitidos.values())} aluno(s) resumidos nas contagens)."
+            )
         
         try:
-            # Configuração do modelo LangChain
-            GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-            if not GEMINI_API_KEY:
-                self.stdout.write(self.style.ERROR("GEMINI_API_KEY não configurada no ambiente."))
-                return
-            
-            # Inicializa o modelo LangChain
-            model = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=GEMINI_API_KEY,
-                temperature=0.7
-            )
+            # Cliente do LLM compartilhado pelo processo (core/llm.py); na rodada paralela
+            # uma resposta travada não pode segurar a thread para sempre
+            model = get_llm(temperatura=0.7, timeout=getattr(settings, 'AGENTE_IA_TIMEOUT_LLM', 60))
+            if model is None:
+                # Erro, e não retorno normal: a rodada paralela (core/execucao_agente.py) registra a academia como 'erro'
+                raise CommandError("GEMINI_API_KEY não configurada no ambiente.")
             
             # Template do prompt para análise
             prompt_template = ChatPromptTemplate.from_template("""
@@ -151,16 +150,39 @@ class Command(BaseCommand):
             Responda de forma clara, objetiva e em português brasileiro.
             """)
             
-            # Executa a análise
-            chain = prompt_template | model
-            response = chain.invoke({"relatorio": relatorio_bruto})
+            # Executa a análise (o mesmo relatório reaproveita a resposta guardada, core/cache_llm.py)
+            prompt = prompt_template.format_messages(relatorio=relatorio_bruto)[0].content
+            self._marcar('prompt')
+            analise = invocar_com_cache(model, prompt, academia=academia, rotina=True)
+            self._marcar('modelo')
             
             # Exibe o resultado
             self.stdout.write(self.style.SUCCESS("\n--- 📊 ANÁLISE DO ASSISTENTE IA ---"))
-            self.stdout.write(response.content)
+            self.stdout.write(analise)
             self.stdout.write(self.style.SUCCESS("--- Fim da análise ---"))
+
+            # --- FASE 4: BOLETIM DO DIA ---
+            # Guardado para o painel abrir na hora; só é refeito se os números mudaram (core/boletim.py)
+            if gerar_boletim(snapshot, get_llm(temperatura=BOLETIM_TEMPERATURA, timeout=getattr(settings, 'AGENTE_IA_TIMEOUT_LLM', 60))):
+                self.stdout.write("-> Boletim do dia gerado para o painel.")
+            else:
+                self.stdout.write("-> Boletim do dia já estava atualizado.")
+            self._marcar('boletim')
             
+        except CommandError:
+            raise
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Ocorreu um erro ao contatar a API do Gemini: {e}"))
+            raise CommandError(f"Erro ao contatar a API do Gemini: {e}") from e
+
+        self.stdout.write(self.style.SUCCESS("--- ✅ Varredura do Agente concluída. ---"))
+
+    def _marcar(self, fase):
+        """ Soma à `fase` o tempo desde a marca anterior. """
+        agora = time.perf_counter()
+        self.tempos[fase] = self.tempos.get(fase, 0) + agora - self._marco
+        self._marco = agora
 
-        self.stdout.write(self.style.SUCCESS("--- ✅ Varredura do Agente concluída. ---"))
\ No newline at end of file
+    def _relatar_pulados(self, quantidade):
+        if quantidade:
+            self.stdout.write(f"   - {quantidade} aluno(s) pulado(s): optaram por não receber notificações ou não têm WhatsApp válido.")
\ No newline at end of file
@@ -0,0 +1,34 @@
+# core/management/commands/arquivar_mensagens.py
+
+from django.core.management.base import BaseCommand
+
+from core.arquivamento import arquivar_academia, data_corte
+from core.models import Academia
+
+
+class Command(BaseCommand):
+    help = 'Move os logs de mensagens mais antigos que a retenção de cada academia para arquivos compactados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academia', type=int, default=None, help='Arquiva apenas a academia com este ID.')
+        parser.add_argument('--lote', type=int, default=None, help='Mensagens movidas por lote (padrão: ARQUIVO_MENSAGENS_LOTE).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("--- [ARQUIVO DE MENSAGENS] Iniciando arquivamento ---"))
+
+        academias = Academia.objects.filter(retencao_logs_meses__gt=0)
+        if options['academia']:
+            academias = academias.filter(pk=options['academia'])
+
+        total = 0
+        for academia in academias:
+            resumo = arquivar_academia(academia, tamanho_lote=options['lote'])
+            if resumo['arquivadas']:
+                meses = ", ".join(f"{mes:%m/%Y}" for mes in sorted(resumo['meses']))
+                self.stdout.write(
+                    f"-> {academia.nome_fantasia}: {resumo['arquivadas']} mensagem(ns) anteriores a "
+                    f"{data_corte(academia):%d/%m/%Y} arquivada(s) ({meses})."
+                )
+            total += resumo['arquivadas']
+
+        self.stdout.write(self.style.SUCCESS(f"--- [ARQUIVO DE MENSAGENS] {total} mensagem(ns) arquivada(s) ---"))
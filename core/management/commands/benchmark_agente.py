@@ -0,0 +1,173 @@
+# core/management/commands/benchmark_agente.py
+
+import datetime
+import io
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from core.management.commands.agente_ia import Command as AgenteIA
+from core.management.commands.benchmark_notificacoes import _percentil
+from core.models import Academia, Aluno, Assinatura, Fatura, Plano, Presenca
+
+FASES = ['dados', 'notificacoes', 'prompt', 'modelo', 'boletim']
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o agente de IA de ponta a ponta em academias sintéticas, com um modelo falso local '
+        '(LLM_PROVIDER=falso): mostra o tempo gasto em banco, montagem do prompt, modelo e notificações.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academias', type=int, default=5, help='Academias sintéticas (uma rodada do agente em cada).')
+        parser.add_argument('--alunos', type=int, default=200, help='Alunos por academia.')
+        parser.add_argument('--rodadas', type=int, default=1, help='Quantas vezes o agente roda em cada academia.')
+        parser.add_argument('--latencia', type=float, default=800, help='Latência do modelo falso até o primeiro pedaço (ms).')
+        parser.add_argument('--latencia-token', type=float, default=20, help='Latência do modelo falso por palavra (ms).')
+        parser.add_argument('--gemini', action='store_true', help='Usa o Gemini de verdade em vez do modelo falso.')
+        parser.add_argument('--com-cache', action='store_true', help='Mantém o cache de respostas do LLM ligado.')
+        parser.add_argument('--semente', type=int, default=42, help='Semente dos dados sintéticos.')
+        parser.add_argument('--manter', action='store_true', help='Mantém as academias criadas (por padrão tudo é desfeito).')
+
+    def handle(self, *args, **options):
+        if options['academias'] < 1 or options['alunos'] < 1 or options['rodadas'] < 1:
+            raise CommandError("--academias, --alunos e --rodadas devem ser maiores que zero.")
+
+        self.stdout.write(self.style.SUCCESS("--- [BENCHMARK DO AGENTE DE IA] ---"))
+        modelo = 'Gemini' if options['gemini'] else (
+            f"falso ({options['latencia']:.0f}ms + {options['latencia_token']:.0f}ms/palavra)"
+        )
+        self.stdout.write(
+            f"{options['academias']} academia(s) x {options['alunos']} aluno(s), "
+            f"{options['rodadas']} rodada(s) | modelo: {modelo}"
+        )
+
+        configuracao = {'LLM_CACHE_ATIVO': options['com_cache']}
+        if not options['gemini']:
+            configuracao.update(
+                LLM_PROVIDER='falso',
+                LLM_FALSO_LATENCIA_MS=options['latencia'],
+                LLM_FALSO_LATENCIA_TOKEN_MS=options['latencia_token'],
+            )
+        # Tudo numa transação: as academias, os alunos e as mensagens enfileiradas são desfeitos no fim
+        with override_settings(**configuracao), transaction.atomic():
+            inicio = time.monotonic()
+            academias = self._criar_academias(options)
+            tempo_dados = time.monotonic() - inicio
+            self.stdout.write(f"Dados sintéticos criados em {tempo_dados:.2f}s.")
+
+            execucoes = [self._executar(academia) for _ in range(options['rodadas']) for academia in academias]
+            if not options['manter']:
+                transaction.set_rollback(True)
+
+        self._relatorio(execucoes)
+        if not options['manter']:
+            self.stdout.write("Dados do benchmark desfeitos (use --manter para conservá-los).")
+
+    def _criar_academias(self, options):
+        rnd = random.Random(options['semente'])
+        sufixo = uuid.uuid4().hex[:8]
+        hoje = datetime.date.today()
+        academias = []
+        for i in range(options['academias']):
+            dono = User.objects.create_user(username=f"benchmark-agente-{sufixo}-{i}")
+            academia = Academia.objects.create(
+                nome_fantasia=f"Benchmark Agente {sufixo} #{i}",
+                razao_social=f"Benchmark Agente {sufixo} #{i}",
+                slug=f"benchmark-agente-{sufixo}-{i}",
+                dono=dono,
+                notificar_inadimplencia=True,
+                notificar_faltas=True,
+                notificar_boas_vindas=True,
+            )
+            plano = Plano.all_objects.create(academia=academia, nome="Mensal", valor=Decimal('150.00'))
+            alunos = Aluno.all_objects.bulk_create([
+                Aluno(
+                    academia=academia,
+                    nome_completo=f"Aluno Benchmark {i}-{n}",
+                    data_nascimento=datetime.date(2000, 1, 1),
+                    contato=f"+55119{i:03d}{n:05d}",
+                    # bulk_create não passa pelo save(), que normaliza o contato
+                    whatsapp_e164=f"+55119{i:03d}{n:05d}",
+                    whatsapp_valido=True,
+                    ativo=rnd.random() < 0.9,
+                )
+                for n in range(options['alunos'])
+            ])
+            # data_matricula é auto_now_add: só uns poucos ficam como novos alunos
+            antigos = [aluno.id for aluno in alunos if rnd.random() < 0.95]
+            Aluno.all_objects.filter(id__in=antigos).update(data_matricula=hoje - datetime.timedelta(days=180))
+
+            assinaturas = Assinatura.all_objects.bulk_create([
+                Assinatura(academia=academia, aluno=aluno, plano=plano, data_inicio=hoje - datetime.timedelta(days=90))
+                for aluno in alunos if rnd.random() < 0.85
+            ])
+            faturas = []
+            for assinatura in assinaturas:
+                for meses in range(3):
+                    vencimento = hoje - datetime.timedelta(days=30 * meses + 5)
+                    paga = meses > 0 or rnd.random() < 0.8
+                    faturas.append(Fatura(
+                        academia=academia, assinatura=assinatura, valor=plano.valor,
+                        data_vencimento=vencimento, data_pagamento=vencimento if paga else None,
+                    ))
+            Fatura.all_objects.bulk_create(faturas)
+
+            presencas = []
+            for aluno in alunos:
+                for dias in rnd.sample(range(1, 31), rnd.choice([0, 1, 2, 3, 6, 10, 14])):
+                    presencas.append(Presenca(academia=academia, aluno=aluno, data=hoje - datetime.timedelta(days=dias)))
+            Presenca.all_objects.bulk_create(presencas)
+            academias.append(academia)
+        return academias
+
+    def _executar(self, academia):
+        """ Uma rodada do agente, com o tempo de cada fase e o tempo gasto no banco. """
+        banco = {'consultas': 0, 'tempo': 0.0}
+
+        def medir_banco(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                banco['consultas'] += 1
+                banco['tempo'] += time.perf_counter() - inicio
+
+        agente = AgenteIA()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(medir_banco):
+            call_command(agente, academia.id, stdout=io.StringIO(), stderr=io.StringIO())
+        return {
+            'total': time.perf_counter() - inicio,
+            'fases': getattr(agente, 'tempos', {}),
+            'banco': banco['tempo'],
+            'consultas': banco['consultas'],
+        }
+
+    def _relatorio(self, execucoes):
+        ms = lambda segundos: f"{segundos * 1000:.1f}ms"
+        linha = lambda nome, valores: (
+            f"{nome:<14} p50 {ms(_percentil(valores, 50)):>10} | p99 {ms(_percentil(valores, 99)):>10} | "
+            f"total {sum(valores):.2f}s"
+        )
+        totais = [e['total'] for e in execucoes]
+
+        self.stdout.write(self.style.SUCCESS("\n--- Resultado (por rodada do agente) ---"))
+        self.stdout.write(linha('rodada', totais))
+        for fase in FASES:
+            self.stdout.write(linha(fase, [e['fases'].get(fase, 0) for e in execucoes]))
+        self.stdout.write(linha('banco', [e['banco'] for e in execucoes]))
+        consultas = [e['consultas'] for e in execucoes]
+        self.stdout.write(
+            f"Consultas por rodada: p50 {_percentil(consultas, 50)} | máx {max(consultas)} "
+            f"(o tempo de banco está incluído nas fases)"
+        )
+        self.stdout.write(f"{len(execucoes)} rodada(s) em {sum(totais):.2f}s")
@@ -0,0 +1,196 @@
+# core/management/commands/benchmark_notificacoes.py
+
+import datetime
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.gateway_simulado import iniciar_em_thread
+from core.models import Academia, Aluno, LogMensagem
+from core.notificacoes import enfileirar_mensagem, processar_fila
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)
+    return ordenados[indice]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão da fila de mensagens de WhatsApp: enfileira N mensagens para academias '
+        'sintéticas, entrega tudo por um gateway simulado e mostra vazão, latências p50/p99 e retentativas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mensagens', type=int, default=2000, help='Quantidade de mensagens enfileiradas.')
+        parser.add_argument('--academias', type=int, default=1, help='Academias sintéticas entre as quais as mensagens são divididas.')
+        parser.add_argument('--lote', type=int, default=None, help='Tamanho do lote da fila (padrão: WHATSAPP_OUTBOX_LOTE).')
+        parser.add_argument('--workers', type=int, default=None, help='Envios simultâneos (padrão: WHATSAPP_OUTBOX_WORKERS).')
+        parser.add_argument('--gateway-url', default=None, help='Usa um gateway já rodando em vez de subir o simulado.')
+        parser.add_argument('--latencia', type=float, default=20, help='Latência do gateway simulado por mensagem (ms).')
+        parser.add_argument('--variacao', type=float, default=10, help='Variação aleatória da latência simulada (ms).')
+        parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração dos envios que falham no gateway simulado.')
+        parser.add_argument('--limite-por-minuto', type=int, default=0, help='Limite por academia no gateway simulado (0 = sem limite).')
+        parser.add_argument('--sem-lote', action='store_true', help='Gateway simulado sem /send-batch (envio mensagem a mensagem).')
+        parser.add_argument('--semente', type=int, default=42, help='Semente do gateway simulado.')
+        parser.add_argument('--timeout', type=int, default=600, help='Tempo máximo de entrega, em segundos.')
+        parser.add_argument('--manter', action='store_true', help='Mantém as academias e mensagens criadas (por padrão tudo é desfeito).')
+
+    def handle(self, *args, **options):
+        if options['mensagens'] < 1 or options['academias'] < 1:
+            raise CommandError("--mensagens e --academias devem ser maiores que zero.")
+        # processar_fila entrega tudo o que estiver pendente: não misturar com mensagens reais
+        if LogMensagem.all_objects.filter(status__in=['pendente', 'enviando']).exists():
+            raise CommandError(
+                "Há mensagens reais na fila. Rode o benchmark em um banco de desenvolvimento com a fila vazia."
+            )
+
+        servidor = None
+        gateway_url = options['gateway_url']
+        if not gateway_url:
+            servidor, gateway_url = iniciar_em_thread(
+                porta=0,
+                latencia_ms=options['latencia'],
+                variacao_ms=options['variacao'],
+                taxa_erro=options['taxa_erro'],
+                limite_por_minuto=options['limite_por_minuto'],
+                suporta_lote=not options['sem_lote'],
+                semente=options['semente'],
+            )
+
+        self.stdout.write(self.style.SUCCESS("--- [BENCHMARK DE NOTIFICAÇÕES] ---"))
+        self.stdout.write(f"Gateway: {gateway_url} | {options['mensagens']} mensagem(ns) em {options['academias']} academia(s)")
+
+        # Retentativas imediatas: o benchmark mede o caminho de entrega, não o backoff
+        try:
+            # Fora do pool: tudo vai para o gateway do benchmark, mesmo com nós cadastrados
+            with override_settings(WHATSAPP_GATEWAY_URL=gateway_url, WHATSAPP_GATEWAY_POOL=False,
+                                   WHATSAPP_OUTBOX_BACKOFF_SEGUNDOS=0):
+                with transaction.atomic():
+                    resultado = self._executar(options)
+                    if not options['manter']:
+                        transaction.set_rollback(True)
+        finally:
+            if servidor is not None:
+                servidor.shutdown()
+                servidor.server_close()
+
+        self._relatorio(resultado, servidor)
+        if not options['manter']:
+            self.stdout.write("Dados do benchmark desfeitos (use --manter para conservá-los).")
+
+    def _criar_academias(self, quantidade, mensagens):
+        sufixo = uuid.uuid4().hex[:8]
+        academias = []
+        for i in range(quantidade):
+            dono = User.objects.create_user(username=f"benchmark-{sufixo}-{i}")
+            academias.append(Academia.objects.create(
+                nome_fantasia=f"Benchmark {sufixo} #{i}",
+                razao_social=f"Benchmark {sufixo} #{i}",
+                slug=f"benchmark-{sufixo}-{i}",
+                dono=dono,
+                # Sem janela nem ritmo: a vazão medida é a do caminho de entrega
+                whatsapp_mensagens_por_minuto=max(mensagens * 60, 1),
+                whatsapp_rajada=mensagens,
+                whatsapp_horario_inicio=datetime.time.min,
+                whatsapp_horario_fim=datetime.time.max,
+            ))
+        return academias
+
+    def _executar(self, options):
+        total = options['mensagens']
+        academias = self._criar_academias(options['academias'], total)
+
+        alunos = Aluno.all_objects.bulk_create([
+            Aluno(
+                academia=academias[i % len(academias)],
+                nome_completo=f"Aluno Benchmark {i}",
+                data_nascimento=datetime.date(2000, 1, 1),
+                contato=f"+55119{i:08d}",
+                # bulk_create não passa pelo save(), que normaliza o contato
+                whatsapp_e164=f"+55119{i:08d}",
+                whatsapp_valido=True,
+            )
+            for i in range(min(total, 500))
+        ])
+
+        inicio = time.monotonic()
+        for i in range(total):
+            aluno = alunos[i % len(alunos)]
+            enfileirar_mensagem(aluno.academia, aluno, f"Mensagem de benchmark #{i}", tipo='outro')
+        tempo_enfileirar = time.monotonic() - inicio
+
+        fila = LogMensagem.all_objects.filter(academia__in=academias)
+        duracoes_lote = []
+        resumo = {'enviadas': 0, 'reagendadas': 0, 'falhas': 0, 'adiadas': 0, 'lotes': 0}
+        inicio = time.monotonic()
+        limite = inicio + options['timeout']
+
+        while fila.filter(status__in=['pendente', 'enviando']).exists():
+            if time.monotonic() > limite:
+                self.stdout.write(self.style.WARNING("Tempo máximo atingido; o relatório considera só o que foi entregue."))
+                break
+            t0 = time.monotonic()
+            parcial = processar_fila(tamanho_lote=options['lote'], max_workers=options['workers'], max_lotes=1)
+            if parcial['lotes']:
+                duracoes_lote.append(time.monotonic() - t0)
+            else:
+                time.sleep(0.05)
+            for chave, valor in parcial.items():
+                resumo[chave] += valor
+        tempo_entrega = time.monotonic() - inicio
+
+        latencias = [
+            (processado - enfileirado).total_seconds()
+            for enfileirado, processado in fila.filter(status='enviado').values_list('data_envio', 'data_processamento')
+        ]
+        tentativas_extras = sum(max(t - 1, 0) for t in fila.values_list('tentativas', flat=True))
+
+        return {
+            'total': total,
+            'tempo_enfileirar': tempo_enfileirar,
+            'tempo_entrega': tempo_entrega,
+            'resumo': resumo,
+            'latencias': latencias,
+            'duracoes_lote': duracoes_lote,
+            'tentativas_extras': tentativas_extras,
+            'pendentes': fila.filter(status__in=['pendente', 'enviando']).count(),
+            'concluido_em': timezone.now(),
+        }
+
+    def _relatorio(self, r, servidor):
+        resumo = r['resumo']
+        ms = lambda segundos: f"{segundos * 1000:.1f}ms"
+
+        self.stdout.write(self.style.SUCCESS("\n--- Resultado ---"))
+        self.stdout.write(
+            f"Enfileiramento: {r['total']} mensagem(ns) em {r['tempo_enfileirar']:.2f}s "
+            f"({r['total'] / max(r['tempo_enfileirar'], 1e-9):.0f} msg/s)"
+        )
+        self.stdout.write(
+            f"Entrega: {resumo['enviadas']} enviada(s), {resumo['falhas']} com falha, "
+            f"{r['pendentes']} ainda pendente(s), em {r['tempo_entrega']:.2f}s "
+            f"({resumo['enviadas'] / max(r['tempo_entrega'], 1e-9):.1f} msg/s)"
+        )
+        self.stdout.write(
+            f"Latência fila→envio: p50 {ms(_percentil(r['latencias'], 50))} | "
+            f"p99 {ms(_percentil(r['latencias'], 99))} | máx {ms(max(r['latencias'], default=0))}"
+        )
+        self.stdout.write(
+            f"Duração por lote ({resumo['lotes']} lote(s)): p50 {ms(_percentil(r['duracoes_lote'], 50))} | "
+            f"p99 {ms(_percentil(r['duracoes_lote'], 99))}"
+        )
+        self.stdout.write(
+            f"Retentativas: {resumo['reagendadas']} reagendamento(s), "
+            f"{r['tentativas_extras']} tentativa(s) além da primeira"
+        )
+        if servidor is not None:
+            self.stdout.write(f"Gateway simulado: {servidor.estado.contadores}")
@@ -46,6 +46,9 @@ class Command(BaseCommand):
                 'backup_automatico': False,
                 'suporte_prioritario': False,
                 'api_acesso': False,
+                'ia_requisicoes_por_minuto': 10,
+                'ia_geracoes_simultaneas': 1,
+                'ia_tokens_por_dia': 50000,
                 'ativo': True,
             }
         )
@@ -75,6 +78,9 @@ class Command(BaseCommand):
                 'backup_automatico': True,
                 'suporte_prioritario': False,
                 'api_acesso': False,
+                'ia_requisicoes_por_minuto': 20,
+                'ia_geracoes_simultaneas': 2,
+                'ia_tokens_por_dia': 200000,
                 'ativo': True,
             }
         )
@@ -104,6 +110,9 @@ class Command(BaseCommand):
                 'backup_automatico': True,
                 'suporte_prioritario': True,
                 'api_acesso': True,
+                'ia_requisicoes_por_minuto': 60,
+                'ia_geracoes_simultaneas': 5,
+                'ia_tokens_por_dia': 1000000,
                 'ativo': True,
             }
         )
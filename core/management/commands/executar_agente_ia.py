@@ -0,0 +1,31 @@
+# core/management/commands/executar_agente_ia.py
+
+from django.core.management.base import BaseCommand
+
+from core.execucao_agente import executar_agente
+
+
+class Command(BaseCommand):
+    help = 'Executa o agente de IA em paralelo para todas as academias ativas e registra o resumo da rodada.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Academias processadas ao mesmo tempo (padrão: AGENTE_IA_WORKERS).')
+        parser.add_argument('--timeout', type=int, default=None, help='Tempo máximo por academia, em segundos (padrão: AGENTE_IA_TIMEOUT).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("--- [AGENTE DE IA] Iniciando rodada nas academias ativas ---"))
+
+        def ao_terminar(resultado):
+            linha = f"-> {resultado['academia']} (ID {resultado['academia_id']}): {resultado['status']} em {resultado['duracao_segundos']:.1f}s"
+            if resultado['status'] == 'sucesso':
+                self.stdout.write(linha)
+            else:
+                self.stdout.write(self.style.ERROR(f"{linha} - {resultado.get('erro', '')}"))
+
+        execucao = executar_agente(workers=options['workers'], timeout=options['timeout'], ao_terminar=ao_terminar)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"--- [AGENTE DE IA] {execucao.total_academias} academia(s) em {execucao.duracao_segundos:.1f}s "
+            f"({execucao.workers} em paralelo): {execucao.sucessos} ok, {execucao.erros} erro(s), "
+            f"{execucao.tempo_esgotado} com tempo esgotado ---"
+        ))
@@ -0,0 +1,68 @@
+# core/management/commands/gateway_simulado.py
+
+import threading
+
+from django.core.management.base import BaseCommand
+
+from core.gateway_simulado import criar_servidor
+
+
+class Command(BaseCommand):
+    help = 'Sobe um gateway de WhatsApp simulado (sem celular) com latência, erros e limites configuráveis.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Endereço em que o servidor escuta.')
+        parser.add_argument('--porta', type=int, default=3000, help='Porta do servidor (a mesma do gateway Node.js).')
+        parser.add_argument('--nos', type=int, default=1, help='Quantidade de nós (um servidor por porta, a partir de --porta) para testar o pool de gateways.')
+        parser.add_argument('--latencia', type=float, default=50, help='Latência de cada envio, em milissegundos.')
+        parser.add_argument('--variacao', type=float, default=0, help='Variação aleatória somada à latência, em milissegundos.')
+        parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração dos envios que falham (0 a 1).')
+        parser.add_argument('--limite-por-minuto', type=int, default=0, help='Mensagens por minuto aceitas por academia (0 = sem limite).')
+        parser.add_argument('--sem-lote', action='store_true', help='Simula um gateway antigo, sem o endpoint /send-batch.')
+        parser.add_argument('--exigir-qr', action='store_true', help='Exige /initialize antes de enviar (QR Code falso lido após alguns segundos).')
+        parser.add_argument('--tempo-qr', type=float, default=2.0, help='Segundos até o QR Code falso ser "lido".')
+        parser.add_argument('--semente', type=int, default=None, help='Semente do gerador aleatório, para execuções repetíveis.')
+
+    def handle(self, *args, **options):
+        servidores = [
+            criar_servidor(
+                host=options['host'],
+                porta=options['porta'] + i if options['porta'] else 0,
+                latencia_ms=options['latencia'],
+                variacao_ms=options['variacao'],
+                taxa_erro=options['taxa_erro'],
+                limite_por_minuto=options['limite_por_minuto'],
+                suporta_lote=not options['sem_lote'],
+                exigir_qr=options['exigir_qr'],
+                tempo_qr=options['tempo_qr'],
+                semente=options['semente'],
+            )
+            for i in range(max(options['nos'], 1))
+        ]
+        for servidor in servidores:
+            host, porta = servidor.server_address[:2]
+            self.stdout.write(self.style.SUCCESS(f"--- [GATEWAY SIMULADO] Rodando em http://{host}:{porta} ---"))
+        self.stdout.write(
+            f"Latência {options['latencia']:.0f}ms (+até {options['variacao']:.0f}ms), "
+            f"taxa de erro {options['taxa_erro']:.0%}, "
+            f"limite {options['limite_por_minuto'] or 'ilimitado'} msg/min por academia, "
+            f"/send-batch {'desativado' if options['sem_lote'] else 'ativo'}."
+        )
+        if len(servidores) > 1:
+            self.stdout.write(
+                "Cadastre os nós no pool com: python manage.py rebalancear_gateways --adicionar http://HOST:PORTA"
+            )
+
+        # Os nós extras rodam em threads; o primeiro segura o terminal
+        for servidor in servidores[1:]:
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        try:
+            servidores[0].serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for servidor in servidores:
+                servidor.server_close()
+                host, porta = servidor.server_address[:2]
+                self.stdout.write(f"Contadores finais ({host}:{porta}): {servidor.estado.contadores}")
+            self.stdout.write(self.style.SUCCESS("--- [GATEWAY SIMULADO] Encerrado ---"))
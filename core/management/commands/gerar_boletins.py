@@ -0,0 +1,59 @@
+# core/management/commands/gerar_boletins.py
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.boletim import TEMPERATURA, gerar_boletim
+from core.execucao_agente import academias_ativas
+from core.llm import get_llm
+from core.models import BoletimDiario
+from core.snapshot import construir_snapshot
+
+
+def _gerar(academia):
+    """ Boletim de uma academia (em uma thread do pool). """
+    try:
+        llm = get_llm(temperatura=TEMPERATURA, timeout=getattr(settings, 'AGENTE_IA_TIMEOUT_LLM', 60))
+        return 'gerado' if gerar_boletim(construir_snapshot(academia), llm) else 'atualizado'
+    except Exception as e:
+        return f"erro: {e}"
+    finally:
+        # Conexões com o banco são por thread: fecha as desta antes de devolvê-la ao pool
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Gera o boletim diário do assistente de todas as academias ativas, para o painel abrir na hora.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Academias processadas ao mesmo tempo (padrão: AGENTE_IA_WORKERS).')
+        parser.add_argument('--dias-retencao', type=int, default=7, help='Boletins mais antigos que isso são apagados.')
+
+    def handle(self, *args, **options):
+        if get_llm() is None:
+            self.stdout.write(self.style.ERROR("GEMINI_API_KEY não configurada no ambiente."))
+            return
+
+        academias = list(academias_ativas())
+        workers = max(options['workers'] or getattr(settings, 'AGENTE_IA_WORKERS', 8), 1)
+        self.stdout.write(self.style.SUCCESS(f"--- [BOLETINS] {len(academias)} academia(s), {workers} em paralelo ---"))
+
+        contagem = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='boletim') as executor:
+            for academia, resultado in zip(academias, executor.map(_gerar, academias)):
+                chave = resultado.split(':')[0]
+                contagem[chave] = contagem.get(chave, 0) + 1
+                if chave == 'erro':
+                    self.stdout.write(self.style.ERROR(f"-> {academia.nome_fantasia} (ID {academia.id}): {resultado}"))
+
+        limite = datetime.date.today() - datetime.timedelta(days=options['dias_retencao'])
+        apagados, _ = BoletimDiario.all_objects.filter(data__lt=limite).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"--- [BOLETINS] {contagem.get('gerado', 0)} gerado(s), {contagem.get('atualizado', 0)} já atualizado(s), "
+            f"{contagem.get('erro', 0)} erro(s); {apagados} boletim(ns) antigo(s) apagado(s) ---"
+        ))
@@ -0,0 +1,36 @@
+# core/management/commands/processar_mensagens.py
+
+import time
+from django.core.management.base import BaseCommand
+
+from core.notificacoes import processar_fila
+
+
+class Command(BaseCommand):
+    help = 'Entrega as mensagens de WhatsApp pendentes na fila de envio (outbox).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None, help='Quantidade de mensagens reivindicadas por lote.')
+        parser.add_argument('--workers', type=int, default=None, help='Número máximo de envios simultâneos.')
+        parser.add_argument('--continuo', action='store_true', help='Continua rodando e verificando a fila periodicamente.')
+        parser.add_argument('--intervalo', type=int, default=10, help='Segundos entre verificações no modo contínuo.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("--- [FILA DE MENSAGENS] Iniciando processamento ---"))
+
+        while True:
+            resumo = processar_fila(tamanho_lote=options['lote'], max_workers=options['workers'])
+            if resumo['lotes']:
+                self.stdout.write(
+                    f"-> {resumo['enviadas']} enviada(s), {resumo['reagendadas']} reagendada(s), "
+                    f"{resumo['falhas']} com falha em {resumo['lotes']} lote(s)."
+                )
+            if resumo['adiadas']:
+                self.stdout.write(self.style.WARNING(
+                    f"-> {resumo['adiadas']} adiada(s): gateway indisponível (disjuntor aberto)."
+                ))
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS("--- [FILA DE MENSAGENS] Processamento concluído ---"))
@@ -0,0 +1,90 @@
+# core/management/commands/rebalancear_gateways.py
+
+from urllib.parse import urlparse
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from core.gateway_pool import invalidar_cache, mover_academia, planejar_rebalanceamento
+from core.models import NoGateway
+
+
+class Command(BaseCommand):
+    help = (
+        'Gerencia os nós do pool de gateways do WhatsApp e move as academias para o nó que o hash '
+        'consistente indica (depois de adicionar, drenar ou remover nós).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--adicionar', metavar='URL', default=None, help='Cadastra (ou reativa) um nó com esta URL.')
+        parser.add_argument('--nome', default=None, help='Nome do nó em --adicionar (padrão: host:porta da URL).')
+        parser.add_argument('--peso', type=int, default=1, help='Peso do nó em --adicionar (mais peso, mais academias).')
+        parser.add_argument('--drenar', metavar='NOME', default=None, help='Tira o nó do anel e move as academias dele para os demais.')
+        parser.add_argument('--remover', metavar='NOME', default=None, help='Desativa o nó (deixa de atender na hora) e move as academias dele.')
+        parser.add_argument('--ativar', metavar='NOME', default=None, help='Devolve ao anel um nó drenando ou inativo.')
+        parser.add_argument('--simular', action='store_true', help='Só mostra o que seria movido, sem alterar nada.')
+        parser.add_argument('--sem-reconectar', action='store_true', help='Só troca a atribuição, sem encerrar/iniciar as sessões nos nós.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("--- [POOL DE GATEWAYS] ---"))
+        if not options['simular']:
+            self._alterar_nos(options)
+        invalidar_cache()
+        self._listar_nos()
+
+        movimentos = planejar_rebalanceamento()
+        if not movimentos:
+            self.stdout.write(self.style.SUCCESS("Nenhuma academia precisa mudar de nó."))
+            return
+
+        reconectadas = 0
+        for academia, origem, destino in movimentos:
+            de = origem.nome if origem else 'sem nó'
+            if options['simular']:
+                self.stdout.write(f"-> [simulação] {academia.nome_fantasia}: {de} -> {destino.nome}")
+                continue
+            if mover_academia(academia, origem, destino, reconectar=not options['sem_reconectar']):
+                reconectadas += 1
+            self.stdout.write(f"-> {academia.nome_fantasia}: {de} -> {destino.nome}")
+
+        verbo = 'seriam movida(s)' if options['simular'] else 'movida(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f"--- [POOL DE GATEWAYS] {len(movimentos)} academia(s) {verbo}; "
+            f"{reconectadas} sessão(ões) reiniciada(s) no novo nó ---"
+        ))
+
+    def _no(self, nome):
+        try:
+            return NoGateway.objects.get(nome=nome)
+        except NoGateway.DoesNotExist:
+            raise CommandError(f"Nó '{nome}' não encontrado.")
+
+    def _alterar_nos(self, options):
+        if options['adicionar']:
+            url = options['adicionar'].rstrip('/')
+            endereco = urlparse(url)
+            if endereco.scheme not in ('http', 'https') or not endereco.netloc:
+                raise CommandError(f"URL inválida: {url}")
+            no, criado = NoGateway.objects.update_or_create(
+                url=url,
+                defaults={'nome': options['nome'] or endereco.netloc, 'peso': max(options['peso'], 1), 'estado': 'ativo'},
+            )
+            self.stdout.write(f"Nó {no.nome} ({no.url}) {'cadastrado' if criado else 'atualizado'}.")
+
+        for opcao, estado in (('drenar', 'drenando'), ('remover', 'inativo'), ('ativar', 'ativo')):
+            if options[opcao]:
+                no = self._no(options[opcao])
+                no.estado = estado
+                no.save(update_fields=['estado', 'atualizado_em'])
+                self.stdout.write(f"Nó {no.nome} agora está {no.get_estado_display().lower()}.")
+
+    def _listar_nos(self):
+        nos = NoGateway.objects.annotate(total_academias=Count('academias')).order_by('nome')
+        if not nos:
+            self.stdout.write("Nenhum nó cadastrado: todas as academias usam WHATSAPP_GATEWAY_URL.")
+            return
+        for no in nos:
+            self.stdout.write(
+                f"   {no.nome:<24} {no.url:<32} {no.get_estado_display():<10} peso {no.peso}  "
+                f"{no.total_academias} academia(s)"
+            )
@@ -0,0 +1,101 @@
+# core/memoria_chat.py
+
+"""
+Memória da conversa do assistente, por usuário e academia (MemoriaChat).
+
+A conversa não fica na sessão: cada pergunta gravaria a sessão inteira de
+novo, e o histórico cresceria sem limite. Aqui ficam guardadas:
+
+- as últimas IA_MEMORIA_TURNOS perguntas e respostas, na íntegra (cada texto
+  cortado em IA_MEMORIA_CARACTERES_TURNO caracteres);
+- um resumo das mais antigas, com no máximo IA_MEMORIA_CARACTERES_RESUMO
+  caracteres.
+
+Quando a janela passa de IA_MEMORIA_TURNOS + IA_MEMORIA_LOTE_RESUMO mensagens,
+as excedentes são resumidas de uma vez pelo LLM (ou, sem LLM, viram uma linha
+curta cada) e saem da janela. Assim o resumo custa uma chamada a cada alguns
+turnos, e o prompt e a linha no banco têm tamanho limitado.
+"""
+
+import logging
+
+from django.conf import settings
+
+from .cotas_ia import contabilizar
+from .llm import get_llm
+from .models import MemoriaChat
+
+logger = logging.getLogger(__name__)
+
+
+def _limite(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def _cortar(texto, limite):
+    texto = (texto or '').strip()
+    return texto if len(texto) <= limite else texto[:limite - 1].rstrip() + '…'
+
+
+def obter_memoria(academia, usuario):
+    """ Memória da conversa (uma instância nova, ainda não salva, se não houver). """
+    memoria = MemoriaChat.all_objects.filter(academia=academia, usuario=usuario).first()
+    return memoria or MemoriaChat(academia=academia, usuario=usuario)
+
+
+def limpar_memoria(academia, usuario):
+    MemoriaChat.all_objects.filter(academia=academia, usuario=usuario).delete()
+
+
+def janela(memoria):
+    """ Texto da conversa até aqui para o prompt ('' se a conversa está começando). """
+    partes = []
+    if memoria.resumo:
+        partes.append(f"Resumo da conversa anterior:\n{memoria.resumo}")
+    if memoria.turnos:
+        partes.append("Últimas mensagens:\n" + "\n".join(
+            f"Usuário: {turno['pergunta']}\nAssistente: {turno['resposta']}" for turno in memoria.turnos
+        ))
+    return "\n\n".join(partes)
+
+
+def registrar_turno(memoria, pergunta, resposta):
+    """ Guarda a pergunta e a resposta, resumindo as mensagens que saíram da janela. """
+    limite_turno = _limite('IA_MEMORIA_CARACTERES_TURNO', 1000)
+    memoria.turnos = list(memoria.turnos) + [{
+        'pergunta': _cortar(pergunta, limite_turno),
+        'resposta': _cortar(resposta, limite_turno),
+    }]
+    memoria.total_turnos += 1
+
+    manter = max(_limite('IA_MEMORIA_TURNOS', 6), 0)
+    if len(memoria.turnos) > manter + max(_limite('IA_MEMORIA_LOTE_RESUMO', 4), 0):
+        corte = len(memoria.turnos) - manter
+        memoria.resumo = _resumir(memoria.resumo, memoria.turnos[:corte], memoria.academia)
+        memoria.turnos = memoria.turnos[corte:]
+    memoria.save()
+    return memoria
+
+
+def _resumir(resumo, turnos, academia):
+    limite = _limite('IA_MEMORIA_CARACTERES_RESUMO', 2000)
+    llm = get_llm(temperatura=0)
+    if llm is not None:
+        conversa = "\n".join(f"Usuário: {t['pergunta']}\nAssistente: {t['resposta']}" for t in turnos)
+        prompt = (
+            "Você mantém o resumo de uma conversa entre o dono de uma academia e o assistente de gestão.\n"
+            f"Atualize o resumo abaixo com as novas mensagens, em português, em até {limite} caracteres. "
+            "Guarde nomes de alunos, valores e pedidos em aberto; descarte cumprimentos.\n\n"
+            f"Resumo atual:\n{resumo or '(vazio)'}\n\nNovas mensagens:\n{conversa}\n\nResumo atualizado:"
+        )
+        try:
+            mensagem = llm.invoke(prompt)
+            contabilizar(academia, mensagem, prompt, mensagem.content)
+            return _cortar(mensagem.content, limite)
+        except Exception as e:
+            logger.warning("Não foi possível resumir a conversa com o LLM: %s", e)
+
+    # Sem LLM: uma linha curta por mensagem, mantendo as mais recentes
+    linhas = [f"- {_cortar(t['pergunta'], 120)} → {_cortar(t['resposta'], 160)}" for t in turnos]
+    texto = "\n".join(filter(None, [resumo] + linhas))
+    return texto if len(texto) <= limite else '…' + texto[-(limite - 1):]
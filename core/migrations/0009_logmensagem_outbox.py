@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def marcar_logs_existentes(apps, schema_editor):
+    """
+    Os logs criados antes da fila já passaram pelo gateway. Sem isto eles
+    entrariam como 'pendente' e seriam reenviados pelo worker.
+    """
+    LogMensagem = apps.get_model('core', 'LogMensagem')
+    LogMensagem.objects.filter(sucesso=True).update(status='enviado', tentativas=1)
+    LogMensagem.objects.filter(sucesso=False).update(status='falhou', tentativas=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_assinaturasaas_configuracaosistema_planosaas_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logmensagem',
+            name='data_processamento',
+            field=models.DateTimeField(blank=True, help_text='Momento da última tentativa de entrega.', null=True),
+        ),
+        migrations.AddField(
+            model_name='logmensagem',
+            name='proxima_tentativa',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='A mensagem só é reivindicada pelo worker a partir deste momento.'),
+        ),
+        migrations.AddField(
+            model_name='logmensagem',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Pendente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('falhou', 'Falhou')], default='pendente', help_text='Situação da mensagem na fila de envio.', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='logmensagem',
+            name='tentativas',
+            field=models.PositiveIntegerField(default=0, help_text='Quantas vezes o worker tentou entregar a mensagem.'),
+        ),
+        migrations.AlterField(
+            model_name='logmensagem',
+            name='sucesso',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(marcar_logs_existentes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='logmensagem',
+            index=models.Index(fields=['status', 'proxima_tentativa'], name='logmsg_fila_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:14
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_logmensagem_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academia',
+            name='whatsapp_horario_fim',
+            field=models.TimeField(default=datetime.time(20, 0), help_text='Fim da janela diária de envio de mensagens.'),
+        ),
+        migrations.AddField(
+            model_name='academia',
+            name='whatsapp_horario_inicio',
+            field=models.TimeField(default=datetime.time(8, 0), help_text='Início da janela diária de envio de mensagens.'),
+        ),
+        migrations.AddField(
+            model_name='academia',
+            name='whatsapp_mensagens_por_minuto',
+            field=models.PositiveIntegerField(default=20, help_text='Quantidade máxima de mensagens enviadas por minuto (ritmo contínuo).'),
+        ),
+        migrations.AddField(
+            model_name='academia',
+            name='whatsapp_rajada',
+            field=models.PositiveIntegerField(default=10, help_text='Quantidade de mensagens que podem sair de uma só vez antes de aplicar o ritmo.'),
+        ),
+        migrations.AddField(
+            model_name='logmensagem',
+            name='agendada',
+            field=models.BooleanField(default=False, help_text='Se a mensagem já foi distribuída na janela de envio da academia.'),
+        ),
+        migrations.CreateModel(
+            name='BaldeTokens',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recurso', models.CharField(help_text='Recurso limitado (ex: whatsapp).', max_length=30)),
+                ('tokens', models.FloatField(help_text='Fichas disponíveis no momento da última atualização.')),
+                ('atualizado_em', models.DateTimeField()),
+                ('academia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='baldes_tokens', to='core.academia')),
+            ],
+            options={
+                'verbose_name': 'Balde de Tokens',
+                'verbose_name_plural': 'Baldes de Tokens',
+                'unique_together': {('academia', 'recurso')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import TruncDate
+import django.utils.timezone
+
+
+def preencher_data_referencia(apps, schema_editor):
+    """ Os logs antigos se referem ao dia em que foram enviados. """
+    LogMensagem = apps.get_model('core', 'LogMensagem')
+    LogMensagem.objects.update(data_referencia=TruncDate('data_envio'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_limites_envio_whatsapp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logmensagem',
+            name='agrupada_em',
+            field=models.ForeignKey(blank=True, help_text='Mensagem-resumo que incluiu esta notificação.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notificacoes_agrupadas', to='core.logmensagem'),
+        ),
+        migrations.AddField(
+            model_name='logmensagem',
+            name='data_referencia',
+            field=models.DateField(default=django.utils.timezone.localdate, help_text='Dia a que a notificação se refere (usado para evitar repetições).'),
+        ),
+        migrations.AlterField(
+            model_name='logmensagem',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Pendente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('falhou', 'Falhou'), ('agrupado', 'Agrupado em outra mensagem')], default='pendente', help_text='Situação da mensagem na fila de envio.', max_length=10),
+        ),
+        migrations.RunPython(preencher_data_referencia, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='logmensagem',
+            index=models.Index(fields=['aluno', 'tipo', 'data_referencia'], name='logmsg_dedup_idx'),
+        ),
+    ]
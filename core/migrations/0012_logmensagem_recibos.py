@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_logmensagem_dedup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logmensagem',
+            name='data_entrega',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='logmensagem',
+            name='data_leitura',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='logmensagem',
+            name='gateway_message_id',
+            field=models.CharField(blank=True, db_index=True, help_text='ID da mensagem no WhatsApp, devolvido pelo gateway no envio.', max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name='logmensagem',
+            name='status_entrega',
+            field=models.CharField(blank=True, choices=[('', 'Sem confirmação'), ('falhou', 'Falha na entrega'), ('entregue', 'Entregue'), ('lida', 'Lida')], default='', help_text='Última confirmação recebida do WhatsApp.', max_length=10),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_logmensagem_recibos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academia',
+            name='retencao_logs_meses',
+            field=models.PositiveIntegerField(default=12, help_text='Meses em que o log de mensagens fica na base principal antes de ir para o arquivo compactado (0 = nunca arquivar).'),
+        ),
+        migrations.CreateModel(
+            name='ArquivoLogMensagem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primeiro dia do mês das mensagens arquivadas.')),
+                ('caminho', models.CharField(help_text='Caminho do arquivo, relativo a ARQUIVO_MENSAGENS_DIR.', max_length=255)),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('enviadas', models.PositiveIntegerField(default=0)),
+                ('entregues', models.PositiveIntegerField(default=0)),
+                ('lidas', models.PositiveIntegerField(default=0)),
+                ('falhas_entrega', models.PositiveIntegerField(default=0)),
+                ('tamanho_bytes', models.PositiveBigIntegerField(default=0)),
+                ('primeira_data', models.DateTimeField(blank=True, null=True)),
+                ('ultima_data', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('academia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='arquivos_mensagens', to='core.academia')),
+            ],
+            options={
+                'verbose_name': 'Arquivo de Mensagens',
+                'verbose_name_plural': 'Arquivos de Mensagens',
+                'ordering': ['-mes'],
+                'unique_together': {('academia', 'mes')},
+            },
+        ),
+    ]
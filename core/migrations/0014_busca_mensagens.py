@@ -0,0 +1,147 @@
+# Índice de busca textual do log de mensagens (FTS5 no SQLite, tsvector + GIN no PostgreSQL)
+
+from django.db import migrations
+
+
+SQLITE_CRIAR = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_logmensagem_fts USING fts5(
+        academia_id UNINDEXED,
+        nome_aluno,
+        mensagem,
+        tokenize = "unicode61 remove_diacritics 2"
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_logmensagem_fts_insert AFTER INSERT ON core_logmensagem BEGIN
+        INSERT INTO core_logmensagem_fts (rowid, academia_id, nome_aluno, mensagem)
+        VALUES (new.id, new.academia_id, (SELECT nome_completo FROM core_aluno WHERE id = new.aluno_id), new.mensagem);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_logmensagem_fts_delete AFTER DELETE ON core_logmensagem BEGIN
+        DELETE FROM core_logmensagem_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_logmensagem_fts_update AFTER UPDATE OF mensagem, aluno_id ON core_logmensagem BEGIN
+        DELETE FROM core_logmensagem_fts WHERE rowid = old.id;
+        INSERT INTO core_logmensagem_fts (rowid, academia_id, nome_aluno, mensagem)
+        VALUES (new.id, new.academia_id, (SELECT nome_completo FROM core_aluno WHERE id = new.aluno_id), new.mensagem);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_aluno_fts_nome AFTER UPDATE OF nome_completo ON core_aluno BEGIN
+        UPDATE core_logmensagem_fts SET nome_aluno = new.nome_completo
+        WHERE rowid IN (SELECT id FROM core_logmensagem WHERE aluno_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO core_logmensagem_fts (rowid, academia_id, nome_aluno, mensagem)
+    SELECT l.id, l.academia_id, a.nome_completo, l.mensagem
+    FROM core_logmensagem l LEFT JOIN core_aluno a ON a.id = l.aluno_id
+    """,
+]
+
+SQLITE_REMOVER = [
+    "DROP TRIGGER IF EXISTS core_aluno_fts_nome",
+    "DROP TRIGGER IF EXISTS core_logmensagem_fts_update",
+    "DROP TRIGGER IF EXISTS core_logmensagem_fts_delete",
+    "DROP TRIGGER IF EXISTS core_logmensagem_fts_insert",
+    "DROP TABLE IF EXISTS core_logmensagem_fts",
+]
+
+POSTGRES_CRIAR = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END
+    $$
+    """,
+    "ALTER TABLE core_logmensagem ADD COLUMN IF NOT EXISTS busca tsvector",
+    """
+    CREATE OR REPLACE FUNCTION core_logmensagem_busca() RETURNS trigger AS $$
+    BEGIN
+        NEW.busca :=
+            setweight(to_tsvector('pt_unaccent', coalesce((SELECT nome_completo FROM core_aluno WHERE id = NEW.aluno_id), '')), 'A') ||
+            setweight(to_tsvector('pt_unaccent', coalesce(NEW.mensagem, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER core_logmensagem_busca_trigger
+        BEFORE INSERT OR UPDATE OF mensagem, aluno_id ON core_logmensagem
+        FOR EACH ROW EXECUTE FUNCTION core_logmensagem_busca()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION core_aluno_busca_nome() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.nome_completo IS DISTINCT FROM OLD.nome_completo THEN
+            -- Regrava a mensagem para o trigger do log recalcular o vetor com o novo nome
+            UPDATE core_logmensagem SET mensagem = mensagem WHERE aluno_id = NEW.id;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER core_aluno_busca_nome_trigger
+        AFTER UPDATE OF nome_completo ON core_aluno
+        FOR EACH ROW EXECUTE FUNCTION core_aluno_busca_nome()
+    """,
+    """
+    UPDATE core_logmensagem l SET busca =
+        setweight(to_tsvector('pt_unaccent', coalesce((SELECT nome_completo FROM core_aluno a WHERE a.id = l.aluno_id), '')), 'A') ||
+        setweight(to_tsvector('pt_unaccent', coalesce(l.mensagem, '')), 'B')
+    """,
+    "CREATE INDEX IF NOT EXISTS logmsg_busca_gin ON core_logmensagem USING GIN (busca)",
+]
+
+POSTGRES_REMOVER = [
+    "DROP TRIGGER IF EXISTS core_aluno_busca_nome_trigger ON core_aluno",
+    "DROP FUNCTION IF EXISTS core_aluno_busca_nome()",
+    "DROP TRIGGER IF EXISTS core_logmensagem_busca_trigger ON core_logmensagem",
+    "DROP FUNCTION IF EXISTS core_logmensagem_busca()",
+    "DROP INDEX IF EXISTS logmsg_busca_gin",
+    "ALTER TABLE core_logmensagem DROP COLUMN IF EXISTS busca",
+]
+
+
+def _executar(schema_editor, comandos):
+    for sql in comandos:
+        schema_editor.execute(sql)
+
+
+def criar_indice_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _executar(schema_editor, SQLITE_CRIAR)
+    elif vendor == 'postgresql':
+        _executar(schema_editor, POSTGRES_CRIAR)
+    # Outros bancos: a busca continua com icontains (core/busca_mensagens.py)
+
+
+def remover_indice_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _executar(schema_editor, SQLITE_REMOVER)
+    elif vendor == 'postgresql':
+        _executar(schema_editor, POSTGRES_REMOVER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_arquivo_mensagens'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_busca, remover_indice_busca),
+    ]
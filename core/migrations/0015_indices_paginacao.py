@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_busca_mensagens'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aluno',
+            index=models.Index(fields=['academia', 'nome_completo', 'id'], name='aluno_pagina_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fatura',
+            index=models.Index(fields=['academia', 'data_vencimento', 'id'], name='fatura_pagina_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logmensagem',
+            index=models.Index(fields=['academia', '-data_envio', '-id'], name='logmsg_pagina_idx'),
+        ),
+    ]
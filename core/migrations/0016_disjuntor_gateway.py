@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisjuntorGateway',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(help_text='Identificação do gateway (URL base).', max_length=200, unique=True)),
+                ('estado', models.CharField(choices=[('fechado', 'Fechado'), ('aberto', 'Aberto'), ('meio_aberto', 'Meio aberto (testando)')], default='fechado', max_length=12)),
+                ('falhas_consecutivas', models.PositiveIntegerField(default=0)),
+                ('latencias_ms', models.JSONField(blank=True, default=list, help_text='Últimas latências medidas (ms), para o p95.')),
+                ('aberto_em', models.DateTimeField(blank=True, null=True)),
+                ('proxima_tentativa', models.DateTimeField(blank=True, help_text='A partir de quando uma chamada de teste é liberada.', null=True)),
+                ('sonda_ate', models.DateTimeField(blank=True, help_text='Prazo da chamada de teste em andamento.', null=True)),
+                ('motivo', models.CharField(blank=True, help_text='Por que o disjuntor abriu pela última vez.', max_length=255)),
+                ('chamadas', models.PositiveBigIntegerField(default=0)),
+                ('falhas', models.PositiveBigIntegerField(default=0)),
+                ('rejeitadas', models.PositiveBigIntegerField(default=0, help_text='Chamadas recusadas na hora com o disjuntor aberto.')),
+                ('aberturas', models.PositiveIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Disjuntor do Gateway',
+                'verbose_name_plural': 'Disjuntores do Gateway',
+            },
+        ),
+    ]
@@ -0,0 +1,154 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:44
+
+import re
+
+from django.db import migrations, models
+
+LOTE = 1000
+
+# Cópias congeladas de core/telefones.py e core/busca_mensagens.py como estavam
+# nesta migração: mudar (ou renomear) aqueles módulos não pode mudar o que ela faz.
+
+DDDS_BRASIL = {
+    11, 12, 13, 14, 15, 16, 17, 18, 19, 21, 22, 24, 27, 28,
+    31, 32, 33, 34, 35, 37, 38, 41, 42, 43, 44, 45, 46, 47, 48, 49,
+    51, 53, 54, 55, 61, 62, 63, 64, 65, 66, 67, 68, 69,
+    71, 73, 74, 75, 77, 79, 81, 82, 83, 84, 85, 86, 87, 88, 89,
+    91, 92, 93, 94, 95, 96, 97, 98, 99,
+}
+
+
+def _nacional_brasil(digitos):
+    if len(digitos) not in (10, 11) or int(digitos[:2]) not in DDDS_BRASIL:
+        return None
+    ddd, numero = digitos[:2], digitos[2:]
+    if len(numero) == 8 and numero[0] in '6789':
+        numero = '9' + numero
+    if len(numero) == 9 and numero[0] != '9':
+        return None
+    if len(numero) == 8 and numero[0] not in '2345':
+        return None
+    return ddd + numero
+
+
+def normalizar_whatsapp(contato):
+    contato = (contato or '').strip()
+    if not contato or '@' in contato or re.search(r'[a-zA-Z]', contato):
+        return None
+
+    internacional = contato.startswith('+') or contato.startswith('00')
+    digitos = re.sub(r'\D', '', contato)
+    if contato.startswith('00'):
+        digitos = digitos[2:]
+
+    if internacional and not digitos.startswith('55'):
+        return f"+{digitos}" if 8 <= len(digitos) <= 15 else None
+
+    if digitos.startswith('55') and len(digitos) in (12, 13):
+        nacional = _nacional_brasil(digitos[2:])
+    elif digitos.startswith('0') and len(digitos) in (13, 14):
+        nacional = _nacional_brasil(digitos[3:])
+    elif digitos.startswith('0') and len(digitos) in (11, 12):
+        nacional = _nacional_brasil(digitos[1:])
+    else:
+        nacional = _nacional_brasil(digitos)
+
+    return f"+55{nacional}" if nacional else None
+
+
+TABELA_FTS = 'core_logmensagem_fts'
+
+TRIGGERS_SQLITE = {
+    'core_logmensagem_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS core_logmensagem_fts_insert AFTER INSERT ON core_logmensagem BEGIN
+            INSERT INTO core_logmensagem_fts (rowid, academia_id, nome_aluno, mensagem)
+            VALUES (new.id, new.academia_id, (SELECT nome_completo FROM core_aluno WHERE id = new.aluno_id), new.mensagem);
+        END
+    """,
+    'core_logmensagem_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS core_logmensagem_fts_delete AFTER DELETE ON core_logmensagem BEGIN
+            DELETE FROM core_logmensagem_fts WHERE rowid = old.id;
+        END
+    """,
+    'core_logmensagem_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS core_logmensagem_fts_update AFTER UPDATE OF mensagem, aluno_id ON core_logmensagem BEGIN
+            DELETE FROM core_logmensagem_fts WHERE rowid = old.id;
+            INSERT INTO core_logmensagem_fts (rowid, academia_id, nome_aluno, mensagem)
+            VALUES (new.id, new.academia_id, (SELECT nome_completo FROM core_aluno WHERE id = new.aluno_id), new.mensagem);
+        END
+    """,
+    'core_aluno_fts_nome': """
+        CREATE TRIGGER IF NOT EXISTS core_aluno_fts_nome AFTER UPDATE OF nome_completo ON core_aluno BEGIN
+            UPDATE core_logmensagem_fts SET nome_aluno = new.nome_completo
+            WHERE rowid IN (SELECT id FROM core_logmensagem WHERE aluno_id = new.id);
+        END
+    """,
+}
+
+
+def remover_triggers_sqlite(apps, schema_editor):
+    """ Apaga os triggers do FTS5: o SQLite não recria a core_aluno com eles apontando para ela. """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for nome in TRIGGERS_SQLITE:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {nome}")
+
+
+def recriar_triggers_sqlite(apps, schema_editor):
+    """ Recria os triggers que faltam e, nesse caso, reconstrói o índice FTS5. """
+    conexao = schema_editor.connection
+    if conexao.vendor != 'sqlite' or TABELA_FTS not in conexao.introspection.table_names():
+        return
+    with conexao.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existentes = {linha[0] for linha in cursor.fetchall()}
+        faltando = [nome for nome in TRIGGERS_SQLITE if nome not in existentes]
+        if not faltando:
+            return
+        for nome in faltando:
+            cursor.execute(TRIGGERS_SQLITE[nome])
+        cursor.execute(f"DELETE FROM {TABELA_FTS}")
+        cursor.execute(f"""
+            INSERT INTO {TABELA_FTS} (rowid, academia_id, nome_aluno, mensagem)
+            SELECT l.id, l.academia_id, a.nome_completo, l.mensagem
+            FROM core_logmensagem l LEFT JOIN core_aluno a ON a.id = l.aluno_id
+        """)
+
+
+def preencher_whatsapp_e164(apps, schema_editor):
+    """ Normaliza o contato dos alunos já cadastrados, em lotes. """
+    Aluno = apps.get_model('core', 'Aluno')
+    lote = []
+    for aluno in Aluno.objects.only('id', 'contato').order_by('id').iterator(chunk_size=LOTE):
+        aluno.whatsapp_e164 = normalizar_whatsapp(aluno.contato) or ''
+        aluno.whatsapp_valido = bool(aluno.whatsapp_e164)
+        lote.append(aluno)
+        if len(lote) >= LOTE:
+            Aluno.objects.bulk_update(lote, ['whatsapp_e164', 'whatsapp_valido'])
+            lote = []
+    if lote:
+        Aluno.objects.bulk_update(lote, ['whatsapp_e164', 'whatsapp_valido'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_disjuntor_gateway'),
+    ]
+
+    operations = [
+        # O SQLite recria a core_aluno para adicionar as colunas
+        migrations.RunPython(remover_triggers_sqlite, recriar_triggers_sqlite),
+        migrations.AddField(
+            model_name='aluno',
+            name='whatsapp_e164',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='Contato normalizado no formato E.164 (ex: +5575999998888).', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='aluno',
+            name='whatsapp_valido',
+            field=models.BooleanField(default=False, editable=False, help_text='Se o contato é um número de WhatsApp utilizável nas notificações.'),
+        ),
+        migrations.RunPython(preencher_whatsapp_e164, migrations.RunPython.noop),
+        migrations.RunPython(recriar_triggers_sqlite, remover_triggers_sqlite),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0017_aluno_whatsapp_e164'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logmensagem',
+            name='tipo',
+            field=models.CharField(choices=[('boas_vindas', 'Boas-Vindas'), ('inadimplencia', 'Inadimplência'), ('baixa_frequencia', 'Baixa Frequência'), ('convite_exame', 'Convite para Exame'), ('aprovacao_exame', 'Aprovação em Exame'), ('reprovacao_exame', 'Reprovação em Exame'), ('transmissao', 'Transmissão'), ('outro', 'Outro')], default='outro', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Transmissao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('titulo', models.CharField(help_text='Nome interno da transmissão (ex: Aviso feriado turma terça 19h).', max_length=100)),
+                ('mensagem', models.TextField(help_text='Modelo da mensagem. Aceita {nome}, {primeiro_nome} e {academia}.')),
+                ('filtros', models.JSONField(blank=True, default=dict, help_text='Filtros do segmento usados na transmissão.')),
+                ('descricao_segmento', models.CharField(blank=True, max_length=255)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('enfileirando', 'Enfileirando'), ('enfileirada', 'Enfileirada'), ('concluida', 'Concluída')], default='enfileirando', max_length=12)),
+                ('total_destinatarios', models.PositiveIntegerField(default=0)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+                ('academia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transmissoes', to='core.academia')),
+                ('criada_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transmissão',
+                'verbose_name_plural': 'Transmissões',
+                'ordering': ['-criada_em', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='logmensagem',
+            name='transmissao',
+            field=models.ForeignKey(blank=True, help_text='Transmissão em massa que gerou a mensagem.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mensagens', to='core.transmissao'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_transmissoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoGateway',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(help_text='Identificação estável do nó (usada no hash).', max_length=50, unique=True)),
+                ('url', models.URLField(help_text='URL base do gateway (ex: http://10.0.0.5:3000).', unique=True)),
+                ('estado', models.CharField(choices=[('ativo', 'Ativo'), ('drenando', 'Drenando (não recebe novas academias)'), ('inativo', 'Inativo')], default='ativo', max_length=10)),
+                ('peso', models.PositiveIntegerField(default=1, help_text='Peso no anel de hash (2 = recebe o dobro de academias).')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Nó do Gateway',
+                'verbose_name_plural': 'Nós do Gateway',
+                'ordering': ['nome'],
+            },
+        ),
+        migrations.AddField(
+            model_name='academia',
+            name='gateway_atribuido_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='academia',
+            name='gateway_no',
+            field=models.ForeignKey(blank=True, help_text='Nó do gateway que hospeda a sessão do WhatsApp da academia.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='academias', to='core.nogateway'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:59
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_pool_gateways'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecucaoAgente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iniciada_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('executando', 'Executando'), ('concluida', 'Concluída')], default='executando', max_length=12)),
+                ('workers', models.PositiveIntegerField(default=1)),
+                ('timeout_segundos', models.PositiveIntegerField(default=0, help_text='Tempo máximo por academia.')),
+                ('total_academias', models.PositiveIntegerField(default=0)),
+                ('sucessos', models.PositiveIntegerField(default=0)),
+                ('erros', models.PositiveIntegerField(default=0)),
+                ('tempo_esgotado', models.PositiveIntegerField(default=0)),
+                ('duracao_segundos', models.FloatField(blank=True, null=True)),
+                ('resultados', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'verbose_name': 'Execução do Agente de IA',
+                'verbose_name_plural': 'Execuções do Agente de IA',
+                'ordering': ['-iniciada_em'],
+            },
+        ),
+    ]
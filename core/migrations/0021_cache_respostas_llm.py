@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:04
+
+import datetime
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_execucoes_agente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespostaLLM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=64, unique=True)),
+                ('modelo', models.CharField(max_length=100)),
+                ('temperatura', models.FloatField(default=0)),
+                ('resposta', models.TextField()),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('expira_em', models.DateTimeField(db_index=True)),
+                ('ultimo_acesso', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('acertos', models.PositiveIntegerField(default=0, help_text='Vezes que a resposta foi reaproveitada.')),
+            ],
+            options={
+                'verbose_name': 'Resposta do LLM em cache',
+                'verbose_name_plural': 'Respostas do LLM em cache',
+            },
+        ),
+        migrations.CreateModel(
+            name='MetricaCacheLLM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(default=datetime.date.today)),
+                ('modelo', models.CharField(max_length=100)),
+                ('acertos', models.PositiveIntegerField(default=0)),
+                ('falhas', models.PositiveIntegerField(default=0, help_text='Consultas que não acharam resposta no cache e chamaram o modelo.')),
+            ],
+            options={
+                'verbose_name': 'Métrica do Cache do LLM',
+                'verbose_name_plural': 'Métricas do Cache do LLM',
+                'ordering': ['-data', 'modelo'],
+                'unique_together': {('data', 'modelo')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0021_cache_respostas_llm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemoriaChat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resumo', models.TextField(blank=True, default='', help_text='Resumo das mensagens que já saíram da janela.')),
+                ('turnos', models.JSONField(blank=True, default=list, help_text='Últimas perguntas e respostas, da mais antiga para a mais recente.')),
+                ('total_turnos', models.PositiveIntegerField(default=0)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+                ('academia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memorias_chat', to='core.academia')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memorias_chat', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Memória do Chat',
+                'verbose_name_plural': 'Memórias do Chat',
+                'unique_together': {('academia', 'usuario')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_memoria_chat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoletimDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('impressao', models.CharField(help_text='Impressão digital dos KPIs usados no boletim.', max_length=64)),
+                ('texto', models.TextField()),
+                ('origem', models.CharField(choices=[('agente', 'Gerado pela rotina diária'), ('painel', 'Gerado ao abrir o painel')], default='agente', max_length=10)),
+                ('modelo', models.CharField(blank=True, default='', max_length=100)),
+                ('duracao_segundos', models.FloatField(blank=True, help_text='Tempo da chamada ao modelo.', null=True)),
+                ('gerado_em', models.DateTimeField(auto_now=True)),
+                ('academia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='boletins', to='core.academia')),
+            ],
+            options={
+                'verbose_name': 'Boletim Diário',
+                'verbose_name_plural': 'Boletins Diários',
+                'ordering': ['-data'],
+                'unique_together': {('academia', 'data')},
+            },
+        ),
+    ]
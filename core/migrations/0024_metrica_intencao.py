@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:22
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_boletim_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaIntencao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(default=datetime.date.today)),
+                ('intencao', models.CharField(max_length=50)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Métrica de Intenção do Assistente',
+                'verbose_name_plural': 'Métricas de Intenção do Assistente',
+                'ordering': ['-data', 'intencao'],
+                'unique_together': {('data', 'intencao')},
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:25
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_metrica_intencao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planosaas',
+            name='ia_geracoes_simultaneas',
+            field=models.PositiveIntegerField(default=2, help_text='Respostas do LLM sendo geradas ao mesmo tempo. 0 = sem limite'),
+        ),
+        migrations.AddField(
+            model_name='planosaas',
+            name='ia_requisicoes_por_minuto',
+            field=models.PositiveIntegerField(default=20, help_text='Perguntas ao assistente por minuto (rajada e reposição). 0 = sem limite'),
+        ),
+        migrations.AddField(
+            model_name='planosaas',
+            name='ia_tokens_por_dia',
+            field=models.PositiveIntegerField(default=200000, help_text='Tokens do LLM (prompt + resposta) por dia. 0 = sem limite'),
+        ),
+        migrations.CreateModel(
+            name='BaldeIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichas', models.FloatField()),
+                ('atualizado_em', models.DateTimeField()),
+                ('academia', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balde_ia', to='core.academia')),
+            ],
+            options={
+                'verbose_name': 'Balde de Perguntas da IA',
+                'verbose_name_plural': 'Baldes de Perguntas da IA',
+            },
+        ),
+        migrations.CreateModel(
+            name='UsoIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(default=datetime.date.today)),
+                ('requisicoes', models.PositiveIntegerField(default=0, help_text='Perguntas aceitas.')),
+                ('recusadas', models.PositiveIntegerField(default=0, help_text='Perguntas recusadas por algum limite do plano.')),
+                ('chamadas_llm', models.PositiveIntegerField(default=0, help_text='Chamadas ao modelo (respostas do cache não contam).')),
+                ('tokens_prompt', models.PositiveIntegerField(default=0)),
+                ('tokens_resposta', models.PositiveIntegerField(default=0)),
+                ('academia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uso_ia', to='core.academia')),
+            ],
+            options={
+                'verbose_name': 'Uso da IA',
+                'verbose_name_plural': 'Uso da IA',
+                'ordering': ['-data'],
+                'unique_together': {('academia', 'data')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GeracaoIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vaga', models.PositiveSmallIntegerField()),
+                ('iniciada_em', models.DateTimeField()),
+                ('academia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geracoes_ia', to='core.academia')),
+            ],
+            options={
+                'verbose_name': 'Geração da IA em Andamento',
+                'verbose_name_plural': 'Gerações da IA em Andamento',
+                'unique_together': {('academia', 'vaga')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:35
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+
+
+def corrigir_ritmo_zero(apps, schema_editor):
+    # 0 mensagens por minuto não é mais aceito: quem salvou 0 passa a enviar 1 por minuto
+    Academia = apps.get_model('core', 'Academia')
+    Academia.objects.filter(whatsapp_mensagens_por_minuto=0).update(whatsapp_mensagens_por_minuto=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_cotas_ia'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='academia',
+            name='whatsapp_horario_fim',
+            field=models.TimeField(default=datetime.time(20, 0), help_text='Fim da janela diária de envio de mensagens (igual ao início = o dia todo).'),
+        ),
+        migrations.AlterField(
+            model_name='academia',
+            name='whatsapp_mensagens_por_minuto',
+            field=models.PositiveIntegerField(default=20, help_text='Quantidade máxima de mensagens enviadas por minuto (ritmo contínuo).', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(corrigir_ritmo_zero, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_whatsapp_ritmo_minimo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usoia',
+            name='chamadas_rotina',
+            field=models.PositiveIntegerField(default=0, help_text='Chamadas ao modelo das rotinas em segundo plano.'),
+        ),
+        migrations.AddField(
+            model_name='usoia',
+            name='tokens_rotina_prompt',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='usoia',
+            name='tokens_rotina_resposta',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,11 +1,15 @@
+import datetime
 from datetime import date
 from django.utils import timezone
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from threading import local
 
+from .telefones import normalizar_whatsapp
+
 # Thread-local storage para armazenar a academia atual
 _thread_locals = local()
 
@@ -77,6 +81,17 @@ class Academia(models.Model):
     notificar_faltas = models.BooleanField(default=False, help_text="Ativar mensagens para alunos com baixa frequência.")
     notificar_graduacao = models.BooleanField(default=False, help_text="Ativar convites e parabenizações de exames de graduação.")
 
+    # --- LIMITES DE ENVIO DO WHATSAPP ---
+    whatsapp_mensagens_por_minuto = models.PositiveIntegerField(default=20, validators=[MinValueValidator(1)], help_text="Quantidade máxima de mensagens enviadas por minuto (ritmo contínuo).")
+    whatsapp_rajada = models.PositiveIntegerField(default=10, help_text="Quantidade de mensagens que podem sair de uma só vez antes de aplicar o ritmo.")
+    whatsapp_horario_inicio = models.TimeField(default=datetime.time(8, 0), help_text="Início da janela diária de envio de mensagens.")
+    whatsapp_horario_fim = models.TimeField(default=datetime.time(20, 0), help_text="Fim da janela diária de envio de mensagens (igual ao início = o dia todo).")
+    retencao_logs_meses = models.PositiveIntegerField(default=12, help_text="Meses em que o log de mensagens fica na base principal antes de ir para o arquivo compactado (0 = nunca arquivar).")
+
+    # --- NÓ DO GATEWAY (core/gateway_pool.py) ---
+    gateway_no = models.ForeignKey('NoGateway', on_delete=models.SET_NULL, null=True, blank=True, related_name='academias', help_text="Nó do gateway que hospeda a sessão do WhatsApp da academia.")
+    gateway_atribuido_em = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         return self.nome_fantasia
     
@@ -121,13 +136,27 @@ class Aluno(TenantModel):
         default=True,
         help_text="Se desmarcado, o aluno não receberá nenhuma notificação automática via WhatsApp."
     )
+    # Calculados a partir do contato no save (core/telefones.py)
+    whatsapp_e164 = models.CharField(max_length=16, blank=True, default='', db_index=True, editable=False, help_text="Contato normalizado no formato E.164 (ex: +5575999998888).")
+    whatsapp_valido = models.BooleanField(default=False, editable=False, help_text="Se o contato é um número de WhatsApp utilizável nas notificações.")
 
     class Meta:
         ordering = ['nome_completo']
+        indexes = [
+            models.Index(fields=['academia', 'nome_completo', 'id'], name='aluno_pagina_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nome_completo} ({self.academia.nome_fantasia})"
 
+    def save(self, *args, **kwargs):
+        self.whatsapp_e164 = normalizar_whatsapp(self.contato) or ''
+        self.whatsapp_valido = bool(self.whatsapp_e164)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'contato' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'whatsapp_e164', 'whatsapp_valido'}
+        super().save(*args, **kwargs)
+
     @property
     def graduacao_atual(self):
         """ Retorna a graduação mais recente do aluno com base no histórico. """
@@ -241,6 +270,9 @@ class Fatura(TenantModel):
         verbose_name = "Fatura"
         verbose_name_plural = "Faturas"
         ordering = ['-data_vencimento']
+        indexes = [
+            models.Index(fields=['academia', 'data_vencimento', 'id'], name='fatura_pagina_idx'),
+        ]
 
     def __str__(self):
         return f"Fatura de {self.assinatura.aluno.nome_completo} - Venc: {self.data_vencimento.strftime('%d/%m/%Y')}"
@@ -424,6 +456,11 @@ class PlanoSaaS(models.Model):
     backup_automatico = models.BooleanField(default=False, help_text="Backup automático dos dados")
     suporte_prioritario = models.BooleanField(default=False, help_text="Suporte técnico prioritário")
     api_acesso = models.BooleanField(default=False, help_text="Acesso à API para integrações")
+
+    # Limites do assistente de IA (core/cotas_ia.py)
+    ia_requisicoes_por_minuto = models.PositiveIntegerField(default=20, help_text="Perguntas ao assistente por minuto (rajada e reposição). 0 = sem limite")
+    ia_geracoes_simultaneas = models.PositiveIntegerField(default=2, help_text="Respostas do LLM sendo geradas ao mesmo tempo. 0 = sem limite")
+    ia_tokens_por_dia = models.PositiveIntegerField(default=200000, help_text="Tokens do LLM (prompt + resposta) por dia. 0 = sem limite")
     
     # Integração com gateway de pagamento
     stripe_price_id_mensal = models.CharField(max_length=100, blank=True, null=True, help_text="ID do preço mensal no Stripe")
@@ -585,6 +622,113 @@ class HistoricoAssinaturaSaaS(models.Model):
     def __str__(self):
         return f"{self.assinatura.academia.nome_fantasia} - {self.get_tipo_evento_display()} ({self.data_evento.strftime('%d/%m/%Y %H:%M')})"
 
+class BaldeTokens(models.Model):
+    """
+    Estado de um token bucket (balde de fichas) por academia e recurso.
+    Fica no banco para que todos os processos/workers compartilhem o mesmo limite.
+    """
+    academia = models.ForeignKey(Academia, on_delete=models.CASCADE, related_name='baldes_tokens')
+    recurso = models.CharField(max_length=30, help_text="Recurso limitado (ex: whatsapp).")
+    tokens = models.FloatField(help_text="Fichas disponíveis no momento da última atualização.")
+    atualizado_em = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('academia', 'recurso')
+        verbose_name = "Balde de Tokens"
+        verbose_name_plural = "Baldes de Tokens"
+
+    def __str__(self):
+        return f"{self.academia.nome_fantasia} - {self.recurso}: {self.tokens:.1f}"
+
+class NoGateway(models.Model):
+    """
+    Um nó (processo Node.js) do pool de gateways do WhatsApp. Cada academia é
+    atribuída a um nó por hash consistente e a atribuição fica em Academia.gateway_no.
+    """
+    ESTADO_CHOICES = [
+        ('ativo', 'Ativo'),
+        ('drenando', 'Drenando (não recebe novas academias)'),
+        ('inativo', 'Inativo'),
+    ]
+    nome = models.CharField(max_length=50, unique=True, help_text="Identificação estável do nó (usada no hash).")
+    url = models.URLField(max_length=200, unique=True, help_text="URL base do gateway (ex: http://10.0.0.5:3000).")
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='ativo')
+    peso = models.PositiveIntegerField(default=1, help_text="Peso no anel de hash (2 = recebe o dobro de academias).")
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Nó do Gateway"
+        verbose_name_plural = "Nós do Gateway"
+        ordering = ['nome']
+
+    def __str__(self):
+        return f"{self.nome} ({self.url})"
+
+class DisjuntorGateway(models.Model):
+    """
+    Estado do circuit breaker (disjuntor) de um gateway do WhatsApp, no banco
+    para que web, agendador e workers enxerguem o mesmo estado (core/disjuntor.py).
+    """
+    ESTADO_CHOICES = [
+        ('fechado', 'Fechado'),
+        ('aberto', 'Aberto'),
+        ('meio_aberto', 'Meio aberto (testando)'),
+    ]
+    nome = models.CharField(max_length=200, unique=True, help_text="Identificação do gateway (URL base).")
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='fechado')
+    falhas_consecutivas = models.PositiveIntegerField(default=0)
+    latencias_ms = models.JSONField(default=list, blank=True, help_text="Últimas latências medidas (ms), para o p95.")
+    aberto_em = models.DateTimeField(null=True, blank=True)
+    proxima_tentativa = models.DateTimeField(null=True, blank=True, help_text="A partir de quando uma chamada de teste é liberada.")
+    sonda_ate = models.DateTimeField(null=True, blank=True, help_text="Prazo da chamada de teste em andamento.")
+    motivo = models.CharField(max_length=255, blank=True, help_text="Por que o disjuntor abriu pela última vez.")
+
+    # --- Contadores (desde a criação) ---
+    chamadas = models.PositiveBigIntegerField(default=0)
+    falhas = models.PositiveBigIntegerField(default=0)
+    rejeitadas = models.PositiveBigIntegerField(default=0, help_text="Chamadas recusadas na hora com o disjuntor aberto.")
+    aberturas = models.PositiveIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Disjuntor do Gateway"
+        verbose_name_plural = "Disjuntores do Gateway"
+
+    def __str__(self):
+        return f"{self.nome}: {self.get_estado_display()}"
+
+class Transmissao(TenantModel):
+    """
+    Mensagem em massa para um segmento de alunos (turma, modalidade, situação,
+    financeiro, graduação). Cada destinatário vira um LogMensagem na fila de
+    envio, ligado a esta transmissão (core/segmentos.py).
+    """
+    STATUS_CHOICES = [
+        ('enfileirando', 'Enfileirando'),
+        ('enfileirada', 'Enfileirada'),
+        ('concluida', 'Concluída'),
+    ]
+
+    academia = models.ForeignKey(Academia, on_delete=models.CASCADE, related_name='transmissoes')
+    titulo = models.CharField(max_length=100, help_text="Nome interno da transmissão (ex: Aviso feriado turma terça 19h).")
+    mensagem = models.TextField(help_text="Modelo da mensagem. Aceita {nome}, {primeiro_nome} e {academia}.")
+    filtros = models.JSONField(default=dict, blank=True, help_text="Filtros do segmento usados na transmissão.")
+    descricao_segmento = models.CharField(max_length=255, blank=True)
+    criada_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    criada_em = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='enfileirando')
+    total_destinatarios = models.PositiveIntegerField(default=0)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Transmissão"
+        verbose_name_plural = "Transmissões"
+        ordering = ['-criada_em', '-id']
+
+    def __str__(self):
+        return f"{self.titulo} ({self.academia.nome_fantasia})"
+
 class LogMensagem(TenantModel):
     """
     Registra cada mensagem enviada pelo sistema via WhatsApp.
@@ -597,24 +741,273 @@ class LogMensagem(TenantModel):
         ('convite_exame', 'Convite para Exame'),
         ('aprovacao_exame', 'Aprovação em Exame'),
         ('reprovacao_exame', 'Reprovação em Exame'),
+        ('transmissao', 'Transmissão'),
         ('outro', 'Outro'),
     ]
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('falhou', 'Falhou'),
+        ('agrupado', 'Agrupado em outra mensagem'),
+    ]
+    STATUS_ENTREGA_CHOICES = [
+        ('', 'Sem confirmação'),
+        ('falhou', 'Falha na entrega'),
+        ('entregue', 'Entregue'),
+        ('lida', 'Lida'),
+    ]
     
     academia = models.ForeignKey(Academia, on_delete=models.CASCADE, related_name='logs_mensagens')
     aluno = models.ForeignKey(Aluno, on_delete=models.SET_NULL, null=True, related_name='logs_mensagens')
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='outro')
     mensagem = models.TextField()
     data_envio = models.DateTimeField(auto_now_add=True)
-    sucesso = models.BooleanField(default=True) # Para registrar se o gateway confirmou o envio
+    sucesso = models.BooleanField(default=False) # Para registrar se o gateway confirmou o envio
     resposta_gateway = models.TextField(blank=True, null=True) # Para guardar a resposta do serviço Node.js
 
+    # --- CAMPOS DA FILA DE ENVIO (OUTBOX) ---
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pendente', help_text="Situação da mensagem na fila de envio.")
+    tentativas = models.PositiveIntegerField(default=0, help_text="Quantas vezes o worker tentou entregar a mensagem.")
+    proxima_tentativa = models.DateTimeField(default=timezone.now, help_text="A mensagem só é reivindicada pelo worker a partir deste momento.")
+    data_processamento = models.DateTimeField(null=True, blank=True, help_text="Momento da última tentativa de entrega.")
+    agendada = models.BooleanField(default=False, help_text="Se a mensagem já foi distribuída na janela de envio da academia.")
+
+    # --- DEDUPLICAÇÃO E RESUMO POR ALUNO ---
+    data_referencia = models.DateField(default=timezone.localdate, help_text="Dia a que a notificação se refere (usado para evitar repetições).")
+    agrupada_em = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='notificacoes_agrupadas', help_text="Mensagem-resumo que incluiu esta notificação.")
+    transmissao = models.ForeignKey(Transmissao, on_delete=models.SET_NULL, null=True, blank=True, related_name='mensagens', help_text="Transmissão em massa que gerou a mensagem.")
+
+    # --- CONFIRMAÇÕES DE ENTREGA (WEBHOOK DO GATEWAY) ---
+    gateway_message_id = models.CharField(max_length=128, blank=True, null=True, db_index=True, help_text="ID da mensagem no WhatsApp, devolvido pelo gateway no envio.")
+    status_entrega = models.CharField(max_length=10, choices=STATUS_ENTREGA_CHOICES, default='', blank=True, help_text="Última confirmação recebida do WhatsApp.")
+    data_entrega = models.DateTimeField(null=True, blank=True)
+    data_leitura = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         verbose_name = "Log de Mensagem"
         verbose_name_plural = "Logs de Mensagens"
         ordering = ['-data_envio']
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa'], name='logmsg_fila_idx'),
+            models.Index(fields=['aluno', 'tipo', 'data_referencia'], name='logmsg_dedup_idx'),
+            # Paginação por cursor do relatório de mensagens (core/paginacao.py)
+            models.Index(fields=['academia', '-data_envio', '-id'], name='logmsg_pagina_idx'),
+        ]
 
     def __str__(self):
         return f"Mensagem para {self.aluno.nome_completo} em {self.data_envio.strftime('%d/%m/%Y %H:%M')}"
 
 
+class ArquivoLogMensagem(TenantModel):
+    """
+    Índice dos arquivos compactados (JSONL + zstandard) com os logs de mensagens
+    antigos de uma academia, um arquivo por mês de envio.
+    """
+    academia = models.ForeignKey(Academia, on_delete=models.CASCADE, related_name='arquivos_mensagens')
+    mes = models.DateField(help_text="Primeiro dia do mês das mensagens arquivadas.")
+    caminho = models.CharField(max_length=255, help_text="Caminho do arquivo, relativo a ARQUIVO_MENSAGENS_DIR.")
+    quantidade = models.PositiveIntegerField(default=0)
+    # Totais de entrega das mensagens arquivadas, para o relatório não precisar abrir o arquivo
+    enviadas = models.PositiveIntegerField(default=0)
+    entregues = models.PositiveIntegerField(default=0)
+    lidas = models.PositiveIntegerField(default=0)
+    falhas_entrega = models.PositiveIntegerField(default=0)
+    tamanho_bytes = models.PositiveBigIntegerField(default=0)
+    primeira_data = models.DateTimeField(null=True, blank=True)
+    ultima_data = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Arquivo de Mensagens"
+        verbose_name_plural = "Arquivos de Mensagens"
+        unique_together = ('academia', 'mes')
+        ordering = ['-mes']
+
+    def __str__(self):
+        return f"{self.academia} - {self.mes:%m/%Y} ({self.quantidade} mensagens)"
+
+# -----------------------------------------------------------------------------
+# MODELOS DO AGENTE DE IA
+# -----------------------------------------------------------------------------
+
+class ExecucaoAgente(models.Model):
+    """
+    Resumo de uma rodada do agente de IA em todas as academias ativas
+    (core/execucao_agente.py): quanto tempo levou e como terminou cada academia.
+    """
+    STATUS_CHOICES = [
+        ('executando', 'Executando'),
+        ('concluida', 'Concluída'),
+    ]
+    iniciada_em = models.DateTimeField(default=timezone.now)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='executando')
+    workers = models.PositiveIntegerField(default=1)
+    timeout_segundos = models.PositiveIntegerField(default=0, help_text="Tempo máximo por academia.")
+    total_academias = models.PositiveIntegerField(default=0)
+    sucessos = models.PositiveIntegerField(default=0)
+    erros = models.PositiveIntegerField(default=0)
+    tempo_esgotado = models.PositiveIntegerField(default=0)
+    duracao_segundos = models.FloatField(null=True, blank=True)
+    # [{"academia_id", "academia", "status", "duracao_segundos", "erro"}], em ordem de término
+    resultados = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        verbose_name = "Execução do Agente de IA"
+        verbose_name_plural = "Execuções do Agente de IA"
+        ordering = ['-iniciada_em']
+
+    def __str__(self):
+        return f"Agente de IA em {self.iniciada_em:%d/%m/%Y %H:%M}: {self.sucessos}/{self.total_academias} ok"
+
+class RespostaLLM(models.Model):
+    """
+    Cache das respostas do Gemini (core/cache_llm.py), chaveado por modelo,
+    temperatura e hash do prompt normalizado. Só guarda a resposta: o prompt
+    (com nomes de alunos) não fica no banco.
+    """
+    chave = models.CharField(max_length=64, unique=True)
+    modelo = models.CharField(max_length=100)
+    temperatura = models.FloatField(default=0)
+    resposta = models.TextField()
+    criada_em = models.DateTimeField(auto_now_add=True)
+    expira_em = models.DateTimeField(db_index=True)
+    ultimo_acesso = models.DateTimeField(default=timezone.now, db_index=True)
+    acertos = models.PositiveIntegerField(default=0, help_text="Vezes que a resposta foi reaproveitada.")
+
+    class Meta:
+        verbose_name = "Resposta do LLM em cache"
+        verbose_name_plural = "Respostas do LLM em cache"
+
+    def __str__(self):
+        return f"{self.modelo} ({self.temperatura}) - {self.chave[:12]}"
+
+class MetricaCacheLLM(models.Model):
+    """ Acertos e falhas do cache de respostas do LLM, por dia e modelo. """
+    data = models.DateField(default=datetime.date.today)
+    modelo = models.CharField(max_length=100)
+    acertos = models.PositiveIntegerField(default=0)
+    falhas = models.PositiveIntegerField(default=0, help_text="Consultas que não acharam resposta no cache e chamaram o modelo.")
+
+    class Meta:
+        verbose_name = "Métrica do Cache do LLM"
+        verbose_name_plural = "Métricas do Cache do LLM"
+        unique_together = ('data', 'modelo')
+        ordering = ['-data', 'modelo']
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} {self.modelo}: {self.acertos} acerto(s), {self.falhas} falha(s)"
+
+class MetricaIntencao(models.Model):
+    """ Perguntas do assistente por intenção e dia (core/intencoes.py); 'llm' são as que foram para o modelo. """
+    data = models.DateField(default=datetime.date.today)
+    intencao = models.CharField(max_length=50)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Métrica de Intenção do Assistente"
+        verbose_name_plural = "Métricas de Intenção do Assistente"
+        unique_together = ('data', 'intencao')
+        ordering = ['-data', 'intencao']
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} {self.intencao}: {self.total}"
+
+class MemoriaChat(TenantModel):
+    """
+    Memória da conversa do assistente de um usuário em uma academia
+    (core/memoria_chat.py): as últimas mensagens na íntegra e um resumo das
+    mais antigas. Só essa janela vai para o modelo.
+    """
+    academia = models.ForeignKey(Academia, on_delete=models.CASCADE, related_name='memorias_chat')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='memorias_chat')
+    resumo = models.TextField(blank=True, default='', help_text="Resumo das mensagens que já saíram da janela.")
+    turnos = models.JSONField(default=list, blank=True, help_text="Últimas perguntas e respostas, da mais antiga para a mais recente.")
+    total_turnos = models.PositiveIntegerField(default=0)
+    atualizada_em = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        verbose_name = "Memória do Chat"
+        verbose_name_plural = "Memórias do Chat"
+        unique_together = ('academia', 'usuario')
+
+    def __str__(self):
+        return f"Chat de {self.usuario} em {self.academia.nome_fantasia} ({self.total_turnos} mensagem(ns))"
+
+class BoletimDiario(TenantModel):
+    """
+    Boletim diário do assistente já gerado (core/boletim.py), servido ao
+    abrir o painel enquanto a impressão digital dos KPIs não mudar.
+    """
+    ORIGEM_CHOICES = [
+        ('agente', 'Gerado pela rotina diária'),
+        ('painel', 'Gerado ao abrir o painel'),
+    ]
+    academia = models.ForeignKey(Academia, on_delete=models.CASCADE, related_name='boletins')
+    data = models.DateField()
+    impressao = models.CharField(max_length=64, help_text="Impressão digital dos KPIs usados no boletim.")
+    texto = models.TextField()
+    origem = models.CharField(max_length=10, choices=ORIGEM_CHOICES, default='agente')
+    modelo = models.CharField(max_length=100, blank=True, default='')
+    duracao_segundos = models.FloatField(null=True, blank=True, help_text="Tempo da chamada ao modelo.")
+    gerado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Boletim Diário"
+        verbose_name_plural = "Boletins Diários"
+        unique_together = ('academia', 'data')
+        ordering = ['-data']
+
+    def __str__(self):
+        return f"Boletim de {self.academia.nome_fantasia} - {self.data:%d/%m/%Y}"
+
+
+class UsoIA(TenantModel):
+    """ Uso do assistente de IA por academia e dia (core/cotas_ia.py). """
+    academia = models.ForeignKey(Academia, on_delete=models.CASCADE, related_name='uso_ia')
+    data = models.DateField(default=datetime.date.today)
+    requisicoes = models.PositiveIntegerField(default=0, help_text="Perguntas aceitas.")
+    recusadas = models.PositiveIntegerField(default=0, help_text="Perguntas recusadas por algum limite do plano.")
+    chamadas_llm = models.PositiveIntegerField(default=0, help_text="Chamadas ao modelo (respostas do cache não contam).")
+    tokens_prompt = models.PositiveIntegerField(default=0)
+    tokens_resposta = models.PositiveIntegerField(default=0)
+    # Rotinas em segundo plano (agente_ia, gerar_boletins): somadas à parte, fora da cota diária
+    chamadas_rotina = models.PositiveIntegerField(default=0, help_text="Chamadas ao modelo das rotinas em segundo plano.")
+    tokens_rotina_prompt = models.PositiveIntegerField(default=0)
+    tokens_rotina_resposta = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Uso da IA"
+        verbose_name_plural = "Uso da IA"
+        unique_together = ('academia', 'data')
+        ordering = ['-data']
+
+    def __str__(self):
+        return f"{self.academia.nome_fantasia} - {self.data:%d/%m/%Y}: {self.tokens_prompt + self.tokens_resposta} tokens"
+
+
+class BaldeIA(TenantModel):
+    """ Balde de fichas (token bucket) das perguntas ao assistente de uma academia. """
+    academia = models.OneToOneField(Academia, on_delete=models.CASCADE, related_name='balde_ia')
+    fichas = models.FloatField()
+    atualizado_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Balde de Perguntas da IA"
+        verbose_name_plural = "Baldes de Perguntas da IA"
+
+
+class GeracaoIA(TenantModel):
+    """
+    Resposta do LLM em andamento: ocupa uma das vagas simultâneas da academia
+    até terminar (ou até IA_GERACAO_TEMPO_MAXIMO, se o processo morrer no meio).
+    """
+    academia = models.ForeignKey(Academia, on_delete=models.CASCADE, related_name='geracoes_ia')
+    vaga = models.PositiveSmallIntegerField()
+    iniciada_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Geração da IA em Andamento"
+        verbose_name_plural = "Gerações da IA em Andamento"
+        unique_together = ('academia', 'vaga')
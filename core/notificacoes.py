@@ -0,0 +1,561 @@
+# core/notificacoes.py
+
+"""
+Fila de envio (outbox) das mensagens de WhatsApp.
+
+As views e o agente de IA apenas gravam um LogMensagem com status 'pendente'.
+O worker (comando `processar_mensagens` e o job do agendador) reivindica as
+mensagens pendentes em lotes, entrega em paralelo com um pool de threads
+limitado (uma chamada /send-batch por academia) e registra o resultado,
+reagendando as falhas com backoff exponencial.
+
+Antes da entrega, as mensagens novas são distribuídas dentro da janela de envio
+de cada academia (horário permitido + ritmo de mensagens por minuto), e no
+momento da entrega o token bucket da academia é consultado, para que nenhum
+número dispare rajadas maiores do que o configurado.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Max, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .gateway_pool import gateway_da_academia, gateways_em_uso
+from .limites import consumir_tokens
+from .models import LogMensagem
+
+logger = logging.getLogger(__name__)
+
+SEM_WHATSAPP = "Aluno sem número de WhatsApp válido."
+
+
+def _config(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def enfileirar_mensagem(academia, aluno, mensagem, tipo='outro'):
+    """
+    Cria a mensagem na fila de envio com uma única escrita no banco.
+    Não faz nenhuma chamada ao gateway.
+    """
+    return LogMensagem.all_objects.create(
+        academia=academia,
+        aluno=aluno,
+        tipo=tipo,
+        mensagem=mensagem,
+        status='pendente',
+        sucesso=False,
+    )
+
+
+def _cooldown_dias(tipo):
+    """ Dias em que uma notificação do mesmo tipo não é repetida para o mesmo aluno. """
+    cooldowns = _config('WHATSAPP_COOLDOWN_DIAS', {})
+    return cooldowns.get(tipo, cooldowns.get('padrao', 1))
+
+
+class ColetorNotificacoes:
+    """
+    Junta as notificações de uma execução (ex: o agente de IA) antes de
+    enfileirá-las. Ao despachar:
+
+    - descarta as notificações que o aluno já recebeu dentro do período de
+      cool-down do tipo (uma única consulta no índice aluno/tipo/dia);
+    - junta todas as notificações restantes do mesmo aluno em UMA mensagem.
+      A mensagem-resumo leva o tipo da primeira notificação e as demais são
+      registradas como 'agrupado', apontando para ela, para que a
+      deduplicação dos próximos dias continue funcionando por tipo.
+    """
+
+    def __init__(self, academia):
+        self.academia = academia
+        self._itens = {}
+
+    def adicionar(self, aluno, tipo, mensagem):
+        self._itens.setdefault(aluno.id, (aluno, []))[1].append((tipo, mensagem))
+
+    def _ja_notificados(self):
+        """ Retorna o conjunto de (aluno_id, tipo) ainda dentro do cool-down. """
+        tipos = {tipo for _, itens in self._itens.values() for tipo, _ in itens}
+        maior_cooldown = max((_cooldown_dias(tipo) for tipo in tipos), default=0)
+        if maior_cooldown <= 0:
+            return set()
+
+        hoje = timezone.localdate()
+        registros = (
+            LogMensagem.all_objects
+            .filter(
+                aluno_id__in=self._itens.keys(),
+                tipo__in=tipos,
+                data_referencia__gt=hoje - timedelta(days=maior_cooldown),
+            )
+            # Falhas não contam, nem as notificações agrupadas numa mensagem que falhou
+            .exclude(Q(status='falhou') | Q(status='agrupado', agrupada_em__status='falhou'))
+            .values_list('aluno_id', 'tipo', 'data_referencia')
+        )
+        return {
+            (aluno_id, tipo) for aluno_id, tipo, dia in registros
+            if (hoje - dia).days < _cooldown_dias(tipo)
+        }
+
+    def despachar(self):
+        """
+        Enfileira as notificações coletadas. Retorna um resumo com o número de
+        mensagens enfileiradas, notificações agrupadas e repetições evitadas.
+        """
+        resumo = {'mensagens': 0, 'agrupadas': 0, 'repetidas': 0}
+        if not self._itens:
+            return resumo
+
+        ja_notificados = self._ja_notificados()
+        principais, extras = [], []
+        for aluno, itens in self._itens.values():
+            novos = [(tipo, texto) for tipo, texto in itens if (aluno.id, tipo) not in ja_notificados]
+            resumo['repetidas'] += len(itens) - len(novos)
+            if not novos:
+                continue
+
+            tipo_principal = novos[0][0]
+            principais.append(LogMensagem(
+                academia=self.academia, aluno=aluno, tipo=tipo_principal,
+                mensagem="\n\n".join(texto for _, texto in novos),
+                status='pendente', sucesso=False,
+            ))
+            extras.append([
+                LogMensagem(
+                    academia=self.academia, aluno=aluno, tipo=tipo, mensagem=texto,
+                    status='agrupado', sucesso=False,
+                )
+                for tipo, texto in novos[1:]
+            ])
+
+        with transaction.atomic():
+            LogMensagem.all_objects.bulk_create(principais)
+            agrupadas = []
+            for principal, grupo in zip(principais, extras):
+                for log in grupo:
+                    log.agrupada_em = principal
+                    agrupadas.append(log)
+            LogMensagem.all_objects.bulk_create(agrupadas)
+
+        resumo['mensagens'] = len(principais)
+        resumo['agrupadas'] = len(agrupadas)
+        self._itens = {}
+        return resumo
+
+
+def _liberar_mensagens_presas():
+    """
+    Devolve para a fila as mensagens que ficaram em 'enviando' por tempo demais
+    (ex: o processo do worker morreu no meio da entrega).
+    """
+    limite = timezone.now() - timedelta(seconds=_config('WHATSAPP_OUTBOX_TIMEOUT_ENVIANDO', 600))
+    return LogMensagem.all_objects.filter(
+        status='enviando', data_processamento__lt=limite
+    ).update(status='pendente', proxima_tentativa=timezone.now())
+
+
+def proximo_horario_permitido(academia, momento):
+    """
+    Retorna `momento` se ele estiver dentro da janela de envio da academia, ou o
+    início da próxima janela. Janelas que cruzam a meia-noite (ex: 22h às 6h)
+    também são aceitas, e início igual ao fim quer dizer o dia todo.
+    """
+    local = timezone.localtime(momento)
+    inicio, fim = academia.whatsapp_horario_inicio, academia.whatsapp_horario_fim
+    hora = local.time()
+
+    if inicio == fim:
+        return momento
+    if inicio < fim:
+        dentro = inicio <= hora < fim
+    else:
+        dentro = hora >= inicio or hora < fim
+    if dentro:
+        return momento
+
+    abertura = timezone.make_aware(datetime.combine(local.date(), inicio), local.tzinfo)
+    if abertura <= local:
+        abertura = timezone.make_aware(datetime.combine(local.date() + timedelta(days=1), inicio), local.tzinfo)
+    return abertura
+
+
+def _intervalo_envio(academia):
+    return timedelta(seconds=60 / max(academia.whatsapp_mensagens_por_minuto, 1))
+
+
+def distribuir_fila():
+    """
+    Distribui as mensagens novas de cada academia ao longo da sua janela de
+    envio: a primeira rajada sai de imediato e as demais seguem o ritmo de
+    mensagens por minuto, continuando no dia seguinte se a janela fechar.
+    """
+    novas = list(
+        LogMensagem.all_objects
+        .filter(status='pendente', agendada=False)
+        .select_related('academia')
+        .order_by('academia_id', 'id')
+    )
+    if not novas:
+        return 0
+
+    grupos = {}
+    for log in novas:
+        grupos.setdefault(log.academia_id, []).append(log)
+
+    # Última mensagem já agendada de cada academia, para continuar a fila depois dela
+    ultimos = dict(
+        LogMensagem.all_objects
+        .filter(status='pendente', agendada=True, academia_id__in=grupos.keys())
+        .values('academia_id')
+        .annotate(ultimo=Max('proxima_tentativa'))
+        .values_list('academia_id', 'ultimo')
+    )
+
+    agora = timezone.now()
+    for academia_id, logs in grupos.items():
+        academia = logs[0].academia
+        intervalo = _intervalo_envio(academia)
+        ultimo = ultimos.get(academia_id)
+        if ultimo and ultimo >= agora:
+            momento, rajada = ultimo + intervalo, 0
+        else:
+            momento, rajada = agora, academia.whatsapp_rajada
+
+        for i, log in enumerate(logs):
+            if i >= rajada:
+                momento += intervalo
+            momento = proximo_horario_permitido(academia, momento)
+            log.proxima_tentativa = momento
+            log.agendada = True
+
+    LogMensagem.all_objects.bulk_update(novas, ['proxima_tentativa', 'agendada'])
+    return len(novas)
+
+
+def _aplicar_limites(logs):
+    """
+    Aplica a janela de envio e o token bucket de cada academia ao lote
+    reivindicado. As mensagens que excedem o limite voltam para a fila (sem
+    contar como tentativa) e só as liberadas seguem para o gateway.
+    """
+    agora = timezone.now()
+    grupos = {}
+    for log in logs:
+        grupos.setdefault(log.academia_id, []).append(log)
+
+    liberadas, adiadas = [], []
+    for grupo in grupos.values():
+        academia = grupo[0].academia
+        abertura = proximo_horario_permitido(academia, agora)
+        if abertura > agora:
+            concedidas, espera = 0, (abertura - agora).total_seconds()
+        else:
+            concedidas, espera = consumir_tokens(
+                academia, 'whatsapp', len(grupo),
+                taxa_por_segundo=academia.whatsapp_mensagens_por_minuto / 60,
+                capacidade=max(academia.whatsapp_rajada, 1),
+            )
+        liberadas.extend(grupo[:concedidas])
+
+        intervalo = _intervalo_envio(academia)
+        momento = agora + timedelta(seconds=espera or 60)
+        for log in grupo[concedidas:]:
+            log.status = 'pendente'
+            log.tentativas -= 1
+            log.proxima_tentativa = momento
+            momento += intervalo
+            adiadas.append(log)
+
+    if adiadas:
+        LogMensagem.all_objects.bulk_update(adiadas, ['status', 'tentativas', 'proxima_tentativa'])
+    return liberadas
+
+
+def reivindicar_lote(tamanho):
+    """
+    Reivindica até `tamanho` mensagens pendentes, marcando-as como 'enviando'.
+    Usa SELECT ... FOR UPDATE SKIP LOCKED para que vários workers possam rodar
+    ao mesmo tempo sem pegar a mesma mensagem (no SQLite o lock é ignorado e a
+    própria transação serializa as escritas).
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            LogMensagem.all_objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pendente', proxima_tentativa__lte=agora)
+            .order_by('proxima_tentativa', 'id')
+            .values_list('id', flat=True)[:tamanho]
+        )
+        if not ids:
+            return []
+        LogMensagem.all_objects.filter(id__in=ids, status='pendente').update(
+            status='enviando',
+            tentativas=F('tentativas') + 1,
+            data_processamento=agora,
+        )
+
+    return list(
+        LogMensagem.all_objects
+        .filter(id__in=ids, status='enviando', data_processamento=agora)
+        .select_related('academia', 'aluno')
+    )
+
+
+def _entregar(gateway, log):
+    """
+    Entrega uma mensagem ao gateway Node.js. Roda dentro do pool de threads,
+    por isso não acessa o banco: apenas devolve (sucesso, resposta, id_no_whatsapp).
+    `sucesso` é None quando o disjuntor recusou a chamada sem tentar o gateway.
+    """
+    if log.aluno is None or not log.aluno.whatsapp_valido:
+        return False, SEM_WHATSAPP, None
+
+    resposta_json = gateway.send_message(log.academia_id, log.aluno.whatsapp_e164, log.mensagem)
+    return _sucesso(resposta_json), str(resposta_json), resposta_json.get('id')
+
+
+def _sucesso(resposta):
+    return None if resposta.get('circuitoAberto') else resposta.get('success', False)
+
+
+def _entregar_lote(gateway, logs):
+    """
+    Entrega todas as mensagens de UMA academia com uma única chamada ao
+    endpoint /send-batch. Devolve uma lista de (sucesso, resposta, id_no_whatsapp)
+    na mesma ordem.
+    """
+    resultados = {}
+    mensagens = []
+    for log in logs:
+        if log.aluno is None or not log.aluno.whatsapp_valido:
+            resultados[log.id] = (False, SEM_WHATSAPP, None)
+        else:
+            mensagens.append({"id": log.id, "number": log.aluno.whatsapp_e164, "message": log.mensagem})
+
+    for resposta in gateway.send_batch(logs[0].academia_id, mensagens):
+        resultados[int(resposta["id"])] = (_sucesso(resposta), str(resposta), resposta.get('messageId'))
+    return [resultados[log.id] for log in logs]
+
+
+def _entregar_logs(executor, logs):
+    """
+    Agrupa o lote por academia e entrega cada grupo no nó do gateway que
+    hospeda a sessão da academia (core/gateway_pool.py), com send_batch em
+    paralelo. Se o nó não suporta lotes, entrega mensagem a mensagem no pool.
+
+    O disjuntor é de cada nó: as mensagens de um nó com o disjuntor aberto
+    voltam para a fila sem chamada nenhuma, e um nó em chamada de teste
+    (meio aberto) recebe uma única mensagem.
+    """
+    grupos = {}
+    for log in logs:
+        grupos.setdefault(log.academia_id, []).append(log)
+
+    resultados, individuais, lotes = {}, [], []
+    usados = {}  # base_url -> (gateway, mensagens que o nó ainda pode receber; None = sem limite)
+    for grupo in grupos.values():
+        gateway = gateway_da_academia(grupo[0].academia)
+        if gateway is None:
+            for log in grupo:
+                resultados[log.id] = (False, "URL do Gateway não configurada.", None)
+            continue
+
+        if gateway.base_url not in usados:
+            if not gateway.disjuntor.permitir():
+                usados[gateway.base_url] = (gateway, 0)
+            else:
+                usados[gateway.base_url] = (gateway, 1 if gateway.disjuntor.sondando else None)
+        _, restantes = usados[gateway.base_url]
+        if restantes is not None:
+            grupo, recusadas = grupo[:restantes], grupo[restantes:]
+            usados[gateway.base_url] = (gateway, restantes - len(grupo))
+            for log in recusadas:
+                resultados[log.id] = (None, f"Gateway {gateway.base_url} indisponível no momento (disjuntor aberto).", None)
+        if not grupo:
+            continue
+
+        if gateway.suporta_lote is False:
+            individuais.extend((log, executor.submit(_entregar, gateway, log)) for log in grupo)
+        else:
+            lotes.append((grupo, executor.submit(_entregar_lote, gateway, grupo)))
+
+    for log, futuro in individuais:
+        resultados[log.id] = futuro.result()
+    for grupo, futuro in lotes:
+        for log, resultado in zip(grupo, futuro.result()):
+            resultados[log.id] = resultado
+    for gateway, _ in usados.values():
+        gateway.disjuntor.sincronizar(forcar=True)
+    return [resultados[log.id] for log in logs]
+
+
+def _calcular_backoff(tentativas):
+    base = _config('WHATSAPP_OUTBOX_BACKOFF_SEGUNDOS', 30)
+    maximo = _config('WHATSAPP_OUTBOX_BACKOFF_MAXIMO', 3600)
+    return timedelta(seconds=min(base * (2 ** max(tentativas - 1, 0)), maximo))
+
+
+def _registrar_resultados(logs, resultados):
+    """ Grava o resultado de todo o lote com um único bulk_update. """
+    agora = timezone.now()
+    max_tentativas = _config('WHATSAPP_OUTBOX_MAX_TENTATIVAS', 5)
+    resumo = {'enviadas': 0, 'reagendadas': 0, 'falhas': 0, 'adiadas': 0}
+
+    for log, (sucesso, resposta, id_whatsapp) in zip(logs, resultados):
+        if sucesso is None:
+            # Recusada pelo disjuntor do gateway: volta para a fila sem contar como tentativa
+            log.status = 'pendente'
+            log.tentativas -= 1
+            log.resposta_gateway = resposta
+            log.proxima_tentativa = agora + timedelta(seconds=_config('WHATSAPP_DISJUNTOR_TEMPO_ABERTO', 30))
+            resumo['adiadas'] += 1
+            continue
+        log.sucesso = sucesso
+        log.resposta_gateway = resposta
+        log.gateway_message_id = id_whatsapp
+        log.data_processamento = agora
+        if sucesso:
+            log.status = 'enviado'
+            resumo['enviadas'] += 1
+        elif log.tentativas >= max_tentativas or log.aluno is None or not log.aluno.whatsapp_valido:
+            # Sem número válido não adianta tentar de novo
+            log.status = 'falhou'
+            resumo['falhas'] += 1
+        else:
+            log.status = 'pendente'
+            log.proxima_tentativa = agora + _calcular_backoff(log.tentativas)
+            resumo['reagendadas'] += 1
+
+    LogMensagem.all_objects.bulk_update(
+        logs, ['sucesso', 'resposta_gateway', 'gateway_message_id', 'status', 'tentativas',
+               'proxima_tentativa', 'data_processamento']
+    )
+    return resumo
+
+
+def processar_fila(tamanho_lote=None, max_workers=None, max_lotes=None):
+    """
+    Esvazia a fila de mensagens pendentes, lote a lote.
+    Retorna um resumo com o total de mensagens enviadas, reagendadas, com falha
+    e adiadas (recusadas pelo disjuntor do gateway).
+
+    Com o disjuntor aberto em todos os nós nada é reivindicado: as mensagens
+    continuam pendentes até o gateway voltar. Com um único nó em chamada de
+    teste (meio aberto) o lote tem uma única mensagem; com vários nós, o
+    limite de uma mensagem vale só para o nó em teste (ver `_entregar_logs`).
+    """
+    tamanho_lote = tamanho_lote or _config('WHATSAPP_OUTBOX_LOTE', 50)
+    max_workers = max_workers or _config('WHATSAPP_OUTBOX_WORKERS', 8)
+    total = {'enviadas': 0, 'reagendadas': 0, 'falhas': 0, 'adiadas': 0, 'lotes': 0}
+
+    _liberar_mensagens_presas()
+    distribuir_fila()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while max_lotes is None or total['lotes'] < max_lotes:
+            gateways = gateways_em_uso()
+            if gateways and not any(gateway.disjuntor.permitir() for gateway in gateways):
+                logger.warning("Disjuntor aberto em todos os nós do gateway; as mensagens aguardam na fila.")
+                break
+            sondando = len(gateways) == 1 and gateways[0].disjuntor.sondando
+            logs = reivindicar_lote(1 if sondando else tamanho_lote)
+            if not logs:
+                break
+            logs = _aplicar_limites(logs)
+            if not logs:
+                continue
+            resultados = _entregar_logs(executor, logs)
+            resumo = _registrar_resultados(logs, resultados)
+            total['lotes'] += 1
+            for chave, valor in resumo.items():
+                total[chave] += valor
+            logger.info("Lote de mensagens processado: %s", resumo)
+
+    return total
+
+
+# -----------------------------------------------------------------------------
+# CONFIRMAÇÕES DE ENTREGA (WEBHOOK DO GATEWAY)
+# -----------------------------------------------------------------------------
+
+# Uma confirmação nunca rebaixa a situação da mensagem (ex: um 'entregue'
+# atrasado que chega depois do 'lida' é ignorado).
+ORDEM_ENTREGA = ['', 'falhou', 'entregue', 'lida']
+
+# Códigos de ACK do whatsapp-web.js (1 = apenas aceita pelo servidor, não muda nada)
+ACK_WHATSAPP = {-1: 'falhou', 2: 'entregue', 3: 'lida', 4: 'lida'}
+
+
+def _normalizar_recibo(recibo):
+    """ Retorna (id_no_whatsapp, status_entrega, momento) ou None se o recibo for inválido. """
+    if not isinstance(recibo, dict):
+        return None
+    id_whatsapp = str(recibo.get('id') or '').strip()
+    status = recibo.get('status', recibo.get('ack'))
+    if isinstance(status, int):
+        status = ACK_WHATSAPP.get(status)
+    if not id_whatsapp or status not in ORDEM_ENTREGA[1:]:
+        return None
+    try:
+        momento = datetime.fromtimestamp(float(recibo['timestamp']), tz=dt_timezone.utc)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        momento = timezone.now()
+    return id_whatsapp, status, momento
+
+
+def registrar_recibos(recibos, academia_id=None):
+    """
+    Aplica um lote de confirmações de entrega/leitura/falha aos LogMensagem,
+    localizados pelo gateway_message_id gravado no envio.
+
+    Em vez de um UPDATE por recibo, faz um UPDATE por situação (e por bloco de
+    ids), com CASE/WHEN para gravar o horário de cada mensagem. As situações são
+    aplicadas em ordem crescente, então 'entregue' e 'lida' da mesma mensagem
+    no mesmo lote terminam como 'lida'.
+    """
+    por_status = {}
+    for recibo in recibos:
+        normalizado = _normalizar_recibo(recibo)
+        if normalizado is None:
+            continue
+        id_whatsapp, status, momento = normalizado
+        momentos = por_status.setdefault(status, {})
+        # Recibo repetido: fica o horário mais antigo
+        if id_whatsapp not in momentos or momento < momentos[id_whatsapp]:
+            momentos[id_whatsapp] = momento
+
+    tamanho_bloco = _config('WHATSAPP_RECIBOS_BLOCO', 500)
+    aplicados = 0
+    for posicao, status in enumerate(ORDEM_ENTREGA):
+        momentos = por_status.get(status)
+        if not momentos:
+            continue
+        ids = list(momentos)
+        for i in range(0, len(ids), tamanho_bloco):
+            bloco = ids[i:i + tamanho_bloco]
+            quando = Case(
+                *[When(gateway_message_id=id_whatsapp, then=Value(momentos[id_whatsapp])) for id_whatsapp in bloco],
+                output_field=DateTimeField(),
+            )
+            campos = {'status_entrega': status}
+            if status in ('entregue', 'lida'):
+                campos['data_entrega'] = Coalesce('data_entrega', quando)
+            if status == 'lida':
+                campos['data_leitura'] = quando
+
+            logs = LogMensagem.all_objects.filter(
+                gateway_message_id__in=bloco,
+                status_entrega__in=ORDEM_ENTREGA[:posicao],
+            )
+            if academia_id is not None:
+                logs = logs.filter(academia_id=academia_id)
+            aplicados += logs.update(**campos)
+
+    return {'recebidos': len(recibos), 'aplicados': aplicados, 'ignorados': len(recibos) - aplicados}
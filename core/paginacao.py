@@ -0,0 +1,274 @@
+# core/paginacao.py
+
+"""
+Paginação por cursor (keyset) para as listas grandes do sistema.
+
+O Paginator do Django faz um COUNT(*) exato a cada página e busca a página N
+com OFFSET, então as páginas do fim ficam cada vez mais lentas (o banco lê e
+descarta todas as linhas anteriores). Aqui a página guarda os valores das
+colunas de ordenação do primeiro e do último item, e a próxima começa direto
+a partir deles:
+
+    WHERE data_envio < :ultima_data OR (data_envio = :ultima_data AND id < :ultimo_id)
+
+Com um índice nessas colunas, qualquer página custa o mesmo que a primeira. O
+total mostrado é uma estimativa barata (`estimar_total`), não um COUNT(*).
+
+Uso na view:
+
+    paginador = PaginadorCursor(queryset, ('-data_envio', '-id'), por_pagina=20)
+    page_obj = paginador.pagina_da_requisicao(request)
+
+e no template: `{% load paginacao %}` ... `{% paginacao page_obj %}`.
+
+A ordenação precisa terminar em um campo único (normalmente o id), e os campos
+precisam ser atributos do próprio objeto (campos do model ou anotações).
+"""
+
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+# Parâmetros de URL usados pelos links de navegação
+PARAMETRO_DEPOIS = 'depois'
+PARAMETRO_ANTES = 'antes'
+
+
+def codificar_cursor(dados):
+    texto = json.dumps(dados, default=lambda valor: valor.isoformat() if hasattr(valor, 'isoformat') else str(valor))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """ Dados do cursor, ou None se ele estiver vazio ou inválido (volta para a primeira página). """
+    if not cursor:
+        return None
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        dados = json.loads(texto)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return dados if isinstance(dados, dict) else None
+
+
+def estimar_total(queryset, limite=None):
+    """
+    Total aproximado de um queryset, sem percorrer a tabela inteira.
+    Retorna (total, tipo), com tipo 'exato', 'estimado' ou 'minimo'.
+
+    - PostgreSQL: usa a estimativa de linhas do planejador (EXPLAIN). Se ela
+      passar do limite, é o que vale ('estimado'); abaixo disso a contagem
+      exata é barata.
+    - Demais bancos: conta no máximo `limite` + 1 linhas; passando disso o
+      total é só "mais de `limite`" ('minimo').
+    """
+    limite = limite or getattr(settings, 'PAGINACAO_LIMITE_CONTAGEM', 10000)
+    queryset = queryset.order_by()
+
+    if connections[queryset.db].vendor == 'postgresql':
+        estimativa = _estimativa_postgres(queryset)
+        if estimativa is not None and estimativa > limite:
+            return estimativa, 'estimado'
+
+    contados = queryset[:limite + 1].count()
+    if contados > limite:
+        return limite, 'minimo'
+    return contados, 'exato'
+
+
+def _estimativa_postgres(queryset):
+    sql, parametros = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, parametros)
+        plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    try:
+        return int(plano[0]['Plan']['Plan Rows'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class Pagina:
+    """ Página de resultados, com a mesma cara do Page do Django para os templates. """
+
+    def __init__(self, itens, paginador, tem_anterior, tem_proxima, cursor_anterior=None, cursor_proxima=None):
+        self.object_list = itens
+        self.paginador = paginador
+        self.has_previous = tem_anterior
+        self.has_next = tem_proxima
+        self.cursor_anterior = cursor_anterior
+        self.cursor_proxima = cursor_proxima
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+    @property
+    def total(self):
+        return self.paginador.total[0]
+
+    @property
+    def tipo_total(self):
+        return self.paginador.total[1]
+
+
+class PaginadorCursor:
+    """
+    Paginador por cursor de um queryset.
+
+    `ordenacao` segue a sintaxe do order_by ('-data_envio', '-id'); sem ela vale
+    a ordenação do queryset (ou do Meta do model), com o id como desempate. Subclasses
+    podem emendar itens depois do fim do queryset (ver `continuacao`), como o
+    histórico de mensagens faz com as mensagens arquivadas.
+    """
+
+    def __init__(self, queryset, ordenacao=None, por_pagina=20):
+        self.queryset = queryset
+        ordenacao = list(ordenacao or queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(campo.lstrip('-') in ('id', 'pk') for campo in ordenacao):
+            # Desempate pelo id, na mesma direção do último campo
+            ordenacao.append('-id' if ordenacao and ordenacao[-1].startswith('-') else 'id')
+        self.campos = [(campo.lstrip('-'), campo.startswith('-')) for campo in ordenacao]
+        self.por_pagina = por_pagina
+        self._total = None
+
+    # -- Total -----------------------------------------------------------------
+
+    @property
+    def total(self):
+        """ (total, tipo), calculado uma vez e só se o template pedir. """
+        if self._total is None:
+            self._total = self.estimar_total()
+        return self._total
+
+    def estimar_total(self):
+        return estimar_total(self.queryset)
+
+    # -- Continuação (itens que vêm depois do queryset) --------------------------
+
+    def continuacao(self, depois=None, antes=None, quantidade=None):
+        """
+        Até `quantidade` dicionários (com 'id'), na ordem de exibição, mostrados
+        depois do fim do queryset: os seguintes ao item de chave `depois`, os
+        imediatamente anteriores ao de chave `antes` ou, sem nenhuma das duas,
+        os primeiros. As chaves são as de `chave_continuacao`.
+        """
+        return []
+
+    def chave_continuacao(self, item):
+        """ Valor guardado no cursor para continuar a partir de um item da continuação. """
+        return item['id']
+
+    def preparar(self, item):
+        """ Converte um dicionário da continuação no objeto exibido no template. """
+        return item
+
+    # -- Consulta ----------------------------------------------------------------
+
+    def _valores(self, objeto):
+        return [getattr(objeto, campo) for campo, _ in self.campos]
+
+    def _filtro(self, valores, para_tras=False):
+        """ Itens depois (ou antes, `para_tras`) da chave `valores` na ordenação. """
+        filtro = Q()
+        for posicao, (campo, decrescente) in enumerate(self.campos):
+            menor = decrescente != para_tras
+            condicao = Q(**{f"{campo}__{'lt' if menor else 'gt'}": valores[posicao]})
+            for anterior in range(posicao):
+                condicao &= Q(**{self.campos[anterior][0]: valores[anterior]})
+            filtro |= condicao
+        return filtro
+
+    def _ordenacao(self, para_tras=False):
+        return [('-' if decrescente != para_tras else '') + campo for campo, decrescente in self.campos]
+
+    def _buscar(self, valores=None, para_tras=False, quantidade=None):
+        queryset = self.queryset.order_by(*self._ordenacao(para_tras))
+        if valores is not None:
+            queryset = queryset.filter(self._filtro(valores, para_tras))
+        return list(queryset[:quantidade])
+
+    def _validar(self, cursor):
+        dados = decodificar_cursor(cursor)
+        if dados is None:
+            return None
+        if 'c' in dados or (isinstance(dados.get('v'), list) and len(dados['v']) == len(self.campos)):
+            return dados
+        return None
+
+    def _cursor(self, item):
+        if isinstance(item, dict):
+            return codificar_cursor({'c': self.chave_continuacao(item)})
+        return codificar_cursor({'v': self._valores(item)})
+
+    def pagina(self, depois=None, antes=None):
+        """ Página depois do cursor `depois`, antes do cursor `antes`, ou a primeira. """
+        n = self.por_pagina
+        cursor_antes, cursor_depois = self._validar(antes), self._validar(depois)
+
+        try:
+            if cursor_antes:
+                itens = self._anteriores(cursor_antes, n + 1)
+                tem_anterior = len(itens) > n
+                itens = list(reversed(itens[:n]))
+                tem_proxima = True
+            else:
+                itens = self._seguintes(cursor_depois, n + 1)
+                tem_proxima = len(itens) > n
+                itens = itens[:n]
+                tem_anterior = bool(cursor_depois)
+        except ValidationError:
+            # Valor do cursor que não serve para o campo (URL editada à mão)
+            return self.pagina()
+
+        if not itens:
+            # Cursor de uma página que não existe mais: recomeça do início
+            if cursor_antes or cursor_depois:
+                return self.pagina()
+            return Pagina([], self, False, False)
+
+        return Pagina(
+            [self._exibir(item) for item in itens], self, tem_anterior, tem_proxima,
+            cursor_anterior=self._cursor(itens[0]) if tem_anterior else None,
+            cursor_proxima=self._cursor(itens[-1]) if tem_proxima else None,
+        )
+
+    def _exibir(self, item):
+        return self.preparar(item) if isinstance(item, dict) else item
+
+    def _seguintes(self, cursor, quantidade):
+        if cursor and 'c' in cursor:
+            return self.continuacao(depois=cursor['c'], quantidade=quantidade)
+
+        itens = self._buscar(cursor['v'] if cursor and 'v' in cursor else None, quantidade=quantidade)
+        if len(itens) < quantidade:
+            # Acabou o queryset: emenda o começo da continuação
+            itens += self.continuacao(quantidade=quantidade - len(itens))
+        return itens
+
+    def _anteriores(self, cursor, quantidade):
+        """ Itens antes do cursor, do mais próximo para o mais distante. """
+        if 'c' in cursor:
+            itens = list(reversed(self.continuacao(antes=cursor['c'], quantidade=quantidade)))
+            if len(itens) < quantidade:
+                itens += self._buscar(para_tras=True, quantidade=quantidade - len(itens))
+            return itens
+        return self._buscar(cursor['v'], para_tras=True, quantidade=quantidade)
+
+    def pagina_da_requisicao(self, request):
+        return self.pagina(depois=request.GET.get(PARAMETRO_DEPOIS), antes=request.GET.get(PARAMETRO_ANTES))
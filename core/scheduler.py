@@ -4,7 +4,6 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from django.core.management import call_command
 from django_apscheduler.jobstores import DjangoJobStore
 import sys
-from core.models import Academia
 
 def job_gerar_faturas():
     """
@@ -18,19 +17,41 @@ def job_gerar_faturas():
 
 def job_agente_ia():
     """
-    Função que executa o nosso agente de IA para TODAS as academias cadastradas.
+    Função que executa o nosso agente de IA para todas as academias ativas,
+    várias ao mesmo tempo e com tempo máximo por academia (core/execucao_agente.py).
     """
-    academias = Academia.objects.all()
-    if not academias:
-        print("Nenhuma academia encontrada para executar o agente de IA.")
-        return
-    
-    for academia in academias:
-        try:
-            print(f"Executando agente de IA para a academia ID: {academia.id} ({academia.nome_fantasia})")
-            call_command('agente_ia', academia.id)
-        except Exception as e:
-            print(f"Erro ao executar o job 'agente_ia' para a academia ID {academia.id}: {e}")
+    try:
+        call_command('executar_agente_ia')
+    except Exception as e:
+        print(f"Erro ao executar o job 'agente_ia': {e}")
+
+def job_gerar_boletins():
+    """
+    Função que deixa pronto o boletim diário do assistente de cada academia,
+    antes de os donos abrirem o painel (core/boletim.py).
+    """
+    try:
+        call_command('gerar_boletins')
+    except Exception as e:
+        print(f"Erro ao executar o job 'gerar_boletins': {e}")
+
+def job_processar_mensagens():
+    """
+    Função que entrega as mensagens de WhatsApp pendentes na fila de envio.
+    """
+    try:
+        call_command('processar_mensagens')
+    except Exception as e:
+        print(f"Erro ao executar o job 'processar_mensagens': {e}")
+
+def job_arquivar_mensagens():
+    """
+    Função que move os logs de mensagens antigos para o arquivo compactado.
+    """
+    try:
+        call_command('arquivar_mensagens')
+    except Exception as e:
+        print(f"Erro ao executar o job 'arquivar_mensagens': {e}")
 
 def start():
     """
@@ -58,9 +79,46 @@ def start():
         hour='10', # Podemos escolher um horário diferente, como 8 da manhã
         minute='00',
         id='job_agente_ia_diario', # ID único para o novo job
+        max_instances=1,
         replace_existing=True,
     )
     print("-> Tarefa 'agente_ia' agendada para 10:00.")
+
+    # Tarefa 3: Entregar as mensagens da fila de WhatsApp (a cada minuto)
+    scheduler.add_job(
+        job_processar_mensagens,
+        trigger='interval',
+        minutes=1,
+        id='job_processar_mensagens',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    print("-> Tarefa 'processar_mensagens' agendada a cada 1 minuto.")
+
+    # Tarefa 4: Arquivar os logs de mensagens antigos (todos os dias às 04:00)
+    scheduler.add_job(
+        job_arquivar_mensagens,
+        trigger='cron',
+        hour='4',
+        minute='00',
+        id='job_arquivar_mensagens_diario',
+        max_instances=1,
+        replace_existing=True,
+    )
+    print("-> Tarefa 'arquivar_mensagens' agendada para 04:00.")
+
+    # Tarefa 5: Gerar os boletins diários do assistente (todos os dias às 05:00, depois das faturas)
+    scheduler.add_job(
+        job_gerar_boletins,
+        trigger='cron',
+        hour='5',
+        minute='00',
+        id='job_gerar_boletins_diario',
+        max_instances=1,
+        replace_existing=True,
+    )
+    print("-> Tarefa 'gerar_boletins' agendada para 05:00.")
     
     print("\nAgendador de tarefas iniciado...")
     scheduler.start()
\ No newline at end of file
@@ -0,0 +1,212 @@
+# core/segmentos.py
+
+"""
+Transmissões: uma mesma mensagem para um segmento de alunos.
+
+Os filtros do segmento (turmas, modalidades, situação da matrícula, situação
+financeira e graduação atual) viram UMA consulta de alunos, com subconsultas
+EXISTS no lugar de joins (sem duplicar alunos que estão em várias turmas).
+A mensagem é renderizada para cada destinatário em memória e todo o lote é
+gravado na fila com bulk_create; a entrega segue pelo worker da fila, com a
+janela de envio e o limite por minuto da academia (core/notificacoes.py).
+
+Formato dos filtros (guardado em Transmissao.filtros):
+    {"turmas": [ids], "modalidades": [ids], "graduacoes": [ids],
+     "situacao": "ativos" | "inativos" | "todos",
+     "financeiro": "todos" | "inadimplentes" | "em_dia"}
+"""
+
+import re
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import (
+    Aluno, Fatura, Graduacao, HistoricoGraduacao, LogMensagem, Modalidade, Transmissao, Turma,
+)
+
+LOTE = 1000
+
+SITUACOES = [('ativos', 'Alunos ativos'), ('inativos', 'Alunos inativos'), ('todos', 'Ativos e inativos')]
+FINANCEIRO = [('todos', 'Qualquer situação'), ('inadimplentes', 'Com fatura vencida'), ('em_dia', 'Sem fatura vencida')]
+
+# Só recebem os alunos que aceitam notificações e têm WhatsApp válido
+NOTIFICAVEIS = Q(receber_notificacoes=True, whatsapp_valido=True)
+
+_CAMPO_MODELO = re.compile(r'\{(nome|primeiro_nome|academia)\}')
+
+
+def _ids(valores):
+    return [int(v) for v in valores or [] if str(v).isdigit()]
+
+
+def compilar_segmento(academia, filtros):
+    """ Queryset com todos os alunos da academia que se encaixam nos filtros. """
+    alunos = Aluno.all_objects.filter(academia=academia)
+
+    situacao = filtros.get('situacao', 'ativos')
+    if situacao == 'ativos':
+        alunos = alunos.filter(ativo=True)
+    elif situacao == 'inativos':
+        alunos = alunos.filter(ativo=False)
+
+    matriculas = Turma.alunos.through.objects.filter(aluno_id=OuterRef('pk'))
+    turmas = _ids(filtros.get('turmas'))
+    if turmas:
+        alunos = alunos.filter(Exists(matriculas.filter(turma_id__in=turmas)))
+    modalidades = _ids(filtros.get('modalidades'))
+    if modalidades:
+        alunos = alunos.filter(Exists(matriculas.filter(turma__modalidade_id__in=modalidades, turma__ativa=True)))
+
+    financeiro = filtros.get('financeiro', 'todos')
+    if financeiro in ('inadimplentes', 'em_dia'):
+        # Mesmo critério de inadimplência do agente (core/snapshot.py)
+        vencidas = Exists(Fatura.all_objects.filter(
+            assinatura__aluno_id=OuterRef('pk'), data_pagamento__isnull=True, data_vencimento__lt=date.today(),
+        ))
+        alunos = alunos.filter(vencidas if financeiro == 'inadimplentes' else ~vencidas)
+
+    graduacoes = _ids(filtros.get('graduacoes'))
+    if graduacoes:
+        # Graduação atual = a promoção mais recente do aluno naquela modalidade
+        posterior = HistoricoGraduacao.all_objects.filter(
+            aluno_id=OuterRef('aluno_id'),
+            graduacao__modalidade_id=OuterRef('graduacao__modalidade_id'),
+            data_promocao__gt=OuterRef('data_promocao'),
+        )
+        alunos = alunos.filter(Exists(
+            HistoricoGraduacao.all_objects
+            .filter(aluno_id=OuterRef('pk'), graduacao_id__in=graduacoes)
+            .filter(~Exists(posterior))
+        ))
+
+    return alunos
+
+
+def contar_segmento(academia, filtros):
+    """ Total de alunos do segmento e quantos deles podem receber a mensagem. """
+    return compilar_segmento(academia, filtros).aggregate(
+        total=Count('id'),
+        destinatarios=Count('id', filter=NOTIFICAVEIS),
+    )
+
+
+def rotulo_turma(turma):
+    """ "Muay Thai · Ter, Qui (19:00 - 20:00) · Prof. João" (horários via prefetch). """
+    partes = [turma.modalidade.nome]
+    partes.extend(str(horario) for horario in turma.horarios.all())
+    if turma.professor_id:
+        partes.append(f"Prof. {turma.professor.nome_completo}")
+    return ' · '.join(partes)
+
+
+def turmas_da_academia(academia):
+    return (
+        Turma.all_objects.filter(academia=academia, ativa=True)
+        .select_related('modalidade', 'professor')
+        .prefetch_related('horarios')
+        .order_by('modalidade__nome', 'id')
+    )
+
+
+def descrever_segmento(academia, filtros):
+    """ Resumo legível dos filtros (ex: "Turmas: Muay Thai · Ter (19:00 - 20:00) · Com fatura vencida"). """
+    partes = []
+    turmas = _ids(filtros.get('turmas'))
+    if turmas:
+        nomes = [rotulo_turma(t) for t in turmas_da_academia(academia).filter(id__in=turmas)]
+        partes.append(f"Turmas: {'; '.join(nomes)}")
+    for chave, modelo, rotulo in (('modalidades', Modalidade, 'Modalidades'), ('graduacoes', Graduacao, 'Graduações')):
+        ids = _ids(filtros.get(chave))
+        if ids:
+            nomes = [str(obj) for obj in modelo.all_objects.filter(academia=academia, id__in=ids).select_related()]
+            partes.append(f"{rotulo}: {', '.join(nomes)}")
+    partes.append(dict(SITUACOES).get(filtros.get('situacao', 'ativos'), ''))
+    if filtros.get('financeiro', 'todos') != 'todos':
+        partes.append(dict(FINANCEIRO)[filtros['financeiro']])
+    return ' · '.join(p for p in partes if p)[:255]
+
+
+def renderizar_mensagem(modelo, aluno, academia):
+    """ Troca {nome}, {primeiro_nome} e {academia}; o resto do texto fica como está. """
+    valores = {
+        'nome': aluno.nome_completo,
+        'primeiro_nome': aluno.nome_completo.split()[0] if aluno.nome_completo.split() else '',
+        'academia': academia.nome_fantasia,
+    }
+    return _CAMPO_MODELO.sub(lambda m: valores[m.group(1)], modelo)
+
+
+def criar_transmissao(academia, titulo, mensagem, filtros, usuario=None):
+    """
+    Cria a transmissão e enfileira uma mensagem por destinatário, em lotes de
+    LOTE com bulk_create. Nada é enviado aqui: o worker da fila distribui as
+    mensagens na janela de envio da academia.
+    """
+    transmissao = Transmissao.all_objects.create(
+        academia=academia,
+        titulo=titulo,
+        mensagem=mensagem,
+        filtros=filtros,
+        descricao_segmento=descrever_segmento(academia, filtros),
+        criada_por=usuario,
+    )
+    destinatarios = (
+        compilar_segmento(academia, filtros)
+        .filter(NOTIFICAVEIS)
+        .only('id', 'nome_completo')
+        .order_by('id')
+    )
+
+    total = 0
+    with transaction.atomic():
+        lote = []
+        for aluno in destinatarios.iterator(chunk_size=LOTE):
+            lote.append(LogMensagem(
+                academia=academia, aluno=aluno, tipo='transmissao', transmissao=transmissao,
+                mensagem=renderizar_mensagem(mensagem, aluno, academia),
+                status='pendente', sucesso=False,
+            ))
+            if len(lote) >= LOTE:
+                LogMensagem.all_objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            LogMensagem.all_objects.bulk_create(lote)
+            total += len(lote)
+
+        transmissao.total_destinatarios = total
+        transmissao.status = 'enfileirada' if total else 'concluida'
+        transmissao.concluida_em = None if total else timezone.now()
+        transmissao.save(update_fields=['total_destinatarios', 'status', 'concluida_em'])
+    return transmissao
+
+
+def estatisticas_transmissao(transmissao):
+    """
+    Progresso e entrega da transmissão, com uma única consulta agregada.
+    Marca a transmissão como concluída quando não resta nada na fila.
+    """
+    estatisticas = LogMensagem.all_objects.filter(transmissao=transmissao).aggregate(
+        na_fila=Count('id', filter=Q(status__in=['pendente', 'enviando'])),
+        enviadas=Count('id', filter=Q(status='enviado')),
+        falhas=Count('id', filter=Q(status='falhou')),
+        entregues=Count('id', filter=Q(status='enviado', status_entrega__in=['entregue', 'lida'])),
+        lidas=Count('id', filter=Q(status='enviado', status_entrega='lida')),
+    )
+    total = transmissao.total_destinatarios
+    processadas = estatisticas['enviadas'] + estatisticas['falhas']
+    estatisticas['total'] = total
+    estatisticas['progresso'] = round(100 * processadas / total, 1) if total else 100
+    for chave in ('entregues', 'lidas'):
+        enviadas = estatisticas['enviadas']
+        estatisticas[f'taxa_{chave}'] = round(100 * estatisticas[chave] / enviadas, 1) if enviadas else 0
+
+    if transmissao.status == 'enfileirada' and not estatisticas['na_fila']:
+        transmissao.status = 'concluida'
+        transmissao.concluida_em = timezone.now()
+        transmissao.save(update_fields=['status', 'concluida_em'])
+    estatisticas['status'] = transmissao.status
+    return estatisticas
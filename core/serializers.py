@@ -4,4 +4,6 @@ from rest_framework import serializers
 
 class PerguntaIASerializer(serializers.Serializer):
     """ Serializer para validar a pergunta enviada pelo usuário. """
-    question = serializers.CharField(max_length=500, trim_whitespace=True)
\ No newline at end of file
+    question = serializers.CharField(max_length=500, trim_whitespace=True)
+    # Enviado pelo "Limpar chat": apaga a memória da conversa (core/memoria_chat.py)
+    nova_conversa = serializers.BooleanField(required=False, default=False)
@@ -0,0 +1,167 @@
+# core/snapshot.py
+
+"""
+Retrato do dia de uma academia: KPIs financeiros, quadro de alunos,
+inadimplentes, faltosos, ausentes e novos alunos.
+
+O dashboard, o resumo inicial do assistente (AgenteIAAPIView) e o comando
+`agente_ia` mostram os mesmos números; todos leem deste retrato em vez de
+cada um refazer as próprias consultas. São sempre 4 consultas, seja qual for o
+tamanho da academia:
+
+1. um aggregate nas faturas (faturamento do mês, do mês passado e inadimplência);
+2. a contagem de assinaturas novas do mês passado;
+3. um aggregate nos alunos (ativos, inativos e ativos sem assinatura ativa);
+4. a lista dos alunos que aparecem em alguma lista (inadimplentes, faltosos,
+   ausentes ou novos), com presenças e inadimplência em subconsultas.
+
+Dentro de uma requisição use `snapshot_da_requisicao`, que monta o retrato uma
+vez só; o comando `agente_ia` monta um por execução.
+"""
+
+import datetime
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, Exists, IntegerField, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Academia, Aluno, Assinatura, Fatura, Presenca
+
+# Critérios das listas
+DIAS_FREQUENCIA = 30  # Janela da contagem de presenças
+LIMITE_BAIXA_FREQUENCIA = 4  # Menos presenças que isso na janela = baixa frequência
+DIAS_AUSENCIA = 3  # Sem presença há mais que isso = ausente
+DIAS_NOVOS_ALUNOS = 7
+
+
+@dataclass(frozen=True)
+class KPIsFinanceiros:
+    faturamento_mes_atual: Decimal
+    faturamento_mes_passado: Decimal
+    periodo_mes_passado: str
+    inadimplencia: Decimal
+    novas_assinaturas: int
+
+
+@dataclass(frozen=True)
+class TenantSnapshot:
+    academia: Academia
+    data: datetime.date
+    financeiro: KPIsFinanceiros
+    alunos_ativos: int
+    alunos_inativos: int
+    sem_assinatura: int
+    # Alunos (instâncias completas, prontas para as notificações), em ordem alfabética;
+    # os faltosos vêm com `num_presencas` e ordenados do que menos veio para o que mais veio.
+    # Todos vêm com `ultima_presenca`, `valor_vencido` e `vencida_desde` (None se não deve)
+    inadimplentes: tuple
+    faltosos: tuple
+    ausentes: tuple
+    novos_alunos: tuple
+
+    @staticmethod
+    def nomes(alunos):
+        return [aluno.nome_completo for aluno in alunos]
+
+
+def construir_snapshot(academia, hoje=None):
+    hoje = hoje or datetime.date.today()
+    ultimo_dia_mes_passado = hoje.replace(day=1) - datetime.timedelta(days=1)
+    primeiro_dia_mes_passado = ultimo_dia_mes_passado.replace(day=1)
+    zero = Value(Decimal('0'))
+
+    # 1. Faturas
+    vencidas = Q(data_pagamento__isnull=True, data_vencimento__lt=hoje)
+    faturas = Fatura.all_objects.filter(academia=academia).aggregate(
+        mes_atual=Coalesce(Sum('valor', filter=Q(data_pagamento__year=hoje.year, data_pagamento__month=hoje.month)), zero),
+        mes_passado=Coalesce(Sum('valor', filter=Q(data_pagamento__range=(primeiro_dia_mes_passado, ultimo_dia_mes_passado))), zero),
+        inadimplencia=Coalesce(Sum('valor', filter=vencidas), zero),
+    )
+    # 2. Assinaturas novas
+    novas_assinaturas = Assinatura.all_objects.filter(
+        academia=academia, data_inicio__range=(primeiro_dia_mes_passado, ultimo_dia_mes_passado),
+    ).count()
+
+    # 3. Quadro de alunos
+    assinatura_ativa = Exists(Assinatura.all_objects.filter(aluno_id=OuterRef('pk'), status='ativa'))
+    alunos = Aluno.all_objects.filter(academia=academia)
+    quadro = alunos.annotate(assinatura_ativa=assinatura_ativa).aggregate(
+        ativos=Count('id', filter=Q(ativo=True)),
+        inativos=Count('id', filter=Q(ativo=False)),
+        sem_assinatura=Count('id', filter=Q(ativo=True, assinatura_ativa=False)),
+    )
+
+    # 4. Alunos das listas
+    inicio_frequencia = hoje - datetime.timedelta(days=DIAS_FREQUENCIA)
+    limite_ausencia = hoje - datetime.timedelta(days=DIAS_AUSENCIA)
+    limite_novos = hoje - datetime.timedelta(days=DIAS_NOVOS_ALUNOS)
+    presencas_recentes = (
+        Presenca.all_objects.filter(aluno_id=OuterRef('pk'), data__gte=inicio_frequencia)
+        .order_by().values('aluno_id').annotate(total=Count('id')).values('total')
+    )
+    ultima_presenca = Presenca.all_objects.filter(aluno_id=OuterRef('pk')).order_by('-data').values('data')[:1]
+    vencidas_do_aluno = (
+        Fatura.all_objects.filter(vencidas, assinatura__aluno_id=OuterRef('pk'))
+        .order_by().values('assinatura__aluno_id')
+    )
+    listados = (
+        alunos.annotate(
+            num_presencas=Coalesce(Subquery(presencas_recentes, output_field=IntegerField()), 0),
+            ultima_presenca=Subquery(ultima_presenca),
+            inadimplente=Exists(Fatura.all_objects.filter(vencidas, assinatura__aluno_id=OuterRef('pk'))),
+            # Gravidade da inadimplência (relatórios compactados, core/compactador.py)
+            valor_vencido=Subquery(vencidas_do_aluno.annotate(total=Sum('valor')).values('total'), output_field=DecimalField()),
+            vencida_desde=Subquery(vencidas_do_aluno.annotate(desde=Min('data_vencimento')).values('desde')),
+        )
+        .filter(
+            Q(ativo=True) & (
+                Q(inadimplente=True)
+                | Q(num_presencas__gt=0, num_presencas__lt=LIMITE_BAIXA_FREQUENCIA)
+                | Q(ultima_presenca__lt=limite_ausencia) | Q(ultima_presenca__isnull=True)
+            )
+            | Q(data_matricula__gte=limite_novos)
+        )
+        .order_by('nome_completo', 'id')
+    )
+
+    inadimplentes, faltosos, ausentes, novos = [], [], [], []
+    for aluno in listados:
+        if aluno.ativo:
+            if aluno.inadimplente:
+                inadimplentes.append(aluno)
+            if 0 < aluno.num_presencas < LIMITE_BAIXA_FREQUENCIA:
+                faltosos.append(aluno)
+            if aluno.ultima_presenca is None or aluno.ultima_presenca < limite_ausencia:
+                ausentes.append(aluno)
+        if aluno.data_matricula and aluno.data_matricula >= limite_novos:
+            novos.append(aluno)
+    faltosos.sort(key=lambda aluno: aluno.num_presencas)
+
+    return TenantSnapshot(
+        academia=academia,
+        data=hoje,
+        financeiro=KPIsFinanceiros(
+            faturamento_mes_atual=faturas['mes_atual'],
+            faturamento_mes_passado=faturas['mes_passado'],
+            periodo_mes_passado=f"{primeiro_dia_mes_passado:%d/%m} a {ultimo_dia_mes_passado:%d/%m}",
+            inadimplencia=faturas['inadimplencia'],
+            novas_assinaturas=novas_assinaturas,
+        ),
+        alunos_ativos=quadro['ativos'],
+        alunos_inativos=quadro['inativos'],
+        sem_assinatura=quadro['sem_assinatura'],
+        inadimplentes=tuple(inadimplentes),
+        faltosos=tuple(faltosos),
+        ausentes=tuple(ausentes),
+        novos_alunos=tuple(novos),
+    )
+
+
+def snapshot_da_requisicao(request):
+    """ Retrato da academia da requisição, montado uma vez por requisição. """
+    snapshot = getattr(request, '_snapshot_academia', None)
+    if snapshot is None or snapshot.academia.pk != request.academia.pk:
+        snapshot = construir_snapshot(request.academia)
+        request._snapshot_academia = snapshot
+    return snapshot
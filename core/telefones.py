@@ -0,0 +1,74 @@
+# core/telefones.py
+
+"""
+Normalização dos números de WhatsApp dos alunos para o formato E.164 (+5575999998888).
+
+O campo `Aluno.contato` é livre ("telefone ou email"). O número normalizado
+fica gravado em `Aluno.whatsapp_e164` (calculado no save), e só os alunos com
+`whatsapp_valido` entram nas notificações; assim um e-mail ou um número
+incompleto não vira uma chamada ao gateway que falha em toda execução.
+
+Sem prefixo internacional, o número é tratado como brasileiro:
+- DDD + número, com ou sem zero e código de operadora (0 XX 75 99999-8888);
+- celular antigo de 8 dígitos (sem o nono dígito) ganha o 9 na frente.
+Números com + (ou 00) de outros países são aceitos se tiverem de 8 a 15 dígitos.
+"""
+
+import re
+
+CODIGO_BRASIL = '55'
+
+# DDDs em uso no Brasil (Anatel)
+DDDS_BRASIL = {
+    11, 12, 13, 14, 15, 16, 17, 18, 19, 21, 22, 24, 27, 28,
+    31, 32, 33, 34, 35, 37, 38, 41, 42, 43, 44, 45, 46, 47, 48, 49,
+    51, 53, 54, 55, 61, 62, 63, 64, 65, 66, 67, 68, 69,
+    71, 73, 74, 75, 77, 79, 81, 82, 83, 84, 85, 86, 87, 88, 89,
+    91, 92, 93, 94, 95, 96, 97, 98, 99,
+}
+
+
+def _nacional_brasil(digitos):
+    """ DDD + número (10 ou 11 dígitos) → número nacional normalizado, ou None. """
+    if len(digitos) not in (10, 11) or int(digitos[:2]) not in DDDS_BRASIL:
+        return None
+    ddd, numero = digitos[:2], digitos[2:]
+    if len(numero) == 8 and numero[0] in '6789':
+        # Celular cadastrado antes do nono dígito
+        numero = '9' + numero
+    if len(numero) == 9 and numero[0] != '9':
+        return None
+    if len(numero) == 8 and numero[0] not in '2345':
+        return None
+    return ddd + numero
+
+
+def normalizar_whatsapp(contato):
+    """
+    Retorna o número em E.164 ('+5575999998888') ou None se o contato não for
+    um número de telefone utilizável (vazio, e-mail, incompleto, DDD inexistente).
+    """
+    contato = (contato or '').strip()
+    if not contato or '@' in contato or re.search(r'[a-zA-Z]', contato):
+        return None
+
+    internacional = contato.startswith('+') or contato.startswith('00')
+    digitos = re.sub(r'\D', '', contato)
+    if contato.startswith('00'):
+        digitos = digitos[2:]
+
+    if internacional and not digitos.startswith(CODIGO_BRASIL):
+        return f"+{digitos}" if 8 <= len(digitos) <= 15 else None
+
+    if digitos.startswith(CODIGO_BRASIL) and len(digitos) in (12, 13):
+        nacional = _nacional_brasil(digitos[2:])
+    elif digitos.startswith('0') and len(digitos) in (13, 14):
+        # 0 + código da operadora + DDD + número
+        nacional = _nacional_brasil(digitos[3:])
+    elif digitos.startswith('0') and len(digitos) in (11, 12):
+        # 0 + DDD + número
+        nacional = _nacional_brasil(digitos[1:])
+    else:
+        nacional = _nacional_brasil(digitos)
+
+    return f"+{CODIGO_BRASIL}{nacional}" if nacional else None
@@ -0,0 +1,45 @@
+# core/templatetags/paginacao.py
+
+""" Links e total das páginas do PaginadorCursor (core/paginacao.py). """
+
+from django import template
+
+from core.paginacao import PARAMETRO_ANTES, PARAMETRO_DEPOIS
+
+register = template.Library()
+
+
+def _numero(valor):
+    return f"{valor:,}".replace(',', '.')
+
+
+@register.simple_tag(takes_context=True)
+def url_pagina(context, page_obj, direcao):
+    """
+    Query string da página 'anterior', 'proxima' ou 'primeira', mantendo os
+    filtros atuais da URL (busca, datas, status...).
+    """
+    parametros = context['request'].GET.copy()
+    parametros.pop(PARAMETRO_DEPOIS, None)
+    parametros.pop(PARAMETRO_ANTES, None)
+    if direcao == 'proxima' and page_obj.cursor_proxima:
+        parametros[PARAMETRO_DEPOIS] = page_obj.cursor_proxima
+    elif direcao == 'anterior' and page_obj.cursor_anterior:
+        parametros[PARAMETRO_ANTES] = page_obj.cursor_anterior
+    return '?' + parametros.urlencode()
+
+
+@register.simple_tag
+def total_paginacao(page_obj):
+    """ Total formatado: "1.234", "cerca de 52.000" ou "mais de 10.000". """
+    total, tipo = page_obj.total, page_obj.tipo_total
+    if tipo == 'estimado':
+        return f"cerca de {_numero(total)}"
+    if tipo == 'minimo':
+        return f"mais de {_numero(total)}"
+    return _numero(total)
+
+
+@register.inclusion_tag('core/_paginacao.html', takes_context=True)
+def paginacao(context, page_obj, rotulo='Navegação das páginas'):
+    return {'request': context['request'], 'page_obj': page_obj, 'rotulo': rotulo}
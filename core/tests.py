@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+
+from core.intencoes import classificar
+
+
+class ClassificarIntencaoTests(SimpleTestCase):
+    # (pergunta, intenção esperada ou None quando a pergunta deve ir para o LLM)
+    CASOS = [
+        # Perguntas sobre os dados: caminho rápido
+        ("Quem são os alunos inadimplentes?", 'inadimplentes'),
+        ("Tem alguém devendo?", 'inadimplentes'),
+        ("Qual o nível de inadimplência?", 'nivel_inadimplencia'),
+        ("como está a inadimplência?", 'nivel_inadimplencia'),
+        ("valor total dos inadimplentes", 'nivel_inadimplencia'),
+        ("Quantos alunos ativos tenho?", 'contagem_alunos'),
+        ("Qual o aluno mais faltoso?", 'aluno_mais_faltoso'),
+        ("quem está sem registrar presença?", 'ausentes'),
+        ("Listar meus planos", 'planos'),
+        ("Quais planos estão cadastrados?", 'planos'),
+        ("Detalhes do aluno João Silva", 'detalhes_aluno'),
+        ("Histórico de pagamentos do aluno Maria Santos", 'historico_pagamentos'),
+        # Pedidos abertos: LLM, mesmo falando de inadimplência, frequência ou planos
+        ("Como posso reduzir a inadimplência?", None),
+        ("Me dê dicas para melhorar a frequência dos alunos", None),
+        ("Crie um plano de marketing", None),
+        ("Qual o melhor plano para vender mais?", None),
+        ("Escreva uma mensagem de cobrança para os inadimplentes", None),
+        ("Sugestões para diminuir as faltas", None),
+        ("Por que os alunos estão faltando?", None),
+        ("O que fazer com os alunos ausentes?", None),
+        ("Como aumentar a retenção?", None),
+    ]
+
+    def test_classificacao(self):
+        for pergunta, esperada in self.CASOS:
+            with self.subTest(pergunta=pergunta):
+                intencao, _ = classificar(pergunta)
+                self.assertEqual(intencao.nome if intencao else None, esperada)
+
+    def test_nome_do_aluno(self):
+        _, nome = classificar("Histórico de pagamentos do aluno Maria Santos")
+        self.assertEqual(nome, "Maria Santos")
@@ -52,12 +52,20 @@ urlpatterns = [
     # URLs de Configuração
     path('config/whatsapp/', views.configuracao_whatsapp, name='configuracao_whatsapp'),
     path('config/whatsapp/conexao/', views.whatsapp_conexao, name='whatsapp_conexao'),
+    path('config/whatsapp/conexao/eventos/', views.whatsapp_status_eventos, name='whatsapp_status_eventos'),
+    path('config/whatsapp/conexao/inicializar/', views.whatsapp_inicializar, name='whatsapp_inicializar'),
 
     # URLs de Relatórios
     path('relatorios/frequencia/', views.relatorio_frequencia, name='relatorio_frequencia'),
     path('relatorios/financeiro/', views.relatorio_financeiro, name='relatorio_financeiro'),
     path('relatorios/mensagens/', views.relatorio_mensagens, name='relatorio_mensagens'),
 
+    # Transmissões (mensagem para um segmento de alunos)
+    path('transmissoes/', views.lista_transmissoes, name='lista_transmissoes'),
+    path('transmissoes/nova/', views.nova_transmissao, name='nova_transmissao'),
+    path('transmissoes/<int:pk>/', views.detalhe_transmissao, name='detalhe_transmissao'),
+    path('transmissoes/<int:pk>/progresso/', views.progresso_transmissao, name='progresso_transmissao'),
+
     # URLs de Graduação
     path('graduacao/exames/', views.gerenciar_exames, name='gerenciar_exames'),
     path('graduacao/alunos-aptos/', views.relatorio_alunos_aptos, name='relatorio_alunos_aptos'),
@@ -69,6 +77,7 @@ urlpatterns = [
 
     # API do Assistente Virtual
     path('api/ia/ask/', views.AgenteIAAPIView.as_view(), name='ask_ia_agent'),
+    path('api/ia/stream/', views.agente_ia_stream, name='stream_ia_agent'),
     
 
 ]
\ No newline at end of file
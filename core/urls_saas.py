@@ -27,6 +27,9 @@ public_urlpatterns = [
     # Webhook do Stripe
     path('webhook/stripe/', views_saas.stripe_webhook, name='stripe_webhook'),
     
+    # Webhook das confirmações de entrega do WhatsApp (enviadas pelo gateway)
+    path('webhook/whatsapp/recibos/', views_saas.whatsapp_recibos_webhook, name='whatsapp_recibos_webhook'),
+    
     # Nota: URLs do superadmin foram movidas para urls_superadmin.py
 ]
 
@@ -20,6 +20,14 @@ urlpatterns = [
     
     # Relatórios
     path('relatorios/', views_saas.admin_relatorios, name='superadmin_relatorios'),
+
+    # Monitoramento do disjuntor do gateway do WhatsApp (JSON)
+    path('gateway/disjuntor/', views_saas.admin_gateway_disjuntor, name='superadmin_gateway_disjuntor'),
+
+    # Acertos e falhas do cache de respostas do LLM (JSON)
+    path('ia/cache/', views_saas.admin_cache_llm, name='superadmin_cache_llm'),
+    path('ia/intencoes/', views_saas.admin_intencoes_ia, name='superadmin_intencoes_ia'),
+    path('ia/uso/', views_saas.admin_uso_ia, name='superadmin_uso_ia'),
     
     # Outras funcionalidades serão adicionadas conforme necessário
 ]
\ No newline at end of file
@@ -4,12 +4,18 @@ from django.db import transaction, models
 from django.db.models.deletion import ProtectedError
 from django.forms import inlineformset_factory
 from datetime import date, timedelta, datetime
-import os
 from django.contrib import messages
 from django.db.models import Count, Q, Sum
 from dateutil.relativedelta import relativedelta
-from django.core.paginator import Paginator
 import calendar
+import json
+import requests
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 
 # core/views.py (no topo, com os outros imports)
 from rest_framework.views import APIView
@@ -17,22 +23,34 @@ from rest_framework.response import Response
 from rest_framework import status
 from .serializers import PerguntaIASerializer
 from core.analysis import enviar_mensagem_whatsapp
-
-#funções langchain
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, AIMessage
-
-from . import analysis
+from core.disjuntor import CircuitoAberto
+from core.gateway_pool import gateway_da_academia
+from core.whatsapp_status import eventos_status, formatar_evento
+from core.arquivamento import HistoricoMensagens
+from core.busca_mensagens import buscar_mensagens
+from core.boletim import TEMPERATURA as BOLETIM_TEMPERATURA, boletim_guardado, guardar_boletim, prompt_boletim
+from core.cache_llm import invocar_com_cache, transmitir_com_cache
+from core.cotas_ia import LimiteIA, consumir_requisicao, encerrar_geracao, geracao_ia, iniciar_geracao
+from core.intencoes import responder_localmente
+from core.llm import formatar_evento_sse, get_llm
+from core.memoria_chat import janela, limpar_memoria, obter_memoria, registrar_turno
+from core.paginacao import PaginadorCursor
+from core.snapshot import snapshot_da_requisicao
+from core.segmentos import (
+    NOTIFICAVEIS, compilar_segmento, contar_segmento, criar_transmissao, descrever_segmento,
+    estatisticas_transmissao, renderizar_mensagem,
+)
 
 from .models import (
     Academia, Aluno, Turma, Horario, Modalidade, Professor, Presenca, DiaNaoLetivo,
-    Plano, Assinatura, Fatura, Graduacao, ExameGraduacao, HistoricoGraduacao, InscricaoExame, LogMensagem
+    Plano, Assinatura, Fatura, Graduacao, ExameGraduacao, HistoricoGraduacao, InscricaoExame, LogMensagem,
+    Transmissao
 )
 from .forms import (
     CustomUserCreationForm, AcademiaForm, AlunoForm, TurmaForm, HorarioForm,
     ModalidadeForm, ProfessorForm, DiaNaoLetivoForm, PlanoForm, AssinaturaForm,
     RegistrarPagamentoForm, AlterarVencimentoForm, ConfiguracaoWhatsAppForm, GraduacaoForm, ExameGraduacaoForm, HistoricoGraduacaoForm,
-    ReprovacaoForm
+    ReprovacaoForm, TransmissaoForm
 )
 
 # -----------------------------------------------------------------------------
@@ -176,12 +194,12 @@ def pagina_presenca(request, slug=None):
     alunos_ativos = Aluno.objects.filter(academia=academia, ativo=True)
     if termo_busca:
         alunos_ativos = alunos_ativos.filter(nome_completo__icontains=termo_busca)
-    alunos_ativos = alunos_ativos.order_by('nome_completo')
+    page_obj = PaginadorCursor(alunos_ativos, ('nome_completo', 'id'), por_pagina=50).pagina_da_requisicao(request)
     presentes_hoje_ids = Presenca.objects.filter(
-        academia=academia, data=date.today(), aluno__in=alunos_ativos
+        academia=academia, data=date.today(), aluno__in=[aluno.id for aluno in page_obj]
     ).values_list('aluno_id', flat=True)
     contexto = {
-        'alunos_para_chamada': alunos_ativos,
+        'alunos_para_chamada': page_obj,
         'presentes_hoje_ids': presentes_hoje_ids,
         'data_hoje': date.today(),
         'termo_busca': termo_busca,
@@ -454,25 +472,103 @@ def dashboard(request, slug=None):
     # A academia é obtida automaticamente do middleware
     academia = request.academia
     
-    # Chama as funções de análise para obter os KPIs
-    dados_financeiros = analysis.analisar_financeiro(academia)
-    alunos_risco_evasao = analysis.analisar_frequencia(academia)
+    # KPIs e alunos em risco vêm do retrato do dia (o mesmo do assistente de IA)
+    snapshot = snapshot_da_requisicao(request)
     
     # Os dados são filtrados automaticamente pelo TenantManager
-    alunos = Aluno.objects.all()
+    alunos = PaginadorCursor(Aluno.objects.all(), ('nome_completo', 'id'), por_pagina=50).pagina_da_requisicao(request)
     turmas = Turma.objects.all()
     
     contexto = {
         'academia': academia,
         'alunos': alunos,
         'turmas': turmas,
-        'kpis_financeiros': dados_financeiros,
-        'alunos_em_risco': alunos_risco_evasao,
+        'kpis_financeiros': snapshot.financeiro,
+        'alunos_em_risco': snapshot.faltosos,
     }
     
     return render(request, 'core/dashboard.html', contexto)
 
 
+SUGESTOES_IA = [
+    "Quem são os alunos inadimplentes?",
+    "Qual o aluno mais faltoso?",
+    "Listar meus planos",
+    "Quantos alunos ativos tenho?",
+    "Qual o nível de inadimplência?",
+    "Detalhes do aluno João Silva",
+    "Histórico de pagamentos do aluno Maria Santos",
+]
+
+def _memoria_da_pergunta(request, pergunta, nova_conversa=False):
+    """
+    Memória da conversa para a pergunta (core/memoria_chat.py), ou None no
+    resumo inicial, que não entra na conversa. "Limpar chat" começa uma
+    conversa nova.
+    """
+    if pergunta == '__INITIAL_SUMMARY__':
+        if nova_conversa:
+            limpar_memoria(request.academia, request.user)
+        return None
+    return obter_memoria(request.academia, request.user)
+
+def _preparar_resposta_ia(request, pergunta, memoria=None):
+    """
+    Decide como responder a pergunta do assistente. Retorna um dict com
+    'resposta' (quando os dados da academia já respondem) ou com 'prompt',
+    'temperatura', 'sem_llm' (texto sem API Key) e 'erro' (prefixo da
+    mensagem de erro) quando o LLM precisa gerar o texto.
+    """
+    academia = request.academia
+
+    # --- RESUMO INICIAL ---
+    if pergunta == '__INITIAL_SUMMARY__':
+        # Boletim já gerado hoje com os mesmos números: sai na hora, sem chamar o modelo (core/boletim.py)
+        snapshot = snapshot_da_requisicao(request)
+        boletim = boletim_guardado(snapshot)
+        if boletim is not None:
+            return {'resposta': boletim}
+        prompt, sem_llm = prompt_boletim(snapshot)
+        return {
+            'prompt': prompt, 'temperatura': BOLETIM_TEMPERATURA, 'sem_llm': sem_llm,
+            'erro': "Erro ao processar com IA", 'boletim': snapshot,
+        }
+
+    # --- PERGUNTAS NORMAIS: primeiro as que os dados respondem direto (core/intencoes.py) ---
+    resposta = responder_localmente(request, pergunta)
+    if resposta is not None:
+        return {'resposta': resposta}
+
+    # Para outras perguntas, usa o LLM, com a janela da conversa (não o histórico inteiro)
+    conversa = janela(memoria) if memoria is not None else ''
+    if conversa:
+        conversa = f"\n{conversa}\n"
+    prompt_text = f"""
+Você é um assistente virtual especializado em gestão de academias de artes marciais.
+Academia: {academia.nome_fantasia}
+
+Com base na pergunta do usuário, forneça uma resposta útil e detalhada.
+Se a pergunta for sobre dados específicos da academia, informe que essas funcionalidades estão sendo implementadas.
+{conversa}
+Pergunta do usuário: {pergunta}
+
+Responda de forma cordial e profissional.
+"""
+    return {
+        'prompt': prompt_text,
+        'temperatura': 0,
+        'sem_llm': "Desculpe, a funcionalidade de perguntas normais ainda está em desenvolvimento. Para respostas personalizadas com IA, configure a variável de ambiente GEMINI_API_KEY.",
+        'erro': "Desculpe, ocorreu um erro ao processar sua pergunta",
+    }
+
+
+def _recusar_ia(limite, resposta=JsonResponse):
+    """ 429 de uma pergunta recusada por um limite do plano (core/cotas_ia.py). """
+    recusa = resposta({'error': str(limite)}, status=429)
+    if limite.tentar_em:
+        recusa['Retry-After'] = str(limite.tentar_em)
+    return recusa
+
 class AgenteIAAPIView(APIView):
     def post(self, request, *args, **kwargs):
         serializer = PerguntaIASerializer(data=request.data)
@@ -480,213 +576,129 @@ class AgenteIAAPIView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         pergunta = serializer.validated_data['question']
-        academia = request.academia
-        
-        try:
-            resposta_ia = ""
-            # --- LÓGICA PARA O RESUMO INICIAL ---
-            if pergunta == '__INITIAL_SUMMARY__':
-                # 1. Coleta todos os dados para o resumo
-                dados_financeiros = analysis.analisar_financeiro(academia)
-                status_alunos = analysis.get_contagem_status_alunos(academia)
-                # Busca alunos inadimplentes diretamente
-                hoje = date.today()
-                inadimplentes = Aluno.objects.filter(
-                    academia=academia, ativo=True,
-                    assinaturas__faturas__data_pagamento__isnull=True,
-                    assinaturas__faturas__data_vencimento__lt=hoje
-                ).distinct().values_list('nome_completo', flat=True)
-                sem_assinatura = analysis.get_contagem_alunos_sem_assinatura(academia)
-                ausentes = analysis.get_alunos_ausentes_recentemente(academia, dias=3)
-
-                # 2. Monta o contexto para o prompt
-                contexto_resumo = (
-                    f"**Resumo Financeiro (Mês Passado):** Faturamento de R$ {dados_financeiros['faturamento_mes_passado']:.2f} e {dados_financeiros['novas_assinaturas']} nova(s) assinatura(s).\n"
-                    f"**Situação Atual:** O faturamento este mês está em R$ {dados_financeiros['faturamento_mes_atual']:.2f} e a inadimplência total é de R$ {dados_financeiros['inadimplencia']:.2f}.\n"
-                    f"**Quadro de Alunos:** {status_alunos['ativos']} alunos ativos e {status_alunos['inativos']} inativos.\n"
-                    f"**Pontos de Atenção:**\n"
-                    f"- {len(inadimplentes)} aluno(s) estão inadimplentes: {', '.join(inadimplentes) if inadimplentes else 'Nenhum'}.\n"
-                    f"- {sem_assinatura} aluno(s) ativos estão sem uma assinatura ativa.\n"
-                    f"- {len(ausentes)} aluno(s) não registram presença há mais de 3 dias: {', '.join(ausentes) if ausentes else 'Nenhum'}.\n"
-                )
-                # Dados para o boletim diário
-                data_hoje = date.today().strftime('%d/%m/%Y')
-                nome_dono = request.user.get_full_name() or request.user.username
-                nome_assistente = "Assistente Virtual"
-                cargo_assistente = "IA de Gestão"
-                prompt = f"""
-**Boletim Diário - {data_hoje}**
-
-Olá {nome_dono}!
-
-Tudo em ordem por aqui! 😄
 
-{contexto_resumo}
-
-Acompanharemos de perto a situação da inadimplência e as ausências para mantermos nossa ótima taxa de alunos ativos.
-
-Qualquer dúvida, pode me chamar! 😊
-
-Atenciosamente,
+        try:
+            consumir_requisicao(request.academia)
+        except LimiteIA as limite:
+            return _recusar_ia(limite, Response)
 
-{nome_assistente} - {cargo_assistente}
-"""
-                # Geração da resposta para o resumo inicial
-                GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-                if GEMINI_API_KEY and GEMINI_API_KEY != "YOUR_GEMINI_API_KEY":
+        try:
+            memoria = _memoria_da_pergunta(request, pergunta, serializer.validated_data['nova_conversa'])
+            preparo = _preparar_resposta_ia(request, pergunta, memoria)
+            resposta_ia = preparo.get('resposta')
+            if resposta_ia is None:
+                # Cliente do LLM compartilhado pelo processo (core/llm.py)
+                llm = get_llm(temperatura=preparo['temperatura'])
+                if llm is None:
+                    print("API Key do Gemini não configurada ou é o valor padrão.")
+                    resposta_ia = preparo['sem_llm']
+                else:
                     try:
-                        model = ChatGoogleGenerativeAI(
-                            model="gemini-1.5-flash",
-                            google_api_key=GEMINI_API_KEY,
-                            temperature=0.7
-                        )
-                        response = model.invoke([HumanMessage(content=prompt)])
-                        resposta_ia = response.content
+                        # Uma vaga de geração da academia; os tokens entram na cota do dia (core/cotas_ia.py)
+                        with geracao_ia(request.academia):
+                            # Recarregar o dashboard com os mesmos números reaproveita a resposta (core/cache_llm.py)
+                            resposta_ia = invocar_com_cache(llm, preparo['prompt'], academia=request.academia)
+                        if preparo.get('boletim'):
+                            guardar_boletim(preparo['boletim'], resposta_ia, 'painel', modelo=str(getattr(llm, 'model', '')))
+                    except LimiteIA as limite:
+                        return _recusar_ia(limite, Response)
                     except Exception as e:
                         print(f"Erro ao processar com IA: {str(e)}")
-                        resposta_ia = f"Erro ao processar com IA: {str(e)}"
-                else:
-                    print("API Key do Gemini não configurada ou é o valor padrão.")
-                    # Resposta padrão quando a API Key não está configurada
-                    resposta_ia = f"""
-**Boletim Diário - {data_hoje}**
+                        resposta_ia = f"{preparo['erro']}: {str(e)}"
+                        memoria = None  # Erros não entram na conversa
+
+            if memoria is not None:
+                registrar_turno(memoria, pergunta, resposta_ia)
 
-Olá {nome_dono}!
+            return Response({'answer': resposta_ia, 'suggestions': SUGESTOES_IA}, status=status.HTTP_200_OK)
 
-Tudo em ordem por aqui! 😄
+        except Exception as e:
+            print(f"ERRO NA APIView COM LANGCHAIN: {e}")
+            return Response(
+                {'error': 'Ocorreu um erro no servidor ao processar a pergunta com LangChain.'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
 
-{contexto_resumo}
+async def agente_ia_stream(request, slug=None):
+    """
+    Mesma pergunta do AgenteIAAPIView, com a resposta transmitida por
+    Server-Sent Events enquanto o modelo gera o texto:
 
-Acompanharemos de perto a situação da inadimplência e as ausências para mantermos nossa ótima taxa de alunos ativos.
+        event: token  data: {"texto": "..."}      (vários)
+        event: fim    data: {"suggestions": [...]}
+        event: erro   data: {"error": "..."}
 
-Qualquer dúvida, pode me chamar! 😊
+    A espera pelo modelo é assíncrona (astream), sem segurar uma thread do
+    servidor; as consultas ao banco rodam em threads via sync_to_async.
+    """
+    autenticado = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not autenticado or getattr(request, 'academia', None) is None:
+        return HttpResponse(status=403)
+    if request.method != 'POST':
+        return HttpResponse(status=405)
 
-Atenciosamente,
+    try:
+        dados = json.loads(request.body or b'{}')
+    except ValueError:
+        dados = {}
+    serializer = PerguntaIASerializer(data=dados)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    pergunta = serializer.validated_data['question']
+    nova_conversa = serializer.validated_data['nova_conversa']
 
-{nome_assistente} - {cargo_assistente}
+    try:
+        await sync_to_async(consumir_requisicao)(request.academia)
+    except LimiteIA as limite:
+        return _recusar_ia(limite)
 
----
-*Nota: Esta é uma resposta padrão. Para respostas personalizadas com IA, configure a variável de ambiente GEMINI_API_KEY.*
-"""
-            # --- LÓGICA PARA PERGUNTAS NORMAIS (LANGCHAIN) ---
+    async def eventos():
+        try:
+            memoria = await sync_to_async(_memoria_da_pergunta)(request, pergunta, nova_conversa)
+            preparo = await sync_to_async(_preparar_resposta_ia)(request, pergunta, memoria)
+            resposta = preparo.get('resposta')
+            if resposta is not None:
+                yield formatar_evento_sse('token', {'texto': resposta})
             else:
-                session_chat_history = request.session.get('lc_chat_history', [])
-                GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-                
-                if GEMINI_API_KEY and GEMINI_API_KEY != "YOUR_GEMINI_API_KEY":
+                llm = get_llm(temperatura=preparo['temperatura'])
+                if llm is None:
+                    resposta = preparo['sem_llm']
+                    yield formatar_evento_sse('token', {'texto': resposta})
+                else:
+                    # O stream já começou: limite de vagas ou de tokens vira um evento de erro
                     try:
-                        # Configura o LLM
-                        llm = ChatGoogleGenerativeAI(
-                            model="gemini-1.5-flash",
-                            temperature=0,
-                            google_api_key=GEMINI_API_KEY
-                        )
-                        
-                        # Analisa a pergunta e busca dados específicos
-                        pergunta_lower = pergunta.lower()
-                        
-                        if "inadimplentes" in pergunta_lower or "inadimplência" in pergunta_lower:
-                            # Busca alunos inadimplentes
-                            hoje = date.today()
-                            inadimplentes = Aluno.objects.filter(
-                                academia=academia, ativo=True,
-                                assinaturas__faturas__data_pagamento__isnull=True,
-                                assinaturas__faturas__data_vencimento__lt=hoje
-                            ).distinct().values_list('nome_completo', flat=True)
-                            
-                            if inadimplentes:
-                                resposta_ia = f"Alunos inadimplentes na {academia.nome_fantasia}:\n\n" + "\n".join([f"• {nome}" for nome in inadimplentes])
-                            else:
-                                resposta_ia = f"Ótima notícia! Não há alunos inadimplentes na {academia.nome_fantasia}."
-                                
-                        elif "faltoso" in pergunta_lower or "frequência" in pergunta_lower or "presença" in pergunta_lower:
-                            # Busca aluno mais faltoso
-                            data_limite = date.today() - timedelta(days=30)
-                            alunos_ativos = Aluno.objects.filter(academia=academia, ativo=True)
-                            
-                            if alunos_ativos.exists():
-                                alunos_com_presencas = alunos_ativos.annotate(
-                                    presencas_recentes=Count('presencas', filter=Q(presencas__data__gte=data_limite))
-                                ).order_by('presencas_recentes')
-                                
-                                aluno_mais_faltoso = alunos_com_presencas.first()
-                                if aluno_mais_faltoso:
-                                    resposta_ia = f"O aluno com menos presenças nos últimos 30 dias é {aluno_mais_faltoso.nome_completo}, com {aluno_mais_faltoso.presencas_recentes} presenças."
-                                else:
-                                    resposta_ia = "Não foi possível determinar o aluno mais faltoso."
-                            else:
-                                resposta_ia = "Não há alunos ativos cadastrados."
-                                
-                        elif "quantos alunos" in pergunta_lower or "total de alunos" in pergunta_lower:
-                            # Conta alunos ativos
-                            total_ativos = Aluno.objects.filter(academia=academia, ativo=True).count()
-                            total_inativos = Aluno.objects.filter(academia=academia, ativo=False).count()
-                            
-                            resposta_ia = f"Na {academia.nome_fantasia} você tem:\n• {total_ativos} alunos ativos\n• {total_inativos} alunos inativos\n• Total: {total_ativos + total_inativos} alunos"
-                            
-                        elif "planos" in pergunta_lower:
-                            # Lista planos
-                            planos = Plano.objects.filter(academia=academia)
-                            if planos.exists():
-                                resposta_ia = f"Planos disponíveis na {academia.nome_fantasia}:\n\n" + "\n".join([f"• {plano.nome}: R$ {plano.valor}" for plano in planos])
-                            else:
-                                resposta_ia = "Nenhum plano cadastrado ainda."
-                                
-                        elif "nível de inadimplência" in pergunta_lower or "valor inadimplência" in pergunta_lower:
-                            # Calcula inadimplência
-                            hoje = date.today()
-                            total_vencido = Fatura.objects.filter(
-                                academia=academia,
-                                data_pagamento__isnull=True,
-                                data_vencimento__lt=hoje
-                            ).aggregate(total=Sum('valor'))['total'] or 0
-                            
-                            resposta_ia = f"O valor total de faturas vencidas e não pagas na {academia.nome_fantasia} é de R$ {total_vencido:.2f}."
-                            
-                        else:
-                            # Para outras perguntas, usa o LLM
-                            prompt_text = f"""
-Você é um assistente virtual especializado em gestão de academias de artes marciais.
-Academia: {academia.nome_fantasia}
-
-Com base na pergunta do usuário, forneça uma resposta útil e detalhada.
-Se a pergunta for sobre dados específicos da academia, informe que essas funcionalidades estão sendo implementadas.
-
-Pergunta do usuário: {pergunta}
-
-Responda de forma cordial e profissional.
-"""
-                            
-                            # Executa a pergunta diretamente com o LLM
-                            response = llm.invoke([HumanMessage(content=prompt_text)])
-                            resposta_ia = response.content
-                        
+                        geracao = await sync_to_async(iniciar_geracao)(request.academia)
+                    except LimiteIA as limite:
+                        yield formatar_evento_sse('erro', {'error': str(limite)})
+                        return
+                    pedacos = []
+                    try:
+                        async for pedaco in transmitir_com_cache(llm, preparo['prompt'], academia=request.academia):
+                            pedacos.append(pedaco)
+                            yield formatar_evento_sse('token', {'texto': pedaco})
+                        resposta = ''.join(pedacos)
+                        if preparo.get('boletim'):
+                            await sync_to_async(guardar_boletim)(
+                                preparo['boletim'], resposta, 'painel', modelo=str(getattr(llm, 'model', '')),
+                            )
                     except Exception as e:
-                        print(f"Erro ao processar pergunta normal: {str(e)}")
-                        resposta_ia = f"Desculpe, ocorreu um erro ao processar sua pergunta: {str(e)}. Por favor, tente novamente."
-                else:
-                    print("API Key do Gemini não configurada para perguntas normais.")
-                    resposta_ia = "Desculpe, a funcionalidade de perguntas normais ainda está em desenvolvimento. Para respostas personalizadas com IA, configure a variável de ambiente GEMINI_API_KEY."
-
-            # Define as sugestões de menu para o frontend
-            sugestoes = [
-                "Quem são os alunos inadimplentes?",
-                "Qual o aluno mais faltoso?",
-                "Listar meus planos",
-                "Quantos alunos ativos tenho?",
-                "Qual o nível de inadimplência?",
-                "Detalhes do aluno João Silva",
-                "Histórico de pagamentos do aluno Maria Santos",
-            ]
-
-            return Response({'answer': resposta_ia, 'suggestions': sugestoes}, status=status.HTTP_200_OK)
-
+                        print(f"Erro ao processar com IA: {str(e)}")
+                        memoria = None  # Erros não entram na conversa
+                        yield formatar_evento_sse('token', {'texto': f"{preparo['erro']}: {str(e)}"})
+                    finally:
+                        await sync_to_async(encerrar_geracao)(geracao)
+            yield formatar_evento_sse('fim', {'suggestions': SUGESTOES_IA})
+            # Depois do 'fim': quem pergunta não espera o resumo da conversa
+            if memoria is not None:
+                await sync_to_async(registrar_turno)(memoria, pergunta, resposta)
         except Exception as e:
-            print(f"ERRO NA APIView COM LANGCHAIN: {e}")
-            return Response(
-                {'error': 'Ocorreu um erro no servidor ao processar a pergunta com LangChain.'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+            print(f"ERRO NO STREAM DO ASSISTENTE: {e}")
+            yield formatar_evento_sse('erro', {'error': 'Ocorreu um erro no servidor ao processar a pergunta.'})
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Nginx não deve acumular o stream
+    return response
 
 @login_required
 def configuracao_whatsapp(request, slug=None):
@@ -715,6 +727,59 @@ def whatsapp_conexao(request, slug=None):
     }
     return render(request, 'core/whatsapp_conexao.html', contexto)
 
+@login_required
+@require_POST
+def whatsapp_inicializar(request, slug=None):
+    """ Pede ao nó do gateway que hospeda a academia para iniciar a sessão (gerar o QR Code). """
+    academia = request.academia
+    gateway = gateway_da_academia(academia)
+    if gateway is None:
+        return JsonResponse({'success': False, 'error': 'Gateway do WhatsApp não configurado.'}, status=502)
+    try:
+        dados = gateway.initialize(academia.id)
+    except (CircuitoAberto, requests.exceptions.RequestException, ValueError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=502)
+    cache.delete(f"whatsapp_status:{academia.id}")
+    return JsonResponse(dados)
+
+def _status_whatsapp_em_cache(academia):
+    """ Consulta o gateway no máximo a cada 3s por academia (modo WSGI). """
+    chave = f"whatsapp_status:{academia.id}"
+    estado = cache.get(chave)
+    if estado is None:
+        gateway = gateway_da_academia(academia)
+        try:
+            dados = gateway.status(academia.id) if gateway else {}
+            estado = {'status': dados.get('status', 'disconnected'), 'qrCode': dados.get('qrCode')}
+        except Exception:
+            estado = {'status': 'gateway_offline', 'qrCode': None}
+        cache.set(chave, estado, 3)
+    return estado
+
+async def whatsapp_status_eventos(request, slug=None):
+    """
+    Stream SSE com o status da conexão do WhatsApp da academia.
+    Em ASGI a conexão fica aberta recebendo as mudanças do hub; em WSGI
+    (runserver) cada requisição devolve o estado atual e o EventSource
+    reconecta após alguns segundos.
+    """
+    autenticado = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not autenticado or getattr(request, 'academia', None) is None:
+        return HttpResponse(status=403)
+    academia = request.academia
+
+    if not isinstance(request, ASGIRequest):
+        estado = await sync_to_async(_status_whatsapp_em_cache)(academia)
+        return HttpResponse("retry: 4000\n\n" + formatar_evento(estado), content_type='text/event-stream')
+
+    # O status vem do nó do gateway que hospeda a sessão da academia
+    gateway = await sync_to_async(gateway_da_academia)(academia)
+    base_url = gateway.base_url if gateway else None
+    response = StreamingHttpResponse(eventos_status(academia.id, base_url), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Nginx não deve acumular o stream
+    return response
+
 @login_required
 def relatorio_frequencia(request, slug=None):
     academia = request.academia
@@ -777,7 +842,7 @@ def relatorio_financeiro(request, slug=None):
     faturas = Fatura.objects.filter(
         academia=academia,
         data_vencimento__range=[data_inicio, data_fim]
-    )
+    ).select_related('assinatura__aluno', 'assinatura__plano')
 
     # Aplica os filtros adicionais, se existirem
     if status_filtro == 'paga':
@@ -801,7 +866,7 @@ def relatorio_financeiro(request, slug=None):
     planos_para_filtro = Plano.objects.filter(academia=academia)
 
     contexto = {
-        'faturas': faturas.order_by('data_vencimento'),
+        'faturas': PaginadorCursor(faturas, ('data_vencimento', 'id'), por_pagina=50).pagina_da_requisicao(request),
         'planos_para_filtro': planos_para_filtro,
         'kpis': {
             'total_recebido': total_recebido,
@@ -1067,7 +1132,7 @@ def registrar_resultado_exame(request, inscricao_pk, slug=None):
             HistoricoGraduacao.objects.create(aluno=aluno, graduacao=inscricao.graduacao_pretendida)
             messages.success(request, f"{aluno.nome_completo} foi APROVADO(A) com sucesso!")
 
-            if academia.notificar_graduacao and aluno.contato and aluno.receber_notificacoes:
+            if academia.notificar_graduacao and aluno.whatsapp_valido and aluno.receber_notificacoes:
                 mensagem = (f"🎉 Parabéns, {aluno.nome_completo.split()[0]}! 🎉\n\nÉ com grande orgulho que a {academia.nome_fantasia} "
                             f"informa que você foi APROVADO(A) no exame de graduação!\n\n"
                             f"Sua nova graduação é **{inscricao.graduacao_pretendida.nome}**.\n\nContinue se dedicando! Oss!")
@@ -1080,7 +1145,7 @@ def registrar_resultado_exame(request, inscricao_pk, slug=None):
                 form.save() # Salva as observações
                 messages.warning(request, f"O resultado de {aluno.nome_completo} foi registrado como REPROVADO(A).")
 
-                if academia.notificar_graduacao and aluno.contato and aluno.receber_notificacoes:
+                if academia.notificar_graduacao and aluno.whatsapp_valido and aluno.receber_notificacoes:
                     observacoes = form.cleaned_data.get('observacoes')
                     mensagem = (f"Olá {aluno.nome_completo.split()[0]}. Passando para dar o feedback do seu exame de graduação.\n\n"
                                 f"Desta vez não foi possível a aprovação, mas isso faz parte da jornada de todo grande atleta. Continue treinando e focando nos pontos abaixo e o sucesso será inevitável!\n\n"
@@ -1122,7 +1187,7 @@ def convidar_alunos_exame(request, exame_pk, slug=None):
         # Verifica se a academia tem a notificação de faltas ativa (podemos usar essa mesma configuração)
         if academia.notificar_graduacao: # Ou criar um novo campo booleano em Academia
             for aluno in alunos_convidados:
-                if aluno.contato and aluno.receber_notificacoes:
+                if aluno.whatsapp_valido and aluno.receber_notificacoes:
                     mensagem = (
                         f"Olá {aluno.nome_completo.split()[0]}! 🥋\n\n"
                         f"Temos uma ótima notícia! Você foi selecionado para participar do exame de graduação para "
@@ -1155,7 +1220,7 @@ def atualizar_status_inscricao(request, inscricao_pk, novo_status):
             messages.success(request, f"{aluno.nome_completo} foi APROVADO(A) com sucesso!")
 
             # --- INÍCIO DA LÓGICA DE NOTIFICAÇÃO ---
-            if academia.notificar_graduacao and aluno.contato and aluno.receber_notificacoes:
+            if academia.notificar_graduacao and aluno.whatsapp_valido and aluno.receber_notificacoes:
                 mensagem = (
                     f"🎉 Parabéns, {aluno.nome_completo.split()[0]}! 🎉\n\n"
                     f"É com grande orgulho que a {academia.nome_fantasia} informa que você foi **APROVADO(A)** "
@@ -1185,6 +1250,12 @@ def deletar_exame(request, pk, slug=None):
         
     return redirect('gerenciar_exames', slug=request.academia.slug)
 
+def _data_do_filtro(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+    except ValueError:
+        return None
+
 @login_required
 def relatorio_mensagens(request, slug=None):
     academia = request.academia
@@ -1198,11 +1269,8 @@ def relatorio_mensagens(request, slug=None):
     data_fim = request.GET.get('data_fim')
 
     if termo_busca:
-        # Busca no nome do aluno OU no conteúdo da mensagem
-        log_list = log_list.filter(
-            Q(aluno__nome_completo__icontains=termo_busca) |
-            Q(mensagem__icontains=termo_busca)
-        )
+        # Busca no nome do aluno OU no conteúdo da mensagem (índice de texto, por relevância)
+        log_list = buscar_mensagens(log_list, termo_busca, academia=academia)
 
     if data_inicio:
         log_list = log_list.filter(data_envio__gte=data_inicio)
@@ -1212,16 +1280,40 @@ def relatorio_mensagens(request, slug=None):
         data_fim_ajustada = datetime.strptime(data_fim, '%Y-%m-%d').date() + timedelta(days=1)
         log_list = log_list.filter(data_envio__lt=data_fim_ajustada)
 
+    # --- Taxas de entrega (confirmações recebidas do WhatsApp) ---
+    entrega = log_list.aggregate(
+        enviadas=Count('id', filter=Q(status='enviado')),
+        entregues=Count('id', filter=Q(status='enviado', status_entrega__in=['entregue', 'lida'])),
+        lidas=Count('id', filter=Q(status='enviado', status_entrega='lida')),
+        falhas=Count('id', filter=Q(status='enviado', status_entrega='falhou')),
+    )
+
+    # --- Mensagens arquivadas ---
+    # Só entram quando o período pedido alcança meses que já saíram da base principal
+    historico = HistoricoMensagens(
+        log_list, academia,
+        data_inicio=_data_do_filtro(data_inicio),
+        data_fim=_data_do_filtro(data_fim),
+        termo=termo_busca,
+    )
+    if historico.usa_arquivo:
+        arquivadas = historico.totais_entrega()
+        entrega['enviadas'] += arquivadas['enviadas']
+        entrega['entregues'] += arquivadas['entregues']
+        entrega['lidas'] += arquivadas['lidas']
+        entrega['falhas'] += arquivadas['falhas_entrega']
+
+    for chave in ('entregues', 'lidas', 'falhas'):
+        entrega[f'taxa_{chave}'] = round(100 * entrega[chave] / entrega['enviadas'], 1) if entrega['enviadas'] else 0
+
     # --- Lógica da Paginação ---
-    # Cria o objeto Paginator, mostrando 20 itens por página
-    paginator = Paginator(log_list, 20)
-    # Pega o número da página da URL (ex: ?page=2)
-    page_number = request.GET.get('page')
-    # Pega o objeto da página correspondente
-    page_obj = paginator.get_page(page_number)
+    # Por cursor (?depois=/?antes=): a ordem é a da busca (relevância) ou a data de envio
+    page_obj = historico.paginador(por_pagina=20).pagina_da_requisicao(request)
 
     contexto = {
         'page_obj': page_obj, # Enviamos o objeto da página para o template
+        'entrega': entrega,
+        'inclui_arquivo': historico.usa_arquivo,
         'filtros_aplicados': {
             'q': termo_busca,
             'data_inicio': data_inicio,
@@ -1230,6 +1322,80 @@ def relatorio_mensagens(request, slug=None):
     }
     return render(request, 'core/relatorio_mensagens.html', contexto)
 
+# -----------------------------------------------------------------------------
+# TRANSMISSÕES (MENSAGEM PARA UM SEGMENTO DE ALUNOS)
+# -----------------------------------------------------------------------------
+
+@login_required
+def lista_transmissoes(request, slug=None):
+    academia = request.academia
+    transmissoes = Transmissao.objects.filter(academia=academia).select_related('criada_por')
+    page_obj = PaginadorCursor(transmissoes, ('-criada_em', '-id'), por_pagina=20).pagina_da_requisicao(request)
+
+    # Andamento de todas as transmissões da página com uma única consulta
+    andamento = {
+        linha['transmissao_id']: linha for linha in
+        LogMensagem.all_objects.filter(transmissao__in=page_obj.object_list)
+        .values('transmissao_id')
+        .annotate(
+            na_fila=Count('id', filter=Q(status__in=['pendente', 'enviando'])),
+            enviadas=Count('id', filter=Q(status='enviado')),
+            falhas=Count('id', filter=Q(status='falhou')),
+        )
+    }
+    for transmissao in page_obj.object_list:
+        transmissao.andamento = andamento.get(transmissao.id, {'na_fila': 0, 'enviadas': 0, 'falhas': 0})
+
+    return render(request, 'core/transmissoes.html', {'page_obj': page_obj})
+
+@login_required
+def nova_transmissao(request, slug=None):
+    academia = request.academia
+    previa = None
+    if request.method == 'POST':
+        form = TransmissaoForm(request.POST, academia=academia)
+        if form.is_valid():
+            filtros = form.filtros()
+            contagem = contar_segmento(academia, filtros)
+            if 'previa' in request.POST or not contagem['destinatarios']:
+                if not contagem['destinatarios']:
+                    messages.warning(request, "Nenhum aluno do segmento pode receber mensagens pelo WhatsApp.")
+                exemplo = compilar_segmento(academia, filtros).filter(NOTIFICAVEIS).order_by('nome_completo').first()
+                previa = {
+                    **contagem,
+                    'sem_whatsapp': contagem['total'] - contagem['destinatarios'],
+                    'descricao': descrever_segmento(academia, filtros),
+                    'exemplo': renderizar_mensagem(form.cleaned_data['mensagem'], exemplo, academia) if exemplo else None,
+                }
+            else:
+                transmissao = criar_transmissao(
+                    academia, form.cleaned_data['titulo'], form.cleaned_data['mensagem'], filtros, usuario=request.user,
+                )
+                messages.success(request, f"{transmissao.total_destinatarios} mensagem(ns) enfileirada(s) para envio.")
+                return redirect('detalhe_transmissao', slug=academia.slug, pk=transmissao.pk)
+    else:
+        form = TransmissaoForm(academia=academia)
+
+    return render(request, 'core/transmissao_form.html', {'form': form, 'previa': previa})
+
+@login_required
+def detalhe_transmissao(request, pk, slug=None):
+    academia = request.academia
+    transmissao = get_object_or_404(Transmissao, pk=pk, academia=academia)
+    mensagens = LogMensagem.objects.filter(transmissao=transmissao).select_related('aluno')
+    contexto = {
+        'transmissao': transmissao,
+        'estatisticas': estatisticas_transmissao(transmissao),
+        'page_obj': PaginadorCursor(mensagens, ('id',), por_pagina=50).pagina_da_requisicao(request),
+    }
+    return render(request, 'core/transmissao_detalhe.html', contexto)
+
+@login_required
+def progresso_transmissao(request, pk, slug=None):
+    """ Andamento da transmissão em JSON (atualização automática da página de detalhe). """
+    transmissao = get_object_or_404(Transmissao, pk=pk, academia=request.academia)
+    return JsonResponse(estatisticas_transmissao(transmissao))
+
 def sem_academia(request, slug=None):
     """ Página exibida quando o usuário não tem academia associada """
     return render(request, 'core/sem_academia.html')
@@ -3,20 +3,28 @@ from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 from datetime import timedelta
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
+import hmac
 import json
 import stripe
 from django.conf import settings
 
 from .models import (
     Academia, PlanoSaaS, AssinaturaSaaS, ConfiguracaoSistema,
-    PagamentoSaaS, HistoricoAssinaturaSaaS
+    PagamentoSaaS, HistoricoAssinaturaSaaS, DisjuntorGateway, NoGateway
 )
 from .forms import CustomUserCreationForm, AcademiaForm, CadastroAcademiaForm
+from .cache_llm import resumo_metricas as resumo_cache_llm
+from .cotas_ia import resumo_uso
+from .disjuntor import resumo_disjuntor
+from .intencoes import resumo_metricas as resumo_intencoes
+from .notificacoes import registrar_recibos
+from .paginacao import PaginadorCursor
 
 # Configurar Stripe
 stripe.api_key = getattr(settings, 'STRIPE_SECRET_KEY', '')
@@ -25,6 +33,14 @@ def is_superuser(user):
     """Verifica se o usuário é superadmin"""
     return user.is_superuser
 
+def _dias_da_requisicao(request, padrao=30, maximo=365):
+    """Janela em dias dos endpoints de monitoramento (?dias=); valor inválido usa o padrão"""
+    try:
+        dias = int(request.GET.get('dias') or padrao)
+    except ValueError:
+        dias = padrao
+    return min(max(dias, 1), maximo)
+
 # -----------------------------------------------------------------------------
 # VIEWS PÚBLICAS DO SAAS
 # -----------------------------------------------------------------------------
@@ -381,6 +397,36 @@ def stripe_webhook(request):
     
     return JsonResponse({'status': 'success'})
 
+# -----------------------------------------------------------------------------
+# WEBHOOK DE CONFIRMAÇÕES DO WHATSAPP
+# -----------------------------------------------------------------------------
+
+@csrf_exempt
+@require_POST
+def whatsapp_recibos_webhook(request):
+    """
+    Recebe do gateway, em lotes, as confirmações de entrega/leitura/falha.
+    Corpo: {"academiaId": "1", "receipts": [{"id", "status" ou "ack", "timestamp"}]}
+    """
+    token = getattr(settings, 'WHATSAPP_WEBHOOK_TOKEN', '')
+    if not token or not hmac.compare_digest(token, request.headers.get('X-Webhook-Token', '')):
+        return JsonResponse({'error': 'Token inválido'}, status=403)
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+
+    recibos = payload.get('receipts') if isinstance(payload, dict) else None
+    if not isinstance(recibos, list):
+        return JsonResponse({'error': 'receipts deve ser uma lista'}, status=400)
+    if len(recibos) > getattr(settings, 'WHATSAPP_RECIBOS_MAXIMO', 5000):
+        return JsonResponse({'error': 'Lote de confirmações grande demais'}, status=413)
+
+    academia_id = payload.get('academiaId')
+    resumo = registrar_recibos(recibos, academia_id=int(academia_id) if str(academia_id or '').isdigit() else None)
+    return JsonResponse({'status': 'success', **resumo})
+
 def _processar_pagamento_sucesso(session):
     """Processa pagamento bem-sucedido"""
     try:
@@ -540,9 +586,14 @@ def admin_dashboard(request):
 def admin_academias(request):
     """Listar e gerenciar academias"""
     academias = Academia.objects.all().select_related('dono', 'assinatura_saas__plano')
+    # Mais recentes primeiro; o id acompanha a ordem de cadastro e já tem índice
+    academias = PaginadorCursor(academias, ('-id',), por_pagina=50).pagina_da_requisicao(request)
     
     context = {
         'academias': academias,
+        # A página do cursor não tem .count(): os cartões contam a tabela inteira
+        'total': Academia.objects.count(),
+        'ativas': Academia.objects.filter(ativa=True).count(),
     }
     
     return render(request, 'superadmin/academias.html', context)
@@ -580,4 +631,33 @@ def admin_relatorios(request):
     context = {
         'title': 'Relatórios',
     }
-    return render(request, 'superadmin/relatorios.html', context)
\ No newline at end of file
+    return render(request, 'superadmin/relatorios.html', context)
+
+@user_passes_test(is_superuser)
+def admin_gateway_disjuntor(request):
+    """Estado e contadores do disjuntor de cada gateway do WhatsApp e nós do pool (JSON, para monitoramento)"""
+    disjuntores = [resumo_disjuntor(registro) for registro in DisjuntorGateway.objects.order_by('nome')]
+    nos = NoGateway.objects.annotate(total_academias=Count('academias')).order_by('nome')
+    return JsonResponse({
+        'disjuntores': disjuntores,
+        'abertos': sum(1 for d in disjuntores if d['estado'] != 'fechado'),
+        'nos': [
+            {'nome': no.nome, 'url': no.url, 'estado': no.estado, 'peso': no.peso, 'academias': no.total_academias}
+            for no in nos
+        ],
+    })
+
+@user_passes_test(is_superuser)
+def admin_cache_llm(request):
+    """Acertos, falhas e tamanho do cache de respostas do LLM (JSON, para monitoramento)"""
+    return JsonResponse(resumo_cache_llm(dias=_dias_da_requisicao(request)))
+
+@user_passes_test(is_superuser)
+def admin_intencoes_ia(request):
+    """Perguntas do assistente respondidas sem o LLM, por intenção, e a taxa do caminho rápido (JSON)"""
+    return JsonResponse(resumo_intencoes(dias=_dias_da_requisicao(request)))
+
+@user_passes_test(is_superuser)
+def admin_uso_ia(request):
+    """Perguntas, recusas por limite e tokens do LLM de cada academia (JSON, para monitoramento)"""
+    return JsonResponse(resumo_uso(dias=_dias_da_requisicao(request)))
@@ -0,0 +1,204 @@
+# core/whatsapp_status.py
+
+"""
+Status da conexão do WhatsApp de cada academia, distribuído por Server-Sent Events.
+
+Em vez de cada aba do navegador consultar o gateway a cada poucos segundos, o
+processo mantém UMA assinatura por academia com o gateway (o stream
+`/events/<id>` do gateway Node.js, ou consultas a `/status/<id>` quando o
+gateway não tem esse endpoint), guarda o último estado (status + QR Code) e o
+repassa para todos os navegadores conectados. A assinatura só existe enquanto
+houver alguém ouvindo.
+
+O hub roda no event loop do servidor ASGI; as conexões ociosas ficam
+esperando em uma asyncio.Queue, sem ocupar threads. Com o pool de gateways
+(core/gateway_pool.py) há um hub por nó, e cada academia é acompanhada no nó
+que hospeda a sessão dela.
+"""
+
+import asyncio
+import json
+import logging
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Intervalos da consulta a /status/<id> quando o gateway não tem /events/<id>
+INTERVALO_TRANSICAO = 2  # Desconectado, gerando ou aguardando a leitura do QR Code
+INTERVALO_CONECTADO = 10
+
+# Tempo que a assinatura com o gateway sobrevive depois que o último navegador sai
+ESPERA_SEM_ASSINANTES = 30
+
+# Espera máxima antes de reconectar ao gateway (dobra a cada falha, a partir de 1s)
+ESPERA_MAXIMA_RECONEXAO = 30
+
+
+def _normalizar(dados):
+    return {'status': dados.get('status', 'disconnected'), 'qrCode': dados.get('qrCode')}
+
+
+def formatar_evento(estado):
+    return f"event: status\ndata: {json.dumps(estado)}\n\n"
+
+
+class _StreamEncerrado(Exception):
+    """ O gateway fechou o stream /events sem erro enquanto ainda havia navegadores ouvindo. """
+
+
+class _Canal:
+    """ Assinatura de uma academia: último estado conhecido + filas dos navegadores. """
+
+    def __init__(self, academia_id):
+        self.academia_id = academia_id
+        self.estado = None
+        self.filas = set()
+        self.tarefa = None
+
+
+class HubStatusWhatsApp:
+
+    def __init__(self, base_url=None):
+        self.base_url = (base_url or settings.WHATSAPP_GATEWAY_URL).rstrip('/')
+        self.canais = {}
+        self.cliente = httpx.AsyncClient(
+            timeout=httpx.Timeout(getattr(settings, 'WHATSAPP_GATEWAY_TIMEOUT_LEITURA', 20),
+                                  connect=getattr(settings, 'WHATSAPP_GATEWAY_TIMEOUT_CONEXAO', 3.05)),
+        )
+        # None = ainda não sabemos se o gateway tem o endpoint /events/<id>
+        self.suporta_eventos = None
+
+    def assinar(self, academia_id):
+        canal = self.canais.get(academia_id)
+        if canal is None:
+            canal = self.canais[academia_id] = _Canal(academia_id)
+        fila = asyncio.Queue(maxsize=1)
+        canal.filas.add(fila)
+        if canal.estado is not None:
+            fila.put_nowait(canal.estado)
+        if canal.tarefa is None or canal.tarefa.done():
+            canal.tarefa = asyncio.create_task(self._manter_assinatura(canal))
+        return fila
+
+    def cancelar(self, academia_id, fila):
+        canal = self.canais.get(academia_id)
+        if canal is not None:
+            canal.filas.discard(fila)
+
+    def _publicar(self, canal, estado):
+        if estado == canal.estado:
+            return
+        canal.estado = estado
+        for fila in canal.filas:
+            # Só o estado mais recente interessa: descarta o que o navegador ainda não leu
+            if fila.full():
+                fila.get_nowait()
+            fila.put_nowait(estado)
+
+    async def _manter_assinatura(self, canal):
+        ocioso_desde = None
+        espera_erro = 1
+        try:
+            while True:
+                if not canal.filas:
+                    # Mantém o canal por um tempo: a aba pode estar só recarregando
+                    agora = asyncio.get_running_loop().time()
+                    ocioso_desde = ocioso_desde or agora
+                    if agora - ocioso_desde >= ESPERA_SEM_ASSINANTES:
+                        break
+                    await asyncio.sleep(1)
+                    continue
+                ocioso_desde = None
+
+                inicio = asyncio.get_running_loop().time()
+                try:
+                    if self.suporta_eventos is not False:
+                        await self._ouvir_eventos(canal)
+                    else:
+                        await self._consultar_status(canal)
+                    espera_erro = 1
+                except _StreamEncerrado:
+                    # Gateway reiniciando ou proxy cortando a conexão: o estado continua o mesmo,
+                    # mas a reconexão espera como nas falhas para não martelar um gateway que fecha
+                    # o stream logo de cara. Um stream que durou bastante recomeça da espera mínima.
+                    if asyncio.get_running_loop().time() - inicio >= ESPERA_MAXIMA_RECONEXAO:
+                        espera_erro = 1
+                    await asyncio.sleep(espera_erro)
+                    espera_erro = min(espera_erro * 2, ESPERA_MAXIMA_RECONEXAO)
+                except (httpx.HTTPError, ValueError) as e:
+                    logger.warning("Falha ao acompanhar o status do WhatsApp da academia %s: %s", canal.academia_id, e)
+                    self._publicar(canal, {'status': 'gateway_offline', 'qrCode': None})
+                    await asyncio.sleep(espera_erro)
+                    espera_erro = min(espera_erro * 2, ESPERA_MAXIMA_RECONEXAO)
+        finally:
+            self.canais.pop(canal.academia_id, None)
+
+    async def _ouvir_eventos(self, canal):
+        """ Consome o stream /events/<id> do gateway até ele cair ou ficar sem ouvintes. """
+        url = f"{self.base_url}/events/{canal.academia_id}"
+        # O gateway manda um comentário a cada 25s; sem nada em 60s a conexão é dada como morta
+        timeout = httpx.Timeout(60, connect=getattr(settings, 'WHATSAPP_GATEWAY_TIMEOUT_CONEXAO', 3.05))
+        async with self.cliente.stream('GET', url, timeout=timeout) as resposta:
+            if resposta.status_code in (404, 405):
+                logger.info("Gateway %s não possui /events; consultando /status periodicamente.", self.base_url)
+                self.suporta_eventos = False
+                return
+            resposta.raise_for_status()
+            self.suporta_eventos = True
+            async for linha in resposta.aiter_lines():
+                if linha.startswith('data:'):
+                    self._publicar(canal, _normalizar(json.loads(linha[5:])))
+                if not canal.filas:
+                    return
+        if canal.filas:
+            raise _StreamEncerrado()
+
+    async def _consultar_status(self, canal):
+        resposta = await self.cliente.get(f"{self.base_url}/status/{canal.academia_id}")
+        resposta.raise_for_status()
+        estado = _normalizar(resposta.json())
+        self._publicar(canal, estado)
+        await asyncio.sleep(INTERVALO_CONECTADO if estado['status'] == 'ready' else INTERVALO_TRANSICAO)
+
+
+# Um hub por event loop e por nó do gateway (o servidor ASGI usa um loop só;
+# testes e scripts podem criar outros)
+_hubs = {}
+
+
+def get_hub(base_url=None):
+    loop = asyncio.get_running_loop()
+    base_url = (base_url or settings.WHATSAPP_GATEWAY_URL).rstrip('/')
+    hub = _hubs.get((loop, base_url))
+    if hub is None:
+        for antigo in [chave for chave in _hubs if chave[0].is_closed()]:
+            del _hubs[antigo]
+        hub = _hubs[(loop, base_url)] = HubStatusWhatsApp(base_url)
+    return hub
+
+
+async def eventos_status(academia_id, base_url=None):
+    """
+    Gerador assíncrono do stream SSE de uma academia, acompanhando o nó
+    `base_url` do gateway. Termina depois de WHATSAPP_SSE_DURACAO_MAXIMA
+    segundos; o EventSource do navegador reconecta sozinho, recebe o estado
+    atual de imediato e, se a academia mudou de nó, passa a ouvir o novo.
+    """
+    hub = get_hub(base_url)
+    fila = hub.assinar(academia_id)
+    loop = asyncio.get_running_loop()
+    fim = loop.time() + getattr(settings, 'WHATSAPP_SSE_DURACAO_MAXIMA', 300)
+    try:
+        yield "retry: 3000\n\n"
+        while loop.time() < fim:
+            try:
+                estado = await asyncio.wait_for(fila.get(), timeout=min(15, max(fim - loop.time(), 0)))
+            except asyncio.TimeoutError:
+                # Comentário SSE: mantém a conexão viva em proxies e detecta abas fechadas
+                yield ": ping\n\n"
+                continue
+            yield formatar_evento(estado)
+    finally:
+        hub.cancelar(academia_id, fila)
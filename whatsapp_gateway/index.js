@@ -11,6 +11,13 @@ const path = require('path');
 const app = express();
 const port = 3000;
 
+// Webhook do Django que recebe as confirmações de entrega/leitura (opcional)
+const RECEIPTS_URL = process.env.DJANGO_RECEIPTS_URL || '';
+const WEBHOOK_TOKEN = process.env.WHATSAPP_WEBHOOK_TOKEN || '';
+const RECEIPTS_FLUSH_MS = 2000;
+const RECEIPTS_BATCH = 500;
+const RECEIPTS_MAX_BUFFER = 20000;
+
 // 1. PRIMEIRO, ensine o Express a ler JSON.
 app.use(express.json()); 
 
@@ -51,6 +58,67 @@ cleanupOldSessions();
 // usando o ID da academia como chave. Ex: clients['1'] = cliente_da_academia_1
 const clients = {};
 
+// --- CONFIRMAÇÕES DE ENTREGA ---
+// Os ACKs do WhatsApp são acumulados por academia e enviados ao Django em lotes,
+// para que um pico de confirmações não vire uma requisição (e um UPDATE) por mensagem.
+const pendingReceipts = {};
+let pendingCount = 0;
+
+function queueReceipt(academiaId, msg, ack) {
+    if (!RECEIPTS_URL || !msg.fromMe) return;
+    if (pendingCount >= RECEIPTS_MAX_BUFFER) {
+        console.log('Buffer de confirmações cheio; descartando ACK.');
+        return;
+    }
+    pendingReceipts[academiaId] = pendingReceipts[academiaId] || [];
+    pendingReceipts[academiaId].push({ id: msg.id._serialized, ack, timestamp: Math.floor(Date.now() / 1000) });
+    pendingCount++;
+}
+
+async function flushReceipts() {
+    for (const academiaId of Object.keys(pendingReceipts)) {
+        const receipts = pendingReceipts[academiaId].splice(0, RECEIPTS_BATCH);
+        pendingCount -= receipts.length;
+        if (pendingReceipts[academiaId].length === 0) delete pendingReceipts[academiaId];
+        if (receipts.length === 0) continue;
+        try {
+            const response = await fetch(RECEIPTS_URL, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'X-Webhook-Token': WEBHOOK_TOKEN },
+                body: JSON.stringify({ academiaId, receipts }),
+            });
+            if (response.status >= 500) throw new Error(`HTTP ${response.status}`);
+        } catch (err) {
+            // Django fora do ar: devolve o lote para o buffer e tenta no próximo ciclo
+            console.log(`Falha ao enviar confirmações da academia ${academiaId}: ${err.message}`);
+            pendingReceipts[academiaId] = receipts.concat(pendingReceipts[academiaId] || []);
+            pendingCount += receipts.length;
+        }
+    }
+    setTimeout(flushReceipts, RECEIPTS_FLUSH_MS);
+}
+
+if (RECEIPTS_URL) {
+    setTimeout(flushReceipts, RECEIPTS_FLUSH_MS);
+}
+
+// --- ASSINANTES DO STATUS (SSE) ---
+// O Django mantém uma conexão em /events/:academiaId por academia e repassa as
+// mudanças para os navegadores, em vez de consultar /status repetidamente.
+const statusListeners = {};
+
+function currentStatus(academiaId) {
+    const session = clients[academiaId];
+    return session ? { status: session.status, qrCode: session.qrCode } : { status: 'disconnected' };
+}
+
+function notifyStatus(academiaId) {
+    const listeners = statusListeners[academiaId];
+    if (!listeners) return;
+    const data = `event: status\ndata: ${JSON.stringify(currentStatus(academiaId))}\n\n`;
+    listeners.forEach(res => res.write(data));
+}
+
 /**
  * Cria e inicializa uma nova sessão de cliente do WhatsApp para uma academia específica.
  * @param {string} academiaId - O ID da academia do nosso banco de dados Django.
@@ -100,6 +168,7 @@ function createClientSession(academiaId) {
             if (!err) {
                 clients[academiaId].status = 'qr_ready';
                 clients[academiaId].qrCode = url; // Armazena a imagem do QR code
+                notifyStatus(academiaId);
             }
         });
     });
@@ -108,22 +177,30 @@ function createClientSession(academiaId) {
         console.log(`✔ Cliente para a academia ID: ${academiaId} está pronto!`);
         clients[academiaId].status = 'ready';
         clients[academiaId].qrCode = null; // Limpa o QR code após a conexão
+        notifyStatus(academiaId);
     });
 
     client.on('disconnected', (reason) => {
         console.log(`Cliente para a academia ID: ${academiaId} foi desconectado. Motivo: ${reason}`);
         // Remove a sessão para forçar uma nova autenticação
         delete clients[academiaId];
+        notifyStatus(academiaId);
+    });
+
+    client.on('message_ack', (msg, ack) => {
+        queueReceipt(academiaId, msg, ack);
     });
 
     client.on('auth_failure', (msg) => {
         console.log(`Falha na autenticação para academia ${academiaId}: ${msg}`);
         clients[academiaId].status = 'auth_failed';
+        notifyStatus(academiaId);
     });
 
     client.initialize().catch(err => {
         console.error(`Falha ao inicializar cliente para academia ${academiaId}:`, err);
         clients[academiaId].status = 'error';
+        notifyStatus(academiaId);
     });
 }
 
@@ -147,6 +224,7 @@ app.post('/initialize', (req, res) => {
     }
     
     createClientSession(academiaId);
+    notifyStatus(academiaId);
     res.status(200).json({ message: 'Processo de inicialização iniciado.' });
 });
 
@@ -161,6 +239,28 @@ app.get('/status/:academiaId', (req, res) => {
     }
 });
 
+// Stream (Server-Sent Events) com o status da academia: envia o estado atual
+// na conexão e depois a cada mudança. Um comentário a cada 25s mantém a conexão viva.
+app.get('/events/:academiaId', (req, res) => {
+    const { academiaId } = req.params;
+    res.writeHead(200, {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'Connection': 'keep-alive',
+    });
+    res.write(`event: status\ndata: ${JSON.stringify(currentStatus(academiaId))}\n\n`);
+
+    statusListeners[academiaId] = statusListeners[academiaId] || new Set();
+    statusListeners[academiaId].add(res);
+    const heartbeat = setInterval(() => res.write(': ping\n\n'), 25000);
+
+    req.on('close', () => {
+        clearInterval(heartbeat);
+        statusListeners[academiaId].delete(res);
+        if (statusListeners[academiaId].size === 0) delete statusListeners[academiaId];
+    });
+});
+
 // Endpoint para enviar mensagens (agora precisa saber de qual academia)
 app.post('/send-message', async (req, res) => {
     const { academiaId, number, message } = req.body;
@@ -172,14 +272,43 @@ app.post('/send-message', async (req, res) => {
 
     try {
         const formattedNumber = `${number.replace('+', '')}@c.us`;
-        await session.instance.sendMessage(formattedNumber, message);
-        res.status(200).json({ success: true, message: 'Mensagem enviada.' });
+        const sent = await session.instance.sendMessage(formattedNumber, message);
+        res.status(200).json({ success: true, message: 'Mensagem enviada.', id: sent.id._serialized });
     } catch (error) {
         console.error(`Erro ao enviar mensagem pela academia ${academiaId}:`, error);
         res.status(500).json({ success: false, error: 'Falha ao enviar a mensagem.' });
     }
 });
 
+// Endpoint para enviar várias mensagens da mesma academia em uma única chamada.
+// Corpo: { academiaId, messages: [{ id, number, message }] }
+// Resposta: { success, results: [{ id, success, error? }] } na mesma ordem recebida.
+app.post('/send-batch', async (req, res) => {
+    const { academiaId, messages } = req.body;
+    const session = clients[academiaId];
+
+    if (!Array.isArray(messages)) {
+        return res.status(400).json({ success: false, error: 'messages deve ser uma lista.' });
+    }
+    if (!session || session.status !== 'ready') {
+        return res.status(400).json({ success: false, error: 'Cliente WhatsApp não está pronto ou conectado.' });
+    }
+
+    const results = [];
+    // Envia em sequência: a mesma sessão do WhatsApp não deve disparar mensagens em paralelo.
+    for (const item of messages) {
+        try {
+            const formattedNumber = `${String(item.number).replace('+', '')}@c.us`;
+            const sent = await session.instance.sendMessage(formattedNumber, item.message);
+            results.push({ id: item.id, success: true, messageId: sent.id._serialized });
+        } catch (error) {
+            console.error(`Erro ao enviar mensagem ${item.id} pela academia ${academiaId}:`, error);
+            results.push({ id: item.id, success: false, error: 'Falha ao enviar a mensagem.' });
+        }
+    }
+    res.status(200).json({ success: results.every(r => r.success), results });
+});
+
 // Endpoint para desconectar uma sessão
 app.post('/disconnect/:academiaId', (req, res) => {
     const { academiaId } = req.params;
@@ -189,6 +318,7 @@ app.post('/disconnect/:academiaId', (req, res) => {
         try {
             session.instance.destroy();
             delete clients[academiaId];
+            notifyStatus(academiaId);
             res.status(200).json({ message: 'Sessão desconectada com sucesso.' });
         } catch (error) {
             console.error(`Erro ao desconectar sessão da academia ${academiaId}:`, error);